@@ -1,62 +1,270 @@
-import json
+import logging
 import os
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
 from typing import Annotated, TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
-
-from langchain.chat_models import init_chat_model
 from langgraph.graph.message import add_messages
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from async_calendar import get_async_client
 from calendar_tools import (
     list_events,
+    search_events,
     create_event,
     check_availability,
     get_current_date,
     delete_event_by_datetime,
+    find_free_slots,
+    create_events,
+    delete_events_in_range,
+    import_ics_file,
+    export_ics_file,
+    acalendar_timezone,
+    calendar_timezone,
+    google_Calendar_client,
+)
+from checkpointing import open_checkpointer
+from date_resolver import build_date_context
+from fast_path import FAST_PATH_THRESHOLD, aanswer, answer, classify
+from context_budget import compact_history, log_token_usage, prune_stored_history
+from memo_cache import (
+    RESPONSE_CACHE_SIZE,
+    acalendar_version,
+    cached_reply,
+    calendar_version,
+    remember_reply,
 )
-from IPython.display import Image, display
+from rate_limit import acall_with_retry, call_with_retry, llm_limiter
 from system_prompt import main_agent_system_prompt
 from dotenv import load_dotenv
-import streamlit as st
 
 load_dotenv()
-os.environ["GOOGLE_API_KEY"] = st.secrets["GOOGLE_API_KEY"]
 
 class AgentState(TypedDict):
     messages: Annotated[list, add_messages]
+    date_context: str
 
 
-tools = [list_events, create_event, check_availability, get_current_date, delete_event_by_datetime]
-
-g = StateGraph(AgentState)
-# llm = init_chat_model(model='orieg/gemma3-tools:1b',model_provider='ollama')
-llm = init_chat_model(model="google_genai:gemini-2.0-flash")
-tool_node = ToolNode(tools=tools)
-llm_bind_tools = llm.bind_tools(tools)
-
-
-def agent_node(state: AgentState) -> dict:
-    system_prompt = SystemMessage(main_agent_system_prompt)
-    resp = llm_bind_tools.invoke([system_prompt]+state["messages"])
-    return {"messages": [resp]}
-
-
-g.add_node("agent", agent_node)
-g.add_node("tools", tool_node)
-g.add_edge(START, "agent")
-g.add_conditional_edges(
-    "agent",
-    lambda s: (
-        "tools"
-        if isinstance(s["messages"][-1], AIMessage)
-        and getattr(s["messages"][-1], "tool_calls", None)
-        else END
-    ),
-    {
-        "tools": "tools",
-        END: END,
-    },
-)
-g.add_edge("tools", "agent")
-g.add_edge("agent", END)
-agent_graph = g.compile()
+tools = [list_events, search_events, create_event, check_availability, get_current_date, delete_event_by_datetime, find_free_slots, create_events, delete_events_in_range, import_ics_file, export_ics_file]
+tools_by_name = {t.name: t for t in tools}
+# Replies to turns that only called these tools may be served from the reply cache
+read_only_tools = {"list_events", "search_events", "check_availability", "get_current_date", "find_free_slots"}
+
+# The system prompt is sent as the first, byte-identical part of every request so the
+# provider can reuse its cached prefix. GEMINI_CACHED_CONTENT may name an explicit
+# context cache created with the system prompt and tool declarations; both are then
+# served from the cache instead of being re-sent.
+cached_content = os.getenv("GEMINI_CACHED_CONTENT")
+
+
+def _last_human_text(state: AgentState) -> str:
+    last_human = next(
+        (m for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), None
+    )
+    return last_human.content if last_human and isinstance(last_human.content, str) else ""
+
+
+def resolve_dates_node(state: AgentState) -> dict:
+    # Resolve "tomorrow", "next Friday" etc. locally so the model doesn't need get_current_date
+    tz = ZoneInfo(calendar_timezone())
+    return {
+        "date_context": build_date_context(_last_human_text(state), tz),
+        # Keep the checkpointed history bounded; the prompt is compacted separately
+        "messages": prune_stored_history(state["messages"]),
+    }
+
+
+def _fast_path_intent(state: AgentState, tz):
+    intent = classify(_last_human_text(state), datetime.now(tz))
+    if intent is None or intent.confidence < FAST_PATH_THRESHOLD:
+        return None
+    return intent
+
+
+def _reply_cache_version():
+    """The Calendar service and its change counter for the reply cache, or (None, None).
+
+    The cache is skipped when it is disabled, the user has no Calendar service,
+    or the calendar cannot be brought up to date.
+    """
+    if RESPONSE_CACHE_SIZE <= 0:
+        return None, None
+    service = google_Calendar_client()
+    if service is None:
+        return None, None
+    try:
+        return service, calendar_version(service)
+    except Exception as e:
+        logging.error(f"Skipping the reply cache: {e}")
+        return None, None
+
+
+async def _areply_cache_version():
+    if RESPONSE_CACHE_SIZE <= 0:
+        return None, None
+    service = google_Calendar_client()
+    if service is None:
+        return None, None
+    try:
+        return service, await acalendar_version(service, get_async_client(service))
+    except Exception as e:
+        logging.error(f"Skipping the reply cache: {e}")
+        return None, None
+
+
+def _cached_reply_update(state: AgentState, tz, service, version) -> dict:
+    if service is None:
+        return {}
+    reply = cached_reply(service, _last_human_text(state), datetime.now(tz).date(), version)
+    if reply is None:
+        return {}
+    return {"messages": [AIMessage(reply, response_metadata={"cached_reply": True})]}
+
+
+def fast_path_node(state: AgentState, config: RunnableConfig) -> dict:
+    # Simple, unambiguous requests are answered from a template without the model,
+    # and repeated questions from the reply cache when it is enabled
+    tz = ZoneInfo(calendar_timezone())
+    intent = _fast_path_intent(state, tz)
+    if intent is None:
+        return _cached_reply_update(state, tz, *_reply_cache_version())
+    reply = answer(intent, tools_by_name, tz, config)
+    return {"messages": [AIMessage(reply, response_metadata={"fast_path": intent.tool})]}
+
+
+async def afast_path_node(state: AgentState, config: RunnableConfig) -> dict:
+    tz = ZoneInfo(await acalendar_timezone())
+    intent = _fast_path_intent(state, tz)
+    if intent is None:
+        return _cached_reply_update(state, tz, *await _areply_cache_version())
+    reply = await aanswer(intent, tools_by_name, tz, config)
+    return {"messages": [AIMessage(reply, response_metadata={"fast_path": intent.tool})]}
+
+
+def _cacheable_reply(state: AgentState, resp) -> bool:
+    """Whether `resp` is the final answer to a turn that only read the calendar."""
+    if RESPONSE_CACHE_SIZE <= 0 or resp.tool_calls or not isinstance(resp.content, str) or not resp.content:
+        return False
+    for m in reversed(state["messages"]):
+        if isinstance(m, HumanMessage):
+            return True
+        if isinstance(m, AIMessage) and any(c["name"] not in read_only_tools for c in m.tool_calls):
+            return False
+    return False
+
+
+def _remember_reply(state: AgentState, resp, tz, service, version):
+    if service is None:
+        return
+    remember_reply(service, _last_human_text(state), datetime.now(tz).date(), version, resp.content)
+
+
+def _agent_prompt(state: AgentState, send_system_prompt: bool = True) -> list:
+    system_prompt = [SystemMessage(main_agent_system_prompt)] if send_system_prompt else []
+    context = [SystemMessage(state["date_context"])] if state.get("date_context") else []
+    # Old turns are trimmed/summarized and stale tool output compacted to stay within budget
+    return system_prompt+context+compact_history(state["messages"])
+
+
+def build_agent_graph(model, cached: bool = False, checkpointer=None):
+    """Compile the agent graph around `model`.
+
+    Args:
+        model: A chat model supporting tool calling.
+        cached (bool): Whether the system prompt and tools come from a provider context cache.
+        checkpointer: Optional checkpointer; with one, callers pass a thread_id and
+            only the new message each turn.
+    """
+    llm_bind_tools = model if cached else model.bind_tools(tools)
+
+    def agent_node(state: AgentState) -> dict:
+        prompt = _agent_prompt(state, send_system_prompt=not cached)
+        # Quota and overload errors are retried with backoff instead of failing the turn
+        resp = call_with_retry(lambda: llm_bind_tools.invoke(prompt), llm_limiter)
+        log_token_usage(prompt, resp)
+        if _cacheable_reply(state, resp):
+            tz = ZoneInfo(calendar_timezone())
+            _remember_reply(state, resp, tz, *_reply_cache_version())
+        return {"messages": [resp]}
+
+    async def aagent_node(state: AgentState) -> dict:
+        prompt = _agent_prompt(state, send_system_prompt=not cached)
+        resp = await acall_with_retry(lambda: llm_bind_tools.ainvoke(prompt), llm_limiter)
+        log_token_usage(prompt, resp)
+        if _cacheable_reply(state, resp):
+            tz = ZoneInfo(await acalendar_timezone())
+            _remember_reply(state, resp, tz, *await _areply_cache_version())
+        return {"messages": [resp]}
+
+    g = StateGraph(AgentState)
+    g.add_node("resolve_dates", resolve_dates_node)
+    g.add_node("fast_path", RunnableLambda(fast_path_node, afunc=afast_path_node, name="fast_path"))
+    # Sync and async variants, so the same compiled graph serves invoke/stream and ainvoke/astream
+    g.add_node("agent", RunnableLambda(agent_node, afunc=aagent_node, name="agent"))
+    g.add_node("tools", ToolNode(tools=tools))
+    g.add_edge(START, "resolve_dates")
+    g.add_edge("resolve_dates", "fast_path")
+    g.add_conditional_edges(
+        "fast_path",
+        lambda s: END if isinstance(s["messages"][-1], AIMessage) else "agent",
+        {
+            "agent": "agent",
+            END: END,
+        },
+    )
+    g.add_conditional_edges(
+        "agent",
+        lambda s: (
+            "tools"
+            if isinstance(s["messages"][-1], AIMessage)
+            and getattr(s["messages"][-1], "tool_calls", None)
+            else END
+        ),
+        {
+            "tools": "tools",
+            END: END,
+        },
+    )
+    g.add_edge("tools", "agent")
+    g.add_edge("agent", END)
+    return g.compile(checkpointer=checkpointer)
+
+
+# The model client and compiled graph are built on first use rather than at import,
+# and shared by every session of the process
+_singletons = {}
+_singletons_lock = threading.Lock()
+
+
+def get_llm():
+    """Return the process-wide Gemini chat model, creating it on first call."""
+    with _singletons_lock:
+        if "llm" not in _singletons:
+            # Deferred: the provider SDK is slow to import and not needed offline
+            from langchain.chat_models import init_chat_model
+
+            if "GOOGLE_API_KEY" not in os.environ:
+                import streamlit as st
+
+                os.environ["GOOGLE_API_KEY"] = st.secrets["GOOGLE_API_KEY"]
+            # llm = init_chat_model(model='orieg/gemma3-tools:1b',model_provider='ollama')
+            # The agent nodes retry through rate_limit; the SDK's own retries would nest
+            # inside those and bypass the shared limiter's backoff and counters
+            _singletons["llm"] = init_chat_model(
+                model="google_genai:gemini-2.0-flash", cached_content=cached_content, max_retries=0
+            )
+        return _singletons["llm"]
+
+
+def get_agent_graph():
+    """Return the process-wide compiled agent graph with its checkpointer."""
+    llm = get_llm()
+    with _singletons_lock:
+        if "agent_graph" not in _singletons:
+            _singletons["agent_graph"] = build_agent_graph(
+                llm, cached=bool(cached_content), checkpointer=open_checkpointer()
+            )
+        return _singletons["agent_graph"]
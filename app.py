@@ -1,19 +1,31 @@
+import json
 import logging
-from urllib.request import Request
+import secrets
+import threading
+import time
+import uuid
 import streamlit as st
-from langchain_community.callbacks.streamlit import StreamlitCallbackHandler
 import os
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2 import id_token
 from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from langchain_core.messages import HumanMessage, AIMessage
-from agent2 import agent_graph
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
+from async_calendar import iterate_in_background
+from checkpointing import is_conversation_id, new_conversation_id, thread_config, user_thread_id
+from credential_store import credential_store, current_user
+from ics_transfer import ics_path, list_ics_files
+from tracing import TracingCallbackHandler, start_trace
+import rate_limit
 
 
 st.title("🤖 Google Calendar Assistant")
 
 CLIENT_SECRET_FILE = "credentials.json"
 SCOPES = [
+    # The signed-in Google account identifies the user
+    "openid",
+    "https://www.googleapis.com/auth/userinfo.email",
     "https://www.googleapis.com/auth/calendar",
     "https://www.googleapis.com/auth/calendar.events",
     "https://www.googleapis.com/auth/calendar.events.owned",
@@ -22,61 +34,266 @@ SCOPES = [
 ]
 os.environ["OAUTHLIB_RELAX_TOKEN_SCOPE"] = "1"
 REDIRECT_URI = st.secrets["REDIRECT_URI"]  # Ensure this is set in your Streamlit secrets
-TOKEN_DIR = "token_files"
-TOKEN_FILE = os.path.join(TOKEN_DIR, "token_google_calendar.json")
+if "TOKEN_ENCRYPTION_KEY" in st.secrets:
+    os.environ["TOKEN_ENCRYPTION_KEY"] = st.secrets["TOKEN_ENCRYPTION_KEY"]
+
+
+@st.cache_resource(show_spinner="Starting the assistant...")
+def load_agent_graph():
+    """The compiled agent graph, built once per server process rather than per rerun."""
+    # Imported here so the sign-in page renders before the graph is built
+    from agent2 import get_agent_graph
+
+    return get_agent_graph()
+
+
+@st.cache_resource
+def load_client_config():
+    with open(CLIENT_SECRET_FILE) as f:
+        return json.load(f)
+
+
+LOGIN_TTL = 600
+
+
+@st.cache_resource
+def pending_logins():
+    """OAuth flows started by this server, by their `state`, and the lock guarding them."""
+    return {}, threading.Lock()
+
+
+def start_login():
+    """Start an OAuth login and return its authorization URL.
+
+    Each login gets an unguessable `state`, and its flow is kept server-side
+    until the redirect returns with it. The redirect lands in a new session, so
+    the flow (and its PKCE code verifier) cannot live in the session state.
+    """
+    state = secrets.token_urlsafe(32)
+    flow = Flow.from_client_config(load_client_config(), scopes=SCOPES, redirect_uri=REDIRECT_URI)
+    auth_url, _ = flow.authorization_url(access_type="offline", prompt="consent", state=state)
+    logins, lock = pending_logins()
+    now = time.monotonic()
+    with lock:
+        for expired in [s for s, (started, _) in logins.items() if now - started > LOGIN_TTL]:
+            del logins[expired]
+        logins[state] = (now, flow)
+    return auth_url
+
+
+def finish_login(state, code):
+    """Complete the login `state` belongs to and return (user id, email, credentials).
+
+    The user id is the Google account's stable subject id (``sub``), read from
+    the verified ID token, never from the URL. Saved credentials are keyed by it.
+
+    Raises:
+        ValueError: If `state` was not issued by this server or has expired.
+    """
+    logins, lock = pending_logins()
+    with lock:
+        started, flow = logins.pop(state, (None, None))
+    if flow is None or time.monotonic() - started > LOGIN_TTL:
+        raise ValueError("This sign-in link is invalid or has expired, please sign in again")
+    flow.fetch_token(code=code)
+    creds = flow.credentials
+    claims = id_token.verify_oauth2_token(creds.id_token, Request(), flow.client_config["client_id"])
+    return claims["sub"], claims.get("email"), creds
+
+
+query_params = st.query_params
+
+# Every browser session starts signed out, under a throwaway id that has no
+# credentials; signing in switches it to the Google account's id
+if "user_id" not in st.session_state:
+    st.session_state["user_id"] = None
+    st.session_state["anonymous_id"] = f"anonymous-{uuid.uuid4().hex}"
+user_id = st.session_state["user_id"]
+current_user.set(user_id or st.session_state["anonymous_id"])
+
+# Conversation history lives in the graph's checkpointer, one thread per
+# conversation of each user; the URL only names the conversation
+if "conversation_id" not in st.session_state:
+    conversation_id = query_params.get("thread")
+    st.session_state["conversation_id"] = (
+        conversation_id if is_conversation_id(conversation_id) else new_conversation_id()
+    )
 
 if "authorized" not in st.session_state:
     st.session_state["authorized"] = False
 
-# Ensure token directory exists
-if not os.path.exists(TOKEN_DIR):
-    os.mkdir(TOKEN_DIR)
-
-# Check if user is authenticated
+# Check if user is authenticated (stored credentials are refreshed before they expire)
 creds = None
+if user_id:
+    try:
+        creds = credential_store.get(user_id, SCOPES)
+    except RefreshError as e:
+        # Revoked or expired grant: sign in again
+        logging.error(f"Stored credentials for {user_id} are no longer usable: {e}")
+        credential_store.delete(user_id)
+    except Exception as e:
+        # Transient (e.g. network) failure while refreshing; keep the credentials
+        logging.error(f"Could not refresh credentials for {user_id}: {e}")
+        st.error("Couldn't reach Google to refresh your sign-in. Please try again in a moment.")
+        st.stop()
+
+# The OAuth redirect back to the app
+if not creds and "code" in query_params:
+    try:
+        user_id, email, creds = finish_login(query_params.get("state"), query_params["code"])
+        # Save the credentials for future use
+        credential_store.put(user_id, creds)
+        st.session_state["user_id"] = user_id
+        st.session_state["account_email"] = email
+        current_user.set(user_id)
+        st.success("Authorization successful! You can now use the assistant.")
+    except Exception as e:
+        logging.error(f"Sign-in failed: {e}")
+        st.error(f"Error during authorization: {e}")
+    finally:
+        # The code and state are single-use; keep them out of the address bar
+        query_params.clear()
+st.session_state["authorized"] = creds is not None
 
 # Authorization step
-if not creds or not creds.valid:
-    if creds and creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-    else:
-        if not st.session_state["authorized"]:
-            flow = Flow.from_client_secrets_file(
-                CLIENT_SECRET_FILE, scopes=SCOPES, redirect_uri=REDIRECT_URI
-            )
-           
-            auth_url, _ = flow.authorization_url(
-                access_type="offline", prompt="consent"
-            )
-            st.write("### Authorization Required")
-            st.write("Please click the link below to authorize:")
-            st.markdown(f"[Authorize Here]({auth_url})")
-
-            query_params = st.query_params
-            logging.info(f"Query parameters: {query_params}")
-            if "code" in query_params:
-                code = query_params["code"]  # Extract the authorization code
-                logging.info(code)
-                try:
-                    flow.fetch_token(code=code)
-                    creds = flow.credentials
-                    # Save the credentials for future use
-                    with open(TOKEN_FILE, "w") as token_file:
-                        token_file.write(creds.to_json())
-                    st.success(
-                        "Authorization successful! You can now use the assistant."
-                    )
-                    st.session_state["authorized"] = True
-                except Exception as e:
-                    st.error(f"Error during authorization: {e}")
-
-
-# Initialize session state for chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+if not creds:
+    if "auth_url" not in st.session_state:
+        st.session_state["auth_url"] = start_login()
+    st.write("### Authorization Required")
+    st.write("Please click the link below to authorize:")
+    st.markdown(f"[Authorize Here]({st.session_state['auth_url']})")
+
+
+def stream_agent_reply(inputs, config=None):
+    """Run the agent graph, rendering LLM tokens and tool activity as they arrive.
+
+    Returns the final AI message once the graph has finished.
+    """
+    tool_status = {}
+    placeholder = st.empty()
+    text = ""
+    final_msg = None
+
+    # The graph runs natively async on a shared background loop; chunks are
+    # handed back to this thread for rendering
+    for mode, chunk in iterate_in_background(
+        load_agent_graph().astream(inputs, config, stream_mode=["messages", "updates"])
+    ):
+        if mode == "messages":
+            msg, metadata = chunk
+            if (
+                metadata.get("langgraph_node") == "agent"
+                and isinstance(msg, AIMessageChunk)
+                and isinstance(msg.content, str)
+                and msg.content
+            ):
+                text += msg.content
+                placeholder.markdown(text + "▌")
+            continue
+
+        for node, update in chunk.items():
+            if node == "fast_path":
+                # Answered without the model, or passed on to it (empty update)
+                if update:
+                    final_msg = update["messages"][-1]
+            elif node == "agent":
+                ai_msg = update["messages"][-1]
+                if ai_msg.tool_calls:
+                    # Text streamed before a tool call is not the final answer
+                    text = ""
+                    placeholder.empty()
+                    for call in ai_msg.tool_calls:
+                        tool_status[call["id"]] = st.status(
+                            f"Running `{call['name']}`...", state="running"
+                        )
+                    placeholder = st.empty()
+                else:
+                    final_msg = ai_msg
+            elif node == "tools":
+                for tool_msg in update["messages"]:
+                    status = tool_status.get(tool_msg.tool_call_id)
+                    if status is not None:
+                        failed = getattr(tool_msg, "status", "success") == "error"
+                        status.update(
+                            label=f"{'Failed' if failed else 'Finished'} `{tool_msg.name}`",
+                            state="error" if failed else "complete",
+                        )
+                        status.write(tool_msg.content)
+
+    placeholder.markdown(final_msg.content)
+    return final_msg
+
+
+def render_timing(trace):
+    """Show where the time of one turn went, per span and per kind."""
+    spans = sorted(trace.spans, key=lambda s: s["start"])
+    if not spans:
+        return
+    origin = spans[0]["start"]
+    with st.expander("⏱️ Timing breakdown"):
+        st.write(
+            " · ".join(f"**{kind}** {ms:.0f} ms" for kind, ms in trace.summary().items())
+        )
+        # Process-wide throttling and retry counters
+        st.caption(
+            " · ".join(f"{name}: {value:g}" for name, value in sorted(rate_limit.stats().items()))
+        )
+        st.dataframe(
+            [
+                {
+                    "span": s["name"],
+                    "kind": s["kind"],
+                    "offset ms": round((s["start"] - origin) * 1000),
+                    "duration ms": round(s["duration_ms"]),
+                    "bytes": s.get("bytes"),
+                    "tokens in/out": (
+                        f"{s.get('input_tokens')}/{s.get('output_tokens')}"
+                        if s["kind"] == "llm" else None
+                    ),
+                    "error": s.get("error"),
+                }
+                for s in spans
+            ],
+            hide_index=True,
+        )
+
+
+# Only the most recent part of a resumed conversation is rendered
+DISPLAY_MESSAGES = 50
+
+stream_responses = st.sidebar.toggle("Stream responses", value=True)
+show_timing = st.sidebar.toggle("Show timing breakdown", value=False)
+if st.sidebar.button("New conversation"):
+    st.session_state["conversation_id"] = new_conversation_id()
+if creds:
+    # The command-line tools (e.g. python -m ics_transfer --user ...) take this id
+    st.sidebar.caption(
+        f"Signed in as {st.session_state.get('account_email') or 'your Google account'}. "
+        f"Account id: `{user_id}`"
+    )
+query_params["thread"] = st.session_state["conversation_id"]
+
+
+def conversation_config(**config):
+    """Graph config for the current conversation, in the signed-in user's own thread space."""
+    return thread_config(
+        user_thread_id(current_user.get(), st.session_state["conversation_id"]), **config
+    )
+
+
+def visible_history(config):
+    """User messages and final answers of the checkpointed conversation."""
+    messages = load_agent_graph().get_state(config).values.get("messages", [])
+    visible = [
+        m for m in messages
+        if isinstance(m, HumanMessage)
+        or (isinstance(m, AIMessage) and m.content and not m.tool_calls)
+    ]
+    return visible[-DISPLAY_MESSAGES:]
+
 
 # Chat history container with scrollable layout
-for msg in st.session_state.messages:
+for msg in visible_history(conversation_config()):
     role = "user" if isinstance(msg, HumanMessage) else "assistant"
     with st.chat_message(role):
         st.markdown(msg.content)
@@ -84,8 +301,8 @@ for msg in st.session_state.messages:
 
 # Input box fixed at the bottom
 if user_input := st.chat_input(placeholder="Type your message here..."):
-    # Add user message to chat history
-    st.session_state.messages.append(HumanMessage(content=user_input))
+    # Only the new message is sent; earlier ones come from the checkpoint
+    inputs = {"messages": [HumanMessage(content=user_input)]}
 
     # Display user message in real-time
     with st.chat_message("user"):
@@ -93,15 +310,41 @@ if user_input := st.chat_input(placeholder="Type your message here..."):
 
     # Prepare a container for assistant's response
     with st.chat_message("assistant"):
-        st_callback = StreamlitCallbackHandler(st.container())  # Streaming callback
-        cfg = {"callbacks": [st_callback]}
+        # Spans of this turn (nodes, tools, LLM and Calendar API calls)
+        trace = start_trace()
+        tracer = TracingCallbackHandler(trace)
+        if stream_responses:
+            # Render tokens and tool progress incrementally
+            stream_agent_reply(inputs, conversation_config(callbacks=[tracer]))
+        else:
+            from langchain_community.callbacks.streamlit import StreamlitCallbackHandler
+
+            st_callback = StreamlitCallbackHandler(st.container())  # Streaming callback
+            cfg = conversation_config(callbacks=[st_callback, tracer])
+
+            # Run the agent and get the response
+            result = load_agent_graph().invoke(inputs, cfg)
+
+            # Extract the assistant's final message
+            ai_msg = result["messages"][-1]
+
+            # Display the assistant's response
+            st.markdown(ai_msg.content)
 
-        # Run the agent and get the response
-        result = agent_graph.invoke({"messages": st.session_state.messages}, cfg)
+        if show_timing:
+            render_timing(trace)
 
-        # Extract and append assistant's final message
-        ai_msg = result["messages"][-1]
-        st.session_state.messages.append(ai_msg)
 
-        # Display the assistant's response
-        st.markdown(ai_msg.content)
+# .ics files for the import/export tools live in the user's own folder. Rendered
+# last, so a file exported during this turn is offered right away
+if creds:
+    with st.sidebar.expander("📁 Calendar files"):
+        uploaded = st.file_uploader("Upload an .ics file to import", type="ics")
+        if uploaded is not None and st.session_state.get("ics_upload") != uploaded.file_id:
+            with open(ics_path(uploaded.name), "wb") as f:
+                f.write(uploaded.getbuffer())
+            st.session_state["ics_upload"] = uploaded.file_id
+            st.caption(f"Saved {uploaded.name}. Ask the assistant to import it.")
+        for name in list_ics_files():
+            with open(ics_path(name), "rb") as f:
+                st.download_button(f"⬇️ {name}", f, file_name=name, mime="text/calendar", key=f"ics-{name}")
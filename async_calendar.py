@@ -0,0 +1,182 @@
+"""Non-blocking Google Calendar transport for the async tool implementations.
+
+googleapiclient only offers blocking httplib2 calls, so the async tools talk to
+the Calendar REST API directly through a shared ``httpx.AsyncClient``. Clients
+are cached per event loop and per credentials, which keeps keep-alive
+connections open across tool calls and lets parallel tool calls in one turn
+overlap their I/O instead of each holding a worker thread.
+
+Errors are raised as googleapiclient ``HttpError`` so callers can handle both
+transports the same way.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import weakref
+
+import httplib2
+import httpx
+from google.auth.transport.requests import Request
+from googleapiclient.errors import HttpError
+
+import tracing
+from rate_limit import acall_with_retry, calendar_limiter
+from service_pool import service_pool
+
+BASE_URL = "https://www.googleapis.com/calendar/v3"
+
+
+class AsyncCalendarClient:
+    """Minimal async client for the Calendar endpoints used by the tools."""
+
+    def __init__(self, credentials, max_connections=20, timeout=30.0):
+        self._credentials = credentials
+        self._refresh_lock = asyncio.Lock()
+        self._client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            headers={"Accept-Encoding": "gzip", "User-Agent": "ai-calendar-agent (gzip)"},
+        )
+
+    async def request(self, method, path, params=None, body=None):
+        if params:
+            params = {k: v for k, v in params.items() if v is not None}
+        with tracing.span(f"{method} {path}", "api", transport="httpx") as attrs:
+            return await acall_with_retry(
+                lambda: self._request_once(method, path, params, body, attrs),
+                calendar_limiter,
+                span_attrs=attrs,
+            )
+
+    async def _request_once(self, method, path, params, body, attrs):
+        headers = await self._auth_headers()
+        try:
+            resp = await self._client.request(
+                method, path, params=params, json=body, headers=headers
+            )
+        except httpx.TransportError as e:
+            # Surface network failures as retryable connection errors
+            raise ConnectionError(str(e)) from e
+        attrs["status"] = resp.status_code
+        attrs["bytes"] = len(resp.content)
+        if resp.status_code >= 400:
+            raise HttpError(
+                httplib2.Response(
+                    {**resp.headers, "status": resp.status_code, "reason": resp.reason_phrase}
+                ),
+                resp.content,
+                uri=str(resp.url),
+            )
+        return resp.json() if resp.content else {}
+
+    async def list_events(self, calendar_id="primary", **params):
+        return await self.request("GET", f"/calendars/{calendar_id}/events", params=params)
+
+    async def insert_event(self, body, calendar_id="primary"):
+        return await self.request("POST", f"/calendars/{calendar_id}/events", body=body)
+
+    async def delete_event(self, event_id, calendar_id="primary"):
+        return await self.request("DELETE", f"/calendars/{calendar_id}/events/{event_id}")
+
+    async def get_setting(self, setting):
+        return await self.request("GET", f"/users/me/settings/{setting}")
+
+    async def list_settings(self):
+        return await self.request("GET", "/users/me/settings")
+
+    async def list_calendars(self):
+        return await self.request("GET", "/users/me/calendarList")
+
+    async def query_freebusy(self, body):
+        return await self.request("POST", "/freeBusy", body=body)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _auth_headers(self):
+        if not self._credentials.valid:
+            async with self._refresh_lock:
+                if not self._credentials.valid:
+                    # google-auth refresh is blocking; keep it off the event loop
+                    await asyncio.to_thread(self._credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self._credentials.token}"}
+
+
+_clients = weakref.WeakKeyDictionary()
+
+# Async counterpart of calendar_tools.service_factory: an optional callable
+# taking a Calendar service and returning an async client for it
+client_factory = None
+
+
+def get_async_client(service):
+    """Return the async client for the running loop and `service`'s credentials."""
+    if client_factory is not None:
+        return client_factory(service)
+    creds = service_pool.credentials(service)
+    if creds is None:
+        raise RuntimeError("No credentials available for the Calendar service")
+    per_loop = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = per_loop.get(id(creds))
+    if client is None or client._credentials is not creds:
+        client = per_loop[id(creds)] = AsyncCalendarClient(creds)
+    return client
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def background_loop():
+    """A process-wide event loop running in a daemon thread.
+
+    Streamlit reruns would otherwise create a fresh loop per turn, which throws
+    away pooled connections. Running coroutines here keeps them warm.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="async-calendar-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def run_in_background(coro):
+    """Run `coro` on the background loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, background_loop()).result()
+
+
+def iterate_in_background(async_iterable):
+    """Consume an async iterable on the background loop, yielding items here.
+
+    Lets synchronous callers (e.g. the Streamlit script thread, which must do
+    all the rendering) drive ``agent_graph.astream``.
+    """
+    items = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in async_iterable:
+                items.put(item)
+        except BaseException as e:
+            logging.error(f"Error while streaming: {e}")
+            items.put(e)
+        finally:
+            items.put(done)
+
+    asyncio.run_coroutine_threadsafe(pump(), background_loop())
+    while True:
+        item = items.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
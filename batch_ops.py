@@ -0,0 +1,89 @@
+"""Helpers for sending many Calendar API calls through the batch endpoint.
+
+Google accepts up to 50 calls in one batch HTTP request. Each call still
+succeeds or fails on its own, so results are reported per item and a failure
+in one item does not stop the others. Every item counts against the rate
+limiter, and items that failed with a transient error are sent again in a
+later batch after a backoff.
+
+A retried insert may already have succeeded on the server. Inserts therefore
+carry a client-generated event id (``new_event_id``). A repeat then fails with
+409 Conflict instead of creating the event twice; see ``is_conflict``.
+"""
+import logging
+import time
+import uuid
+
+import tracing
+from rate_limit import (
+    RETRY_MAX_ATTEMPTS,
+    calendar_limiter,
+    call_with_retry,
+    is_retryable,
+    retry_delay,
+)
+
+MAX_BATCH_SIZE = 50
+
+
+def execute_batched(service, requests, batch_size=MAX_BATCH_SIZE):
+    """Execute API requests in batches of at most `batch_size`.
+
+    Args:
+        service: The service object the requests were created from.
+        requests (list): Unexecuted ``HttpRequest`` objects.
+        batch_size (int): Calls per batch HTTP request (max 50).
+
+    Returns:
+        List[tuple]: One (response, exception) pair per request, in input order.
+            Exactly one of the two is None.
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    results = [None] * len(requests)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    pending = list(range(len(requests)))
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        for offset in range(0, len(pending), batch_size):
+            chunk = pending[offset:offset + batch_size]
+            _execute_batch(service, requests, chunk, callback, results)
+
+        pending = [i for i in pending if results[i][1] is not None and is_retryable(results[i][1])]
+        if not pending or attempt + 1 == RETRY_MAX_ATTEMPTS:
+            return results
+        logging.warning(f"Retrying {len(pending)} batch item(s) after transient errors")
+        time.sleep(retry_delay(results[pending[0]][1], attempt))
+    return results
+
+
+def _execute_batch(service, requests, chunk, callback, results):
+    batch = service.new_batch_http_request(callback=callback)
+    for index in chunk:
+        batch.add(requests[index], request_id=str(index))
+    try:
+        with tracing.span("calendar.batch", "api", items=len(chunk)) as attrs:
+            call_with_retry(batch.execute, calendar_limiter, tokens=len(chunk), span_attrs=attrs)
+    except Exception as e:
+        # The whole batch request failed, so every item in it failed too
+        logging.error(f"Batch request failed: {e}")
+        for index in chunk:
+            results[index] = (None, e)
+
+
+def new_event_id():
+    """A fresh event id in the API's alphabet (base32hex: 0-9 and a-v)."""
+    return uuid.uuid4().hex
+
+
+def is_conflict(exception):
+    """True if an insert failed because an event with its id already exists."""
+    resp = getattr(exception, "resp", None)
+    return resp is not None and resp.status == 409
+
+
+def is_gone(exception):
+    """True if the error means the target event no longer exists."""
+    resp = getattr(exception, "resp", None)
+    return resp is not None and resp.status in (404, 410)
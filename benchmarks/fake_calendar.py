@@ -0,0 +1,367 @@
+"""In-process fake of the Google Calendar service object.
+
+Implements the subset of the discovery-based API the tools use
+(``events().list/insert/import/delete``, ``settings().get/list``,
+``calendarList().get/list``, ``freebusy().query`` and batch requests) with the same call shape, so the real tool code runs
+against it unchanged. ``FakeAsyncClient`` serves the same calendar through the
+interface of ``async_calendar.AsyncCalendarClient`` for the async tools. Recurring events are stored as masters with changed or
+cancelled occurrences, and ``singleEvents=True`` expands them the way the API
+does (open-ended series up to ``EXPANSION_DAYS`` ahead). Every executed HTTP request sleeps for the configured
+latency and is counted, which is what the benchmarks report.
+"""
+import asyncio
+import collections
+import datetime
+import random
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from event_store import EventRecord, parse_event_time, parse_iso
+from recurrence import Series, parse_instance_id
+
+EXPANSION_DAYS = 365
+
+
+def _http_error(status, reason):
+    return HttpError(httplib2.Response({"status": status, "reason": reason}), reason.encode())
+
+
+class FakeRequest:
+    def __init__(self, calendar, method, handler):
+        self._calendar = calendar
+        self.method = method
+        self._handler = handler
+
+    def execute(self, http=None, num_retries=0):
+        self._calendar._charge(self.method)
+        return self._handler()
+
+    async def aexecute(self):
+        # Same as execute, but the round trip waits without blocking the event loop
+        self._calendar._count(self.method)
+        if self._calendar.latency:
+            await asyncio.sleep(self._calendar.latency)
+        return self._handler()
+
+
+class FakeBatch:
+    """Batch request: one round trip for up to 50 calls, per-item callbacks."""
+
+    def __init__(self, calendar, callback):
+        self._calendar = calendar
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        if len(self._requests) >= 50:
+            raise ValueError("Exceeded the maximum of 50 calls in a batch")
+        self._requests.append((request, callback or self._callback, request_id))
+
+    def execute(self, http=None):
+        self._calendar._charge("batch")
+        for request, callback, request_id in self._requests:
+            try:
+                callback(request_id, request._handler(), None)
+            except HttpError as e:
+                callback(request_id, None, e)
+
+
+class _Resource:
+    def __init__(self, methods):
+        for name, method in methods.items():
+            setattr(self, name, method)
+
+
+class FakeCalendarService:
+    """A fake Calendar API with a synthetic, deterministic set of events.
+
+    Args:
+        num_events (int): How many events to generate.
+        days (int): Generated events are spread over this many days from `start`.
+        latency (float): Seconds each HTTP round trip takes.
+        timezone (str): The calendar's timezone setting.
+        seed (int): Random seed for reproducible calendars.
+        start (datetime): First day events are generated for (default: today).
+        recurring (int): How many open-ended recurring meetings to add, alternately
+            every weekday and weekly.
+    """
+
+    def __init__(self, num_events=200, days=30, latency=0.05, timezone="UTC", seed=7, start=None,
+                 recurring=0):
+        self.latency = latency
+        self.timezone = timezone
+        self._tz = ZoneInfo(timezone)
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+        self._events = {}
+        self._changes = []
+        self._next_id = 0
+        tz = ZoneInfo(timezone)
+        start = start or datetime.datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+        rng = random.Random(seed)
+        for i in range(num_events):
+            day = start + datetime.timedelta(days=rng.randrange(days))
+            begin = day.replace(hour=rng.randrange(8, 18), minute=rng.choice((0, 30)))
+            length = datetime.timedelta(minutes=rng.choice((30, 30, 60, 60, 90)))
+            self._add(
+                {
+                    "summary": f"{rng.choice(('Sync', 'Review', '1:1', 'Planning', 'Standup'))} #{i}",
+                    "start": {"dateTime": begin.isoformat()},
+                    "end": {"dateTime": (begin + length).isoformat()},
+                }
+            )
+        for i in range(recurring):
+            begin = start.replace(hour=rng.randrange(8, 18), minute=rng.choice((0, 30)))
+            daily = i % 2 == 0
+            self._add(
+                {
+                    "summary": f"{'Standup' if daily else '1:1'} series #{i}",
+                    "start": {"dateTime": begin.isoformat(), "timeZone": timezone},
+                    "end": {"dateTime": (begin + datetime.timedelta(minutes=30)).isoformat(), "timeZone": timezone},
+                    "recurrence": ["RRULE:FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR" if daily else "RRULE:FREQ=WEEKLY"],
+                }
+            )
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def reset_counters(self):
+        self.calls.clear()
+
+    def events(self):
+        return _Resource(
+            {"list": self._list, "insert": self._insert, "import_": self._import, "delete": self._delete}
+        )
+
+    def settings(self):
+        return _Resource({"get": self._get_setting, "list": self._list_settings})
+
+    def freebusy(self):
+        return _Resource({"query": self._freebusy})
+
+    def calendarList(self):
+        return _Resource({"get": self._get_calendar, "list": self._list_calendars})
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def _count(self, method):
+        with self._lock:
+            self.calls[method] += 1
+
+    def _charge(self, method):
+        self._count(method)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _add(self, event):
+        self._next_id += 1
+        event = dict(event, status="confirmed")
+        event.setdefault("id", f"ev{self._next_id}")
+        event.setdefault("iCalUID", f"{event['id']}@google.com")
+        event["htmlLink"] = f"https://calendar.example/event?eid={event['id']}"
+        self._events[event["id"]] = event
+        self._changes.append(event)
+        return event
+
+    def _instances(self, master):
+        # Occurrences of a recurring master as singleEvents=True returns them
+        series = Series(EventRecord(master, self._tz), master["recurrence"], master["start"], self._tz)
+        excluded = {
+            parse_event_time(e["originalStartTime"], self._tz)
+            for e in self._events.values()
+            if e.get("recurringEventId") == master["id"]
+        }
+        horizon = series.master.start_at + datetime.timedelta(days=EXPANSION_DAYS)
+        key = "date" if series.master.all_day else "dateTime"
+        for record in series.instances(series.master.start_at, horizon, excluded):
+            instance = {k: v for k, v in master.items() if k != "recurrence"}
+            instance.update(
+                id=record.id,
+                start={key: record.start},
+                end={key: record.end},
+                recurringEventId=master["id"],
+                originalStartTime={key: record.start},
+            )
+            yield instance
+
+    def _expand(self, items):
+        return [i for e in items for i in (self._instances(e) if e.get("recurrence") else (e,))]
+
+    def _list(self, calendarId="primary", syncToken=None, pageToken=None, maxResults=250,
+              timeMin=None, timeMax=None, q=None, singleEvents=False, **kwargs):
+        def handler():
+            with self._lock:
+                if syncToken is not None:
+                    items = self._changes[int(syncToken):]
+                    if singleEvents:
+                        items = self._expand(items)
+                else:
+                    # Unexpanded listings include cancelled occurrences of recurring events
+                    items = [
+                        e for e in self._events.values()
+                        if e["status"] != "cancelled" or (not singleEvents and e.get("recurringEventId"))
+                    ]
+                    if singleEvents:
+                        items = self._expand(items)
+                    # A master stays listed whatever the range; its occurrences may fall inside
+                    if timeMin is not None:
+                        items = [
+                            e for e in items
+                            if "end" not in e or e.get("recurrence")
+                            or parse_event_time(e["end"], self._tz) > parse_iso(timeMin)
+                        ]
+                    if timeMax is not None:
+                        items = [
+                            e for e in items
+                            if "start" not in e or parse_event_time(e["start"], self._tz) < parse_iso(timeMax)
+                        ]
+                    if q:
+                        items = [e for e in items if q.lower() in e.get("summary", "").lower()]
+                    items.sort(key=lambda e: parse_event_time(e.get("start") or e["originalStartTime"], self._tz))
+                offset = int(pageToken or 0)
+                page = items[offset:offset + maxResults]
+                response = {"timeZone": self.timezone, "items": [dict(e) for e in page]}
+                if offset + maxResults < len(items):
+                    response["nextPageToken"] = str(offset + maxResults)
+                else:
+                    response["nextSyncToken"] = str(len(self._changes))
+                return response
+
+        return FakeRequest(self, "events.list", handler)
+
+    def _import(self, calendarId="primary", body=None, **kwargs):
+        return self._insert(calendarId, body, _method="events.import")
+
+    def _insert(self, calendarId="primary", body=None, _method="events.insert", **kwargs):
+        def handler():
+            event = dict(body)
+            for key in ("start", "end"):
+                value = dict(event[key])
+                if "dateTime" in value and "timeZone" in value:
+                    parsed = datetime.datetime.fromisoformat(value["dateTime"])
+                    if parsed.tzinfo is None:
+                        parsed = parsed.replace(tzinfo=ZoneInfo(value["timeZone"]))
+                    value["dateTime"] = parsed.isoformat()
+                event[key] = value
+            with self._lock:
+                if event.get("id") in self._events:
+                    raise _http_error(409, "The requested identifier already exists.")
+                return dict(self._add(event))
+
+        return FakeRequest(self, _method, handler)
+
+    def _delete(self, calendarId="primary", eventId=None, **kwargs):
+        def handler():
+            with self._lock:
+                event = self._events.get(eventId) or self._occurrence(eventId)
+                if event is None:
+                    raise _http_error(404, "Not Found")
+                if event["status"] == "cancelled":
+                    raise _http_error(410, "Resource has been deleted")
+                event["status"] = "cancelled"
+                self._changes.append(
+                    {k: v for k, v in event.items() if k in ("id", "status", "recurringEventId", "originalStartTime")}
+                )
+                return ""
+
+        return FakeRequest(self, "events.delete", handler)
+
+    def _occurrence(self, event_id):
+        # Deleting an occurrence of a recurring event records it as a changed occurrence
+        instance = parse_instance_id(event_id)
+        master = self._events.get(instance[0]) if instance else None
+        if master is None or not master.get("recurrence") or master["status"] == "cancelled":
+            return None
+        original = instance[1]
+        key, value = ("date", original.isoformat()) if "date" in master["start"] else ("dateTime", original.isoformat())
+        event = self._events[event_id] = {
+            "id": event_id,
+            "status": "confirmed",
+            "recurringEventId": master["id"],
+            "originalStartTime": {key: value},
+        }
+        return event
+
+    def _get_setting(self, setting=None, **kwargs):
+        values = {"timezone": self.timezone, "weekStart": "1", "format24HourTime": "false"}
+        return FakeRequest(self, "settings.get", lambda: {"id": setting, "value": values.get(setting, "")})
+
+    def _list_settings(self, **kwargs):
+        items = [
+            {"id": "timezone", "value": self.timezone},
+            {"id": "weekStart", "value": "1"},
+            {"id": "format24HourTime", "value": "false"},
+        ]
+        return FakeRequest(self, "settings.list", lambda: {"items": items})
+
+    def _get_calendar(self, calendarId="primary", **kwargs):
+        return FakeRequest(
+            self,
+            "calendarList.get",
+            lambda: {"id": calendarId, "timeZone": self.timezone, "defaultReminders": []},
+        )
+
+    def _list_calendars(self, **kwargs):
+        # Every calendar shows the same events; enough to exercise the fan-out
+        items = [
+            {"id": "me@example.com", "summary": "Me", "primary": True, "timeZone": self.timezone},
+            {"id": "team@example.com", "summary": "Team", "timeZone": self.timezone},
+            {"id": "room-1@resource.example.com", "summary": "Room 1", "timeZone": self.timezone},
+        ]
+        return FakeRequest(self, "calendarList.list", lambda: {"items": items})
+
+    def _freebusy(self, body=None, **kwargs):
+        def handler():
+            time_min, time_max = parse_iso(body["timeMin"]), parse_iso(body["timeMax"])
+            with self._lock:
+                busy = [
+                    {
+                        "start": parse_event_time(e["start"], self._tz).isoformat(),
+                        "end": parse_event_time(e["end"], self._tz).isoformat(),
+                    }
+                    for e in self._expand(self._events.values())
+                    if e["status"] != "cancelled"
+                    and e.get("transparency") != "transparent"
+                    and parse_event_time(e["end"], self._tz) > time_min
+                    and parse_event_time(e["start"], self._tz) < time_max
+                ]
+            return {"calendars": {item["id"]: {"busy": busy} for item in body.get("items", [])}}
+
+        return FakeRequest(self, "freebusy.query", handler)
+
+
+class FakeAsyncClient:
+    """``AsyncCalendarClient`` stand-in backed by a ``FakeCalendarService``."""
+
+    def __init__(self, calendar):
+        self._calendar = calendar
+
+    async def list_events(self, calendar_id="primary", **params):
+        return await self._calendar._list(calendarId=calendar_id, **params).aexecute()
+
+    async def insert_event(self, body, calendar_id="primary"):
+        return await self._calendar._insert(calendar_id, body).aexecute()
+
+    async def delete_event(self, event_id, calendar_id="primary"):
+        return await self._calendar._delete(calendar_id, eventId=event_id).aexecute()
+
+    async def get_setting(self, setting):
+        return await self._calendar._get_setting(setting).aexecute()
+
+    async def list_settings(self):
+        return await self._calendar._list_settings().aexecute()
+
+    async def list_calendars(self):
+        return await self._calendar._list_calendars().aexecute()
+
+    async def query_freebusy(self, body):
+        return await self._calendar._freebusy(body).aexecute()
+
+    async def aclose(self):
+        pass
@@ -0,0 +1,74 @@
+"""A scripted chat model that emits deterministic tool calls.
+
+Stands in for Gemini in the offline benchmarks. The script maps the user's
+message to the tool calls the real model would make; once the tool results
+are in, the model answers with a short canned summary. Each call can take a
+fixed latency to mimic model inference time.
+"""
+import time
+import uuid
+from typing import Any, Callable, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+def tool_call(name, **args):
+    return {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model whose tool calls come from `script(user_text)`.
+
+    `script` returns a list of tool calls for the first model call of a turn
+    (an empty list answers directly). Every later call in the same turn, i.e.
+    after tool results, returns the final answer.
+    """
+
+    script: Callable[[str], List[dict]]
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        turn = []
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            turn.append(message)
+        user_text = message.content if isinstance(message, HumanMessage) else ""
+
+        if not turn:
+            calls = self.script(user_text)
+            if calls:
+                reply = AIMessage(content="", tool_calls=calls)
+            else:
+                reply = AIMessage(content=f"(scripted answer to: {user_text})")
+        else:
+            results = [m for m in turn if isinstance(m, ToolMessage)]
+            summary = "; ".join(str(m.content)[:80] for m in reversed(results))
+            reply = AIMessage(content=f"Done. {summary}")
+
+        reply.usage_metadata = {
+            "input_tokens": sum(len(str(m.content)) for m in messages) // 4,
+            "output_tokens": len(str(reply.content)) // 4 + 10,
+            "total_tokens": 0,
+        }
+        return ChatResult(generations=[ChatGeneration(message=reply)])
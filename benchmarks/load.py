@@ -0,0 +1,287 @@
+"""Load-test the agent graph with many concurrent chat sessions.
+
+Usage:
+    python -m benchmarks.load [--concurrency 1 4 16 32] [--turns 5]
+                              [--api-latency 0.05] [--llm-latency 0.2]
+                              [--think-time 0] [--users N] [--output load.json]
+                              [--baseline previous.json --tolerance 0.25]
+
+Each level of concurrency runs that many simulated sessions at once, each on
+its own thread, as Streamlit does. Every session has its own user id,
+checkpoint thread and fake Calendar (``--users`` makes sessions share fewer
+users and calendars). Sessions send a mix of the benchmark scenarios'
+messages through one compiled graph with a checkpointer. Like ``app.py``, each
+turn streams ``astream`` on the shared background loop through
+``iterate_in_background``, so the async nodes and tools are the ones measured.
+The chat model is the scripted fake and the Calendar API the in-process fake
+(``FakeAsyncClient`` for the async tools), so no network access is needed.
+The Streamlit server itself and OAuth are not exercised.
+
+For each level it reports throughput, p50/p95/p99 turn latency, errors, and
+the peak thread count and resident memory of the process. A turn counts as an
+error if the graph raises, and each tool result reporting a failure counts
+too, since the tools catch their own exceptions and return a message. Set ``LLM_QPS`` /
+``LLM_USER_QPS`` to measure under a model quota (unlimited by default). With
+--baseline, the run exits non-zero if a level's throughput drops, or its p95
+latency rises, by more than the tolerance, or if its error rate goes up.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# No model quota, as in benchmarks.run
+os.environ.setdefault("LLM_QPS", "0")
+os.environ.setdefault("LLM_USER_QPS", "0")
+
+import async_calendar
+import calendar_tools
+from agent2 import build_agent_graph
+from async_calendar import iterate_in_background
+from benchmarks.fake_calendar import FakeAsyncClient, FakeCalendarService
+from benchmarks.fake_llm import ScriptedChatModel
+from benchmarks.scenarios import SCENARIOS
+from checkpointing import open_checkpointer, thread_config
+from credential_store import current_user
+from langchain_core.messages import HumanMessage, ToolMessage
+
+
+def percentile(values, q):
+    """Nearest-rank percentile `q` (0-100) of `values`."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def rss_mb():
+    """Resident memory of this process in MiB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class _Monitor:
+    """Samples the thread count and resident memory while a level runs."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="load-monitor", daemon=True)
+
+    def _sample(self):
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def session_messages(session, turns):
+    """The `turns` messages session number `session` sends, rotating through the scenarios."""
+    texts = [text for scenario in SCENARIOS for text, _ in scenario.turns]
+    start = (session * 7) % len(texts)
+    return list(itertools.islice(itertools.cycle(texts), start, start + turns))
+
+
+def is_tool_error(message):
+    """Whether a tool result reports a failure, raised through ToolNode or caught by the tool."""
+    return getattr(message, "status", "success") == "error" or (
+        isinstance(message.content, str) and message.content.startswith("Sorry, I couldn't")
+    )
+
+
+def run_turn(graph, text, config):
+    """Stream one turn the way ``app.py`` does; returns the names of tools that failed."""
+    failed = []
+    for mode, chunk in iterate_in_background(
+        graph.astream({"messages": [HumanMessage(text)]}, config, stream_mode=["messages", "updates"])
+    ):
+        if mode != "updates":
+            continue
+        for update in chunk.values():
+            for message in (update or {}).get("messages", []):
+                if isinstance(message, ToolMessage) and is_tool_error(message):
+                    failed.append(message.name)
+    return failed
+
+
+def run_session(graph, session, turns, think_time):
+    """Run one session's turns; returns (latencies in ms, error type names)."""
+    thread_id = f"load-{uuid.uuid4().hex}"
+    latencies, errors = [], []
+    for i, text in enumerate(session_messages(session, turns)):
+        if i and think_time:
+            time.sleep(think_time)
+        started = time.perf_counter()
+        try:
+            for name in run_turn(graph, text, thread_config(thread_id)):
+                logging.error(f"Session {session} turn {i}: tool {name} failed")
+                errors.append(f"tool:{name}")
+        except Exception as e:
+            logging.error(f"Session {session} turn {i} failed: {e!r}")
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, errors
+
+
+def run_level(graph, concurrency, args):
+    """Run `concurrency` sessions at once against fresh fake calendars."""
+    users = args.users or concurrency
+    calendars = {
+        f"load-user-{i}": FakeCalendarService(
+            num_events=args.events, days=args.days, latency=args.api_latency, seed=i
+        )
+        for i in range(users)
+    }
+    calendar_tools.service_factory = lambda: calendars[current_user.get()]
+    async_calendar.client_factory = FakeAsyncClient
+
+    def session(i):
+        # Set in the worker's own context; tools inherit it from there
+        current_user.set(f"load-user-{i % users}")
+        return run_session(graph, i, args.turns, args.think_time)
+
+    with _Monitor() as monitor, ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="load-session"
+    ) as pool:
+        started = time.perf_counter()
+        outcomes = list(pool.map(session, range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies = [ms for session_latencies, _ in outcomes for ms in session_latencies]
+    errors = Counter(name for _, session_errors in outcomes for name in session_errors)
+    api_calls = Counter()
+    for calendar in calendars.values():
+        api_calls.update(calendar.calls)
+    return {
+        "concurrency": concurrency,
+        "users": users,
+        "turns": len(latencies),
+        "wall_s": wall,
+        "throughput_tps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies, default=0.0),
+        "errors": sum(errors.values()),
+        # Per turn; a turn with several failed tools counts each of them
+        "error_rate": sum(errors.values()) / len(latencies) if latencies else 0.0,
+        "errors_by_type": dict(errors),
+        "peak_threads": monitor.peak_threads,
+        "peak_rss_mb": monitor.peak_rss_mb,
+        "api_calls": sum(api_calls.values()),
+        "api_calls_by_method": dict(api_calls),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against `baseline`."""
+    base_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    regressions = []
+    for level in results["levels"]:
+        base = base_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        name = f"concurrency {level['concurrency']}"
+        if level["throughput_tps"] < base["throughput_tps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {base['throughput_tps']:.1f} -> {level['throughput_tps']:.1f} turns/s"
+            )
+        if level["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.1f} ms -> {level['p95_ms']:.1f} ms")
+        if level["error_rate"] > base["error_rate"]:
+            regressions.append(f"{name}: error rate {base['error_rate']:.1%} -> {level['error_rate']:.1%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32],
+                        help="concurrent sessions per level")
+    parser.add_argument("--turns", type=int, default=5, help="turns per session")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds per Calendar round trip")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per model call")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds between a session's turns")
+    parser.add_argument("--users", type=int, default=0,
+                        help="distinct users (and calendars) shared by the sessions; default one each")
+    parser.add_argument("--events", type=int, default=200, help="events per fake calendar")
+    parser.add_argument("--days", type=int, default=30, help="days the events are spread over")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    scripts = {text: script for scenario in SCENARIOS for text, script in scenario.turns}
+    model = ScriptedChatModel(script=lambda text: scripts[text](), latency=args.llm_latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        # One graph and checkpointer shared by every session, as in the app
+        graph = build_agent_graph(model, checkpointer=open_checkpointer(os.path.join(tmp, "load.sqlite")))
+        # Warm-up: lazy imports and first-use setup stay out of the measurements
+        warm_up = argparse.Namespace(**{**vars(args), "turns": 1})
+        run_level(graph, 1, warm_up)
+        levels = [run_level(graph, concurrency, args) for concurrency in args.concurrency]
+
+    results = {
+        "config": {
+            key: getattr(args, key)
+            for key in ("turns", "api_latency", "llm_latency", "think_time", "users", "events", "days")
+        },
+        "levels": levels,
+    }
+
+    print(
+        f"{'sessions':>8}{'turns':>7}{'turns/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'errors':>8}{'threads':>9}{'rss MB':>9}"
+    )
+    for level in levels:
+        print(
+            f"{level['concurrency']:>8}{level['turns']:>7}{level['throughput_tps']:>9.1f}"
+            f"{level['p50_ms']:>9.1f}{level['p95_ms']:>9.1f}{level['p99_ms']:>9.1f}"
+            f"{level['errors']:>8}{level['peak_threads']:>9}{level['peak_rss_mb']:>9.1f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Run the offline benchmark scenarios and report latency and call counts.
+
+Usage:
+    python -m benchmarks.run [--api-latency 0.05] [--llm-latency 0.2]
+                             [--only NAME ...] [--output results.json]
+                             [--baseline previous.json --tolerance 0.25]
+
+No network access is needed: the Calendar API is replaced by an in-process
+fake and Gemini by a scripted model. With --baseline, the run exits non-zero
+if any scenario makes more API/LLM calls than the baseline, or its median
+turn latency regresses by more than the tolerance.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+# Turns run back to back against a scripted model with no quota to protect
+os.environ.setdefault("LLM_QPS", "0")
+os.environ.setdefault("LLM_USER_QPS", "0")
+
+import calendar_tools
+from agent2 import build_agent_graph
+from benchmarks.fake_calendar import FakeCalendarService
+from benchmarks.fake_llm import ScriptedChatModel
+from benchmarks.scenarios import SCENARIOS
+from langchain_core.messages import HumanMessage
+from tracing import TracingCallbackHandler, start_trace
+import memo_cache
+import rate_limit
+
+
+def run_scenario(scenario, api_latency, llm_latency):
+    calendar = FakeCalendarService(
+        num_events=scenario.num_events,
+        days=scenario.days,
+        latency=api_latency,
+        timezone=scenario.timezone,
+        recurring=scenario.recurring,
+    )
+    calendar_tools.service_factory = lambda: calendar
+    scripts = dict(scenario.turns)
+    model = ScriptedChatModel(script=lambda text: scripts[text](), latency=llm_latency)
+    graph = build_agent_graph(model)
+
+    messages = []
+    turns = []
+    for text, _ in scenario.turns:
+        api_before, llm_before = calendar.total_calls, model.calls
+        trace = start_trace()
+        config = {"callbacks": [TracingCallbackHandler(trace)]}
+        started = time.perf_counter()
+        result = graph.invoke({"messages": messages + [HumanMessage(text)]}, config)
+        elapsed = time.perf_counter() - started
+        messages = result["messages"]
+        turns.append(
+            {
+                "latency_ms": elapsed * 1000,
+                "api_calls": calendar.total_calls - api_before,
+                "llm_calls": model.calls - llm_before,
+                "ms_by_kind": trace.summary(),
+            }
+        )
+
+    latencies = [t["latency_ms"] for t in turns]
+    return {
+        "description": scenario.description,
+        "turns": turns,
+        "p50_ms": statistics.median(latencies),
+        "max_ms": max(latencies),
+        "total_ms": sum(latencies),
+        "api_calls": calendar.total_calls,
+        "api_calls_by_method": dict(calendar.calls),
+        "llm_calls": model.calls,
+        "rate_limit": rate_limit.stats(),
+        "memo_cache": memo_cache.stats(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against `baseline`."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ("api_calls", "llm_calls"):
+            if result[key] > base[key]:
+                regressions.append(f"{name}: {key} {base[key]} -> {result[key]}")
+        if result["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p50 {base['p50_ms']:.1f} ms -> {result['p50_ms']:.1f} ms"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds per Calendar round trip")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per model call")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 latency regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    results = {}
+    for scenario in SCENARIOS:
+        if args.only and scenario.name not in args.only:
+            continue
+        results[scenario.name] = run_scenario(scenario, args.api_latency, args.llm_latency)
+
+    print(f"{'scenario':<28}{'turns':>6}{'p50 ms':>10}{'max ms':>10}{'api':>6}{'llm':>6}")
+    for name, r in results.items():
+        print(
+            f"{name:<28}{len(r['turns']):>6}{r['p50_ms']:>10.1f}{r['max_ms']:>10.1f}"
+            f"{r['api_calls']:>6}{r['llm_calls']:>6}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Benchmark scenarios: a calendar shape plus scripted user turns."""
+import datetime
+from dataclasses import dataclass
+from typing import Callable, List, Tuple
+
+from benchmarks.fake_llm import tool_call
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    # (user message, tool calls the scripted model makes for it)
+    turns: List[Tuple[str, Callable[[], List[dict]]]]
+    num_events: int = 200
+    days: int = 30
+    timezone: str = "UTC"
+    recurring: int = 0
+
+
+def _day(offset):
+    return datetime.date.today() + datetime.timedelta(days=offset)
+
+
+def _next_monday():
+    today = datetime.date.today()
+    return today + datetime.timedelta(days=(7 - today.weekday()) % 7 or 7)
+
+
+SCENARIOS = [
+    Scenario(
+        name="list_50_events",
+        description="List the next 50 events from a 500-event calendar",
+        turns=[("List my next 50 events", lambda: [tool_call("list_events", num=50)])],
+        num_events=500,
+        days=60,
+    ),
+    Scenario(
+        name="list_recurring_quarter",
+        description="List three months of a calendar with 20 open-ended recurring meetings",
+        turns=[
+            (
+                "What's on my calendar over the next three months?",
+                lambda: [
+                    tool_call(
+                        "list_events",
+                        num=50,
+                        start_datetime=f"{_day(0).isoformat()}T00:00:00Z",
+                        end_datetime=f"{_day(91).isoformat()}T00:00:00Z",
+                    )
+                ],
+            )
+        ],
+        num_events=300,
+        days=90,
+        recurring=20,
+    ),
+    Scenario(
+        name="find_free_slot_busy_week",
+        description="Find 60-minute free slots in a busy working week",
+        turns=[
+            (
+                "When am I free for an hour next week?",
+                lambda: [
+                    tool_call(
+                        "find_free_slots",
+                        start_date=_next_monday().isoformat(),
+                        end_date=(_next_monday() + datetime.timedelta(days=4)).isoformat(),
+                        duration_minutes=60,
+                    )
+                ],
+            )
+        ],
+        num_events=300,
+        days=14,
+    ),
+    Scenario(
+        name="clear_a_day",
+        description="Delete every event on one busy day",
+        turns=[
+            (
+                "Clear my calendar the day after tomorrow",
+                lambda: [
+                    tool_call(
+                        "delete_events_in_range",
+                        start_datetime=f"{_day(2).isoformat()}T00:00:00Z",
+                        end_datetime=f"{_day(3).isoformat()}T00:00:00Z",
+                    )
+                ],
+            )
+        ],
+        num_events=300,
+        days=10,
+    ),
+    Scenario(
+        name="repeated_availability",
+        description="Ask about availability five times in one session",
+        turns=[
+            (
+                f"Am I free on {_day(i + 1).strftime('%B %d, %Y')} at 3 PM?",
+                lambda i=i: [
+                    tool_call(
+                        "check_availability",
+                        date=_day(i + 1).strftime("%B %d, %Y"),
+                        time="03:00 PM",
+                    )
+                ],
+            )
+            for i in range(5)
+        ],
+        num_events=200,
+        days=14,
+    ),
+    Scenario(
+        name="create_week_of_meetings",
+        description="Create five daily meetings in one request",
+        turns=[
+            (
+                "Set up a 30 minute standup at 9 AM every day next week",
+                lambda: [
+                    tool_call(
+                        "create_events",
+                        events=[
+                            {
+                                "summary": "Standup",
+                                "start": f"{(_next_monday() + datetime.timedelta(days=i)).isoformat()}T09:00:00",
+                                "end": f"{(_next_monday() + datetime.timedelta(days=i)).isoformat()}T09:30:00",
+                            }
+                            for i in range(5)
+                        ],
+                    )
+                ],
+            )
+        ],
+        num_events=100,
+        days=14,
+    ),
+]
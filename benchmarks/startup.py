@@ -0,0 +1,117 @@
+"""Measure cold-start cost: importing the agent and building its graph.
+
+Usage:
+    python -m benchmarks.startup [--runs 5] [--output startup.json]
+                                 [--baseline previous.json --tolerance 0.25]
+
+Every run starts a fresh interpreter with an empty checkpoint database, so
+nothing is shared between runs. It reports the median time to import
+``agent2``, to build the model client and compiled graph on first use, and to
+fetch them again (which should cost nothing), plus the slowest imports under
+``agent2`` according to ``python -X importtime``. No network access is needed.
+With --baseline, the run exits non-zero if import or first-build time regresses
+by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ("import_ms", "first_build_ms", "cached_build_ms")
+
+_PROBE = """
+import json, time
+started = time.perf_counter()
+import agent2
+imported = time.perf_counter()
+agent2.get_agent_graph()
+built = time.perf_counter()
+agent2.get_agent_graph()
+cached = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_build_ms": (built - imported) * 1000,
+    "cached_build_ms": (cached - built) * 1000,
+}))
+"""
+
+
+def slowest_imports(importtime_log, module="agent2", top=10):
+    """Direct imports of `module` by cumulative milliseconds, from ``-X importtime`` output."""
+    children = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # One leading space, then two more per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == module:
+                break
+            children = []
+        elif depth == 1:
+            children.append((name, int(cumulative) / 1000))
+    return sorted(children, key=lambda child: child[1], reverse=True)[:top]
+
+
+def run_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "CHECKPOINT_DB": os.path.join(tmp, "checkpoints.sqlite")}
+        # The model client is constructed but never called
+        env.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression")
+    args = parser.parse_args(argv)
+
+    # A warm-up run fills the bytecode cache, as on a deployed server
+    run_once()
+    runs = [run_once() for _ in range(args.runs)]
+    results = {
+        phase: statistics.median(timings[phase] for timings, _ in runs) for phase in PHASES
+    }
+    results["slowest_imports_ms"] = dict(slowest_imports(runs[-1][1]))
+
+    for phase in PHASES:
+        print(f"{phase:<20}{results[phase]:>10.1f}")
+    print("slowest imports under agent2 (cumulative ms):")
+    for name, ms in results["slowest_imports_ms"].items():
+        print(f"  {name:<40}{ms:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = [
+            f"{phase}: {baseline[phase]:.1f} ms -> {results[phase]:.1f} ms"
+            for phase in ("import_ms", "first_build_ms")
+            if phase in baseline and results[phase] > baseline[phase] * (1 + args.tolerance)
+        ]
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,41 @@
+import asyncio
 import datetime
+import itertools
 import logging
-from langchain_core.tools import tool
+from typing import List, Optional
+from langchain_core.tools import StructuredTool, tool
+from pydantic import BaseModel, Field
 from google_api import createService
+from async_calendar import get_async_client
+from batch_ops import execute_batched, is_conflict, is_gone, new_event_id
+from event_store import get_event_store, parse_iso
+from fanout import afan_out, fan_out, merge_by_start
+from ics_transfer import day_range, export_ics, format_report, ics_path, import_ics
+from memo_cache import amemoize_tool, memoize_tool
+from free_busy import (
+    afreebusy_by_calendar,
+    busy_from_events,
+    free_slots,
+    freebusy_by_calendar,
+    working_windows,
+)
+from user_settings import (
+    aget_calendars,
+    aget_user_settings,
+    get_calendars,
+    get_user_settings,
+    resolve_calendars,
+)
+
+
+# Optional zero-argument callable returning a Calendar service. The offline
+# benchmarks use it to plug in a fake backend; normally it is left unset.
+service_factory = None
 
 
 def google_Calendar_client():
+    if service_factory is not None:
+        return service_factory()
     API_NAME = "calendar"
     API_VERSION = "v3"
     SCOPES = [
@@ -17,119 +48,317 @@ def google_Calendar_client():
     return service
 
 
-@tool
-def list_events(num: int = 5):
-    """Fetch upcoming events from the user's primary Google Calendar.
+def calendar_timezone():
+    """Return the user's calendar timezone name, falling back to UTC."""
+    try:
+        return get_user_settings(google_Calendar_client()).timezone
+    except Exception as e:
+        logging.error(f"Error fetching calendar timezone: {e}")
+        return "UTC"
+
+
+async def acalendar_timezone():
+    """Async `calendar_timezone`."""
+    try:
+        calendar_service = google_Calendar_client()
+        client = get_async_client(calendar_service)
+        return (await aget_user_settings(calendar_service, client)).timezone
+    except Exception as e:
+        logging.error(f"Error fetching calendar timezone: {e}")
+        return "UTC"
 
-    Retrieves the next `num` events starting from the current time, sorted by start time.
+
+def _resolve_calendars(service, calendars):
+    """Calendar ids to query, and their display names (None when only the primary is asked for)."""
+    if not calendars or [c.strip().lower() for c in calendars] == ["primary"]:
+        return ["primary"], None
+    entries = get_calendars(service)
+    return resolve_calendars(calendars, entries), {c["id"]: c["summary"] for c in entries}
+
+
+async def _aresolve_calendars(service, client, calendars):
+    if not calendars or [c.strip().lower() for c in calendars] == ["primary"]:
+        return ["primary"], None
+    entries = await aget_calendars(service, client)
+    return resolve_calendars(calendars, entries), {c["id"]: c["summary"] for c in entries}
+
+
+def _event_body(summary, start, end, timezone):
+    """Build an insert body, interpreting the times in the calendar's timezone.
+
+    The body carries its own event id, so a retried insert cannot create a duplicate.
+    """
+    if start.endswith('Z'):
+        start = start[:-1]
+    if end.endswith('Z'):
+        end = end[:-1]
+
+    return {
+        "id": new_event_id(),
+        "summary": summary,
+        "start": {"dateTime": start, "timeZone": timezone},
+        "end": {"dateTime": end, "timeZone": timezone},
+    }
+
+
+class NewEvent(BaseModel):
+    summary: str = Field(description="Title or description of the event.")
+    start: str = Field(description="Start time in ISO 8601 datetime format (e.g., '2025-06-30T14:00:00').")
+    end: str = Field(description="End time in ISO 8601 datetime format.")
+
+
+def list_events(
+    num: Optional[int] = None,
+    start_datetime: Optional[str] = None,
+    end_datetime: Optional[str] = None,
+    calendars: Optional[List[str]] = None,
+):
+    """Fetch events from the user's Google Calendars, sorted by start time.
+
+    Without a range, retrieves the next `num` events starting from the current time.
+    With `start_datetime` and `end_datetime`, retrieves the events in that range
+    (e.g., "everything next quarter"). Either bound may be left out: with only a start,
+    the next `num` events from then on are returned (e.g., "events after Friday"); with
+    only an end, the range starts now.
 
     Args:
-        num (int): Maximum number of future events to return. Default is 5.
+        num (int): Maximum number of events to return. Default is 5 without an end
+            and 50 for a range.
+        start_datetime (str): Optional start of the range in ISO 8601 format (e.g., '2025-07-01T00:00:00Z').
+            Times without an offset are in the user's calendar timezone, as for `create_event`.
+        end_datetime (str): Optional end of the range in ISO 8601 format (e.g., '2025-10-01T00:00:00Z').
+        calendars (List[str]): Optional calendar names or ids to include (e.g., ["primary", "Team"]);
+            "all" includes every calendar. Default is the primary calendar.
     Returns:
         List[dict]: A list of dictionaries, each containing:
             - 'summary' (str): The event’s title (empty string if none).
-            - 'start' (str): The event’s start datetime in ISO 8601 format.
+            - 'start' (str): The event’s start datetime in ISO 8601 format (a date for all-day events).
+            - 'end' (str): The event’s end datetime in ISO 8601 format (a date for all-day events).
+            - 'location' (str): The event’s location, if it has one.
+            - 'description' (str): The event’s description, if it has one.
+            - 'calendar' (str): The calendar the event is on, when several were requested.
     """
     try:
         calendar_service = google_Calendar_client()
-        now = (
-            datetime.datetime.now(datetime.timezone.utc)
-            .isoformat()
-            .replace("+00:00", "Z")
+        # Repeated questions are answered from the cache until the calendar changes
+        return memoize_tool(
+            calendar_service,
+            "list_events",
+            {"num": num, "start_datetime": start_datetime, "end_datetime": end_datetime, "calendars": calendars},
+            lambda: _query_events(calendar_service, num, start_datetime, end_datetime, calendars),
         )
-        events = (
-            calendar_service.events()
-            .list(
-                calendarId="primary",
-                timeMin=now,
-                maxResults=num,
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-            .get("items", [])
-        )
-        logging.info(events)
-        return [
-            {"summary": e.get("summary", ""), "start": e["start"].get("dateTime")}
-            for e in events
-        ]
     except Exception as e:
         logging.error(f"Error fetching events: {e}")
         return []
 
 
-@tool
-def check_availability(date: str, time: str):
+def _query_events(service, num, start_datetime, end_datetime, calendars):
+    calendar_ids, labels = _resolve_calendars(service, calendars)
+    tz = get_user_settings(service).tz
+    limit = num or (50 if end_datetime else 5)
+    # One store per calendar, refreshed concurrently
+    per_calendar = fan_out(
+        lambda calendar_id: _list_from_store(
+            get_event_store(service, calendar_id), limit, start_datetime, end_datetime, tz
+        ),
+        calendar_ids,
+    )
+    return _summarize_events(calendar_ids, per_calendar, labels, limit)
+
+
+def _list_from_store(store, limit, start_datetime, end_datetime, tz):
+    # A missing end leaves the range open; a missing start means from now on
+    time_min = parse_iso(start_datetime, tz) if start_datetime else None
+    if not end_datetime:
+        return store.upcoming(limit, now=time_min)
+    time_min = time_min or datetime.datetime.now(datetime.timezone.utc)
+    return store.events_between(time_min, parse_iso(end_datetime, tz))[:limit]
+
+
+def _summarize_events(calendar_ids, per_calendar, labels, limit):
+    # Each calendar's list is already sorted, so a k-way merge is enough
+    tagged = [[(calendar_id, e) for e in events] for calendar_id, events in zip(calendar_ids, per_calendar)]
+    summaries = []
+    for calendar_id, event in itertools.islice(merge_by_start(tagged), limit):
+        data = event.to_dict()
+        if labels:
+            data["calendar"] = labels.get(calendar_id, calendar_id)
+        summaries.append(data)
+    logging.info(summaries)
+    return summaries
+
+
+def search_events(
+    query: str,
+    num: int = 5,
+    start_datetime: Optional[str] = None,
+    end_datetime: Optional[str] = None,
+):
+    """Search the user's primary Google Calendar for events by keywords.
+
+    Use this to find specific events (e.g., "when is my dentist appointment?",
+    "find the project kickoff") instead of listing many events and scanning them.
+    Titles, attendees, locations and descriptions are searched.
+
+    Args:
+        query (str): Keywords to look for (e.g., "dentist", "project kickoff").
+        num (int): Maximum number of matches to return. Default is 5.
+        start_datetime (str): Optional start of the range to search, in ISO 8601 format.
+            Without a range, only events that have not ended yet are searched.
+        end_datetime (str): Optional end of the range to search, in ISO 8601 format.
+
+    Returns:
+        List[dict]: The best matches, most relevant first, with the same fields as `list_events`.
+            A recurring event appears once, as its earliest matching occurrence.
+    """
+    try:
+        calendar_service = google_Calendar_client()
+        return memoize_tool(
+            calendar_service,
+            "search_events",
+            {"query": query, "num": num, "start_datetime": start_datetime, "end_datetime": end_datetime},
+            lambda: _search_store(
+                get_event_store(calendar_service), query, num, start_datetime, end_datetime,
+                get_user_settings(calendar_service).tz,
+            ),
+        )
+    except Exception as e:
+        logging.error(f"Error searching events: {e}")
+        return []
+
+
+def _search_store(store, query, num, start_datetime, end_datetime, tz):
+    from datetime import datetime, timezone
+
+    time_min = parse_iso(start_datetime, tz) if start_datetime else None
+    time_max = parse_iso(end_datetime, tz) if end_datetime else None
+    if time_min is None and time_max is None:
+        time_min = datetime.now(timezone.utc)
+    matches = _collapse_series(store.search(query, time_min, time_max))
+    return [event.to_dict() for event in matches[:num]]
+
+
+def _collapse_series(events):
+    # Instances of a recurring event share its UID and text, so they rank together
+    earliest = {}
+    for event in events:
+        key = event.uid or event.id
+        if key not in earliest or event.start_at < earliest[key].start_at:
+            earliest[key] = event
+    return list(earliest.values())
+
+
+def check_availability(date: str, time: str, calendars: Optional[List[str]] = None):
     """Checks if the user has free time at the given date and time.
 
     Args:
         date (str): The date for checking availability (e.g., "June 30, 2025").
         time (str): The time for checking availability (e.g., "2:00 PM").
+        calendars (List[str]): Optional calendar names or ids to include (e.g., ["primary", "Team"]);
+            "all" includes every calendar. Default is the primary calendar.
 
     Returns:
         str: A message indicating whether the user is free or busy at the given time.
     """
-    from datetime import datetime, timedelta
-
     try:
         calendar_service = google_Calendar_client()
-        datetime_str = f"{date} {time}"
-        target_datetime = datetime.strptime(datetime_str, "%B %d, %Y %I:%M %p")
-
-        # Prepare start and end times in ISO 8601 format
-        start_time = target_datetime.isoformat() + "Z"
-        end_time = (target_datetime + timedelta(hours=1)).isoformat() + "Z"
-
-        # Query events within the specified time range
-        events_result = (
-            calendar_service.events()
-            .list(
-                calendarId="primary",
-                timeMin=start_time,
-                timeMax=end_time,
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
+        return memoize_tool(
+            calendar_service,
+            "check_availability",
+            {"date": date, "time": time, "calendars": calendars},
+            lambda: _query_availability(calendar_service, date, time, calendars),
         )
-
-        events = events_result.get("items", [])
-
-        if events:
-            event_details = [
-                f"- {event.get('summary', 'No Title')} from {event['start'].get('dateTime', 'Unknown')} to {event['end'].get('dateTime', 'Unknown')}"
-                for event in events
-            ]
-            return (
-                f"You are busy during this time. Here are your events:\n"
-                + "\n".join(event_details)
-            )
-        else:
-            return "You are free during this time."
     except Exception as e:
         logging.error(f"Error checking availability: {e}")
         return f"Sorry, I couldn't check your availability due to an error: {e}"
 
 
-@tool
+def _query_availability(service, date, time, calendars):
+    tz = get_user_settings(service).tz
+    start_time, end_time = _availability_range(date, time, tz)
+    calendar_ids, labels = _resolve_calendars(service, calendars)
+    if labels:
+        # One multi-calendar FreeBusy query instead of a listing per calendar
+        busy = freebusy_by_calendar(service, start_time, end_time, calendar_ids)
+        return _calendars_availability_message(busy, labels, tz)
+
+    # Query events within the specified time range
+    events = get_event_store(service).events_between(start_time, end_time)
+    return _availability_message(events)
+
+
+def _availability_range(date, time, tz):
+    from datetime import datetime, timedelta
+
+    datetime_str = f"{date} {time}"
+    target_datetime = datetime.strptime(datetime_str, "%B %d, %Y %I:%M %p")
+
+    # The user means wall-clock time in their calendar's timezone
+    start_time = parse_iso(target_datetime.replace(tzinfo=tz).isoformat())
+    return start_time, start_time + timedelta(hours=1)
+
+
+def _availability_message(events):
+    if events:
+        event_details = [
+            f"- {event.summary or 'No Title'} from {event.start} to {event.end}"
+            for event in events
+        ]
+        return (
+            "You are busy during this time. Here are your events:\n"
+            + "\n".join(event_details)
+        )
+    else:
+        return "You are free during this time."
+
+
+def _calendars_availability_message(busy_by_calendar, labels, tz):
+    busy = {calendar_id: periods for calendar_id, periods in busy_by_calendar.items() if periods}
+    if not busy:
+        return "You are free during this time on all requested calendars."
+    details = [
+        f"- {labels.get(calendar_id, calendar_id)}: "
+        + ", ".join(
+            f"{start.astimezone(tz).strftime('%I:%M %p')} to {end.astimezone(tz).strftime('%I:%M %p')}"
+            for start, end in periods
+        )
+        for calendar_id, periods in busy.items()
+    ]
+    return "You are busy during this time on these calendars:\n" + "\n".join(details)
+
+
 def get_current_date():
     """Provides the current date in a user-friendly format.
 
+    The date is today's date in the user's calendar timezone, not the server's.
+
     Returns:
         str: The current date in a format like "June 27, 2025."
     """
-    from datetime import datetime
+    try:
+        now = get_user_settings(google_Calendar_client()).now()
+    except Exception as e:
+        logging.error(f"Error fetching calendar timezone: {e}")
+        now = datetime.datetime.now(datetime.timezone.utc)
+    return now.strftime("%B %d, %Y")
 
-    return datetime.now().strftime("%B %d, %Y")
+
+def _deleted_message(events, errors):
+    if not errors:
+        return f"Deleted {len(events)} event(s) successfully."
+    logging.error(f"Error deleting event(s): {errors[0]}")
+    return (
+        f"Deleted {len(events) - len(errors)} of {len(events)} event(s). "
+        f"Sorry, I couldn't delete the rest due to an error: {errors[0]}"
+    )
 
 
-@tool
 def delete_event_by_datetime(start_datetime: str, end_datetime: str):
     """Delete an event from the user's primary Google Calendar based on its time and date.
 
     Args:
         start_datetime (str): The start time of the event in ISO 8601 format (e.g., '2025-06-30T14:00:00Z').
+            Times without an offset are in the user's calendar timezone, as for `create_event`.
         end_datetime (str): The end time of the event in ISO 8601 format (e.g., '2025-06-30T15:00:00Z').
 
     Returns:
@@ -137,36 +366,35 @@ def delete_event_by_datetime(start_datetime: str, end_datetime: str):
     """
     try:
         calendar_service = google_Calendar_client()
+        store = get_event_store(calendar_service)
 
-        events_result = (
-            calendar_service.events()
-            .list(
-                calendarId="primary",
-                timeMin=start_datetime,
-                timeMax=end_datetime,
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-        )
-        events = events_result.get("items", [])
+        # Pull any pending changes first so we never act on a stale copy
+        store.refresh(force=True)
+        tz = get_user_settings(calendar_service).tz
+        events = store.events_between(parse_iso(start_datetime, tz), parse_iso(end_datetime, tz))
 
         if not events:
             return "No events found for the specified time and date."
 
+        errors = []
         for event in events:
-            event_id = event["id"]
-            calendar_service.events().delete(
-                calendarId="primary", eventId=event_id
-            ).execute()
-
-        return f"Deleted {len(events)} event(s) successfully."
+            try:
+                calendar_service.events().delete(
+                    calendarId="primary", eventId=event.id
+                ).execute()
+            except Exception as e:
+                # Already gone, e.g. a retry after the first attempt went through
+                if not is_gone(e):
+                    errors.append(e)
+                    continue
+            store.record_delete(event.id)
+
+        return _deleted_message(events, errors)
     except Exception as e:
         logging.error(f"Error deleting event(s): {e}")
         return f"Sorry, I couldn't delete the event(s) due to an error: {e}"
 
 
-@tool
 def create_event(summary: str, start: str, end: str):
     """Create a new event in the user's primary Google Calendar.
     Args:
@@ -179,26 +407,585 @@ def create_event(summary: str, start: str, end: str):
     """
     try:
         calendar_service = google_Calendar_client()
-        settings = calendar_service.settings().get(setting="timezone").execute()
-        timezone = settings.get("value", "UTC")
+        timezone = get_user_settings(calendar_service).timezone
         logging.info(f"Using timezone: {timezone}")
 
-        if start.endswith('Z'):
-            start = start[:-1]
-        if end.endswith('Z'):
-            end = end[:-1]
-
-        ev = {
-            "summary": summary,
-            "start": {"dateTime": start, "timeZone": timezone},
-            "end": {"dateTime": end, "timeZone": timezone},
-        }
+        ev = _event_body(summary, start, end, timezone)
         logging.info(f"Creating event: {ev}")
-        created = (
-            calendar_service.events().insert(calendarId="primary", body=ev).execute()
+        store = get_event_store(calendar_service)
+        try:
+            created = (
+                calendar_service.events().insert(calendarId="primary", body=ev).execute()
+            )
+        except Exception as e:
+            if not is_conflict(e):
+                raise
+            # An earlier attempt went through; the next sync picks the event up
+            store.invalidate()
+            return "✅ Event created"
+        store.record_insert(created)
+        return created.get("htmlLink", "✅ Event created")
+
+    except Exception as e:
+        logging.error(f"Error creating event: {e}")
+        return f"Sorry, I couldn't create the event due to an error: {e}"
+
+
+def create_events(events: List[NewEvent]):
+    """Create several events in the user's primary Google Calendar in one step.
+
+    Use this instead of calling `create_event` repeatedly when the user asks for
+    more than one event (e.g., "set up a standup every day next week").
+
+    Args:
+        events (List[NewEvent]): The events to create, each with a summary, start and end.
+
+    Returns:
+        str: How many events were created, with a line per event that failed.
+    """
+    try:
+        calendar_service = google_Calendar_client()
+        timezone = get_user_settings(calendar_service).timezone
+        store = get_event_store(calendar_service)
+
+        requests = [
+            calendar_service.events().insert(
+                calendarId="primary",
+                body=_event_body(ev.summary, ev.start, ev.end, timezone),
+            )
+            for ev in events
+        ]
+        results = execute_batched(calendar_service, requests)
+
+        failures = []
+        for ev, (created, error) in zip(events, results):
+            if error is None:
+                store.record_insert(created)
+            elif is_conflict(error):
+                # Created by an attempt whose response was lost
+                store.invalidate()
+            else:
+                failures.append(f"- {ev.summary} ({ev.start}): {error}")
+
+        message = f"Created {len(events) - len(failures)} of {len(events)} event(s)."
+        if failures:
+            message += " These could not be created:\n" + "\n".join(failures)
+        return message
+    except Exception as e:
+        logging.error(f"Error creating events: {e}")
+        return f"Sorry, I couldn't create the events due to an error: {e}"
+
+
+def delete_events_in_range(start_datetime: str, end_datetime: str):
+    """Delete every event in a time range from the user's primary Google Calendar in one step.
+
+    Use this to clear a day or a longer period with many events.
+
+    Args:
+        start_datetime (str): Start of the range in ISO 8601 format (e.g., '2025-06-30T00:00:00Z').
+            Times without an offset are in the user's calendar timezone, as for `create_event`.
+        end_datetime (str): End of the range in ISO 8601 format (e.g., '2025-07-01T00:00:00Z').
+
+    Returns:
+        str: How many events were deleted, with a line per event that failed.
+    """
+    try:
+        calendar_service = google_Calendar_client()
+        store = get_event_store(calendar_service)
+
+        store.refresh(force=True)
+        tz = get_user_settings(calendar_service).tz
+        events = store.events_between(parse_iso(start_datetime, tz), parse_iso(end_datetime, tz))
+        if not events:
+            return "No events found for the specified time and date."
+
+        requests = [
+            calendar_service.events().delete(calendarId="primary", eventId=event.id)
+            for event in events
+        ]
+        results = execute_batched(calendar_service, requests)
+
+        failures = []
+        for event, (_, error) in zip(events, results):
+            if error is None or is_gone(error):
+                store.record_delete(event.id)
+            else:
+                failures.append(f"- {event.summary or 'No Title'}: {error}")
+
+        message = f"Deleted {len(events) - len(failures)} of {len(events)} event(s)."
+        if failures:
+            message += " These could not be deleted:\n" + "\n".join(failures)
+        return message
+    except Exception as e:
+        logging.error(f"Error deleting events: {e}")
+        return f"Sorry, I couldn't delete the events due to an error: {e}"
+
+
+def find_free_slots(
+    start_date: str,
+    end_date: str,
+    duration_minutes: int = 60,
+    work_start: Optional[str] = None,
+    work_end: Optional[str] = None,
+    include_weekends: bool = False,
+    max_results: int = 10,
+    calendars: Optional[List[str]] = None,
+):
+    """Find all free time slots of at least the given length within working hours.
+
+    Use this instead of calling `check_availability` repeatedly when the user asks
+    when they are free, or wants a time suggested for a meeting.
+
+    Args:
+        start_date (str): First day to search, in ISO format (e.g., '2025-06-30').
+        end_date (str): Last day to search (inclusive), in ISO format.
+        duration_minutes (int): Minimum length of a free slot in minutes. Default is 60.
+        work_start (str): Start of working hours in 24-hour 'HH:MM' format. Defaults to the user's working hours.
+        work_end (str): End of working hours in 24-hour 'HH:MM' format. Defaults to the user's working hours.
+        include_weekends (bool): Whether Saturdays and Sundays are searched. Default is False.
+        max_results (int): Maximum number of slots to return. Default is 10.
+        calendars (List[str]): Optional calendar names or ids that must all be free (e.g., ["primary", "Team"]);
+            "all" includes every calendar. Default is the primary calendar.
+
+    Returns:
+        str: A list of free slots in the user's calendar timezone, or a message if none were found.
+    """
+    args = {
+        "start_date": start_date, "end_date": end_date, "duration_minutes": duration_minutes,
+        "work_start": work_start, "work_end": work_end, "include_weekends": include_weekends,
+        "max_results": max_results, "calendars": calendars,
+    }
+    try:
+        calendar_service = google_Calendar_client()
+        return memoize_tool(
+            calendar_service,
+            "find_free_slots",
+            args,
+            lambda: _query_free_slots(calendar_service, **args),
+        )
+    except Exception as e:
+        logging.error(f"Error finding free slots: {e}")
+        return f"Sorry, I couldn't find free slots due to an error: {e}"
+
+
+def _query_free_slots(service, start_date, end_date, duration_minutes, work_start, work_end,
+                      include_weekends, max_results, calendars):
+    settings = get_user_settings(service)
+    windows = _slot_windows(
+        start_date, end_date, settings, work_start, work_end, include_weekends
+    )
+    if not windows:
+        return "There are no working hours in the requested date range."
+
+    calendar_ids, labels = _resolve_calendars(service, calendars)
+    if labels:
+        busy_by_calendar = freebusy_by_calendar(
+            service, windows[0][0], windows[-1][1], calendar_ids
         )
+        busy = [period for periods in busy_by_calendar.values() for period in periods]
+    else:
+        busy = busy_from_events(
+            get_event_store(service).events_between(windows[0][0], windows[-1][1])
+        )
+    return _slots_message(busy, windows, settings.tz, duration_minutes, max_results)
+
+
+def _slot_windows(start_date, end_date, settings, work_start, work_end, include_weekends):
+    from datetime import date, time
+
+    # Anything the model left out falls back to the user's settings
+    return list(
+        working_windows(
+            date.fromisoformat(start_date),
+            date.fromisoformat(end_date),
+            settings.tz,
+            time.fromisoformat(work_start or settings.work_start),
+            time.fromisoformat(work_end or settings.work_end),
+            include_weekends,
+        )
+    )
+
+
+def _slots_message(busy, windows, tz, duration_minutes, max_results):
+    from datetime import timedelta
+
+    slots = free_slots(
+        busy,
+        windows,
+        timedelta(minutes=duration_minutes),
+        limit=max_results,
+    )
+    if not slots:
+        return "You have no free slots of that length in the requested range."
+
+    slot_details = [
+        f"- {start.astimezone(tz).strftime('%B %d, %Y %I:%M %p')} to {end.astimezone(tz).strftime('%I:%M %p')}"
+        for start, end in slots
+    ]
+    return "You are free during these times:\n" + "\n".join(slot_details)
+
+
+@tool
+def import_ics_file(file_name: str):
+    """Import every event from an .ics file the user uploaded into their primary Google Calendar.
+
+    Use this instead of `create_event` or `create_events` when the user asks to import
+    or migrate a calendar file. Events already in the calendar (same UID) are skipped.
+
+    Args:
+        file_name (str): Name of the uploaded .ics file (e.g., "team-calendar.ics").
+
+    Returns:
+        str: How many events were imported, skipped and failed.
+    """
+    try:
+        calendar_service = google_Calendar_client()
+        with open(ics_path(file_name), encoding="utf-8", errors="replace") as f:
+            return format_report(import_ics(calendar_service, f))
+    except FileNotFoundError:
+        return f"There is no uploaded file named {file_name!r}."
+    except Exception as e:
+        logging.error(f"Error importing {file_name}: {e}")
+        return f"Sorry, I couldn't import the file due to an error: {e}"
+
+
+@tool
+def export_ics_file(start_date: str, end_date: str, file_name: str = "calendar.ics"):
+    """Export the events of the user's primary Google Calendar in a date range to an .ics file.
+
+    The file can then be downloaded from the sidebar.
+
+    Args:
+        start_date (str): First day to export, in ISO format (e.g., '2025-01-01').
+        end_date (str): Last day to export (inclusive), in ISO format.
+        file_name (str): Name of the .ics file to write. Default is "calendar.ics".
+
+    Returns:
+        str: How many events were exported, and the file name.
+    """
+    try:
+        calendar_service = google_Calendar_client()
+        time_min, time_max = day_range(start_date, end_date, get_user_settings(calendar_service).tz)
+        with open(ics_path(file_name), "w", encoding="utf-8", newline="") as f:
+            count = export_ics(calendar_service, f, time_min, time_max)
+        return f"Exported {count} event(s) to {file_name}."
+    except Exception as e:
+        logging.error(f"Error exporting events: {e}")
+        return f"Sorry, I couldn't export the events due to an error: {e}"
+
+
+# Native async implementations, used when the graph runs via ainvoke/astream.
+# They share the event store with the sync tools but go through the httpx
+# transport in async_calendar, so parallel tool calls overlap their I/O.
+
+
+async def _alist_events(
+    num: Optional[int] = None,
+    start_datetime: Optional[str] = None,
+    end_datetime: Optional[str] = None,
+    calendars: Optional[List[str]] = None,
+):
+    try:
+        calendar_service = google_Calendar_client()
+        client = get_async_client(calendar_service)
+        return await amemoize_tool(
+            calendar_service,
+            client,
+            "list_events",
+            {"num": num, "start_datetime": start_datetime, "end_datetime": end_datetime, "calendars": calendars},
+            lambda: _aquery_events(calendar_service, client, num, start_datetime, end_datetime, calendars),
+        )
+    except Exception as e:
+        logging.error(f"Error fetching events: {e}")
+        return []
+
+
+async def _aquery_events(service, client, num, start_datetime, end_datetime, calendars):
+    settings, (calendar_ids, labels) = await asyncio.gather(
+        aget_user_settings(service, client),
+        _aresolve_calendars(service, client, calendars),
+    )
+    limit = num or (50 if end_datetime else 5)
+
+    async def list_one(calendar_id):
+        store = get_event_store(service, calendar_id)
+        await store.arefresh(client)
+        return _list_from_store(store, limit, start_datetime, end_datetime, settings.tz)
+
+    per_calendar = await afan_out(list_one, calendar_ids)
+    return _summarize_events(calendar_ids, per_calendar, labels, limit)
+
+
+async def _asearch_events(
+    query: str,
+    num: int = 5,
+    start_datetime: Optional[str] = None,
+    end_datetime: Optional[str] = None,
+):
+    try:
+        calendar_service = google_Calendar_client()
+        client = get_async_client(calendar_service)
+        store = get_event_store(calendar_service)
+
+        async def search():
+            settings, _ = await asyncio.gather(
+                aget_user_settings(calendar_service, client), store.arefresh(client)
+            )
+            return _search_store(store, query, num, start_datetime, end_datetime, settings.tz)
+
+        return await amemoize_tool(
+            calendar_service,
+            client,
+            "search_events",
+            {"query": query, "num": num, "start_datetime": start_datetime, "end_datetime": end_datetime},
+            search,
+        )
+    except Exception as e:
+        logging.error(f"Error searching events: {e}")
+        return []
+
+
+async def _acheck_availability(date: str, time: str, calendars: Optional[List[str]] = None):
+    try:
+        calendar_service = google_Calendar_client()
+        client = get_async_client(calendar_service)
+        return await amemoize_tool(
+            calendar_service,
+            client,
+            "check_availability",
+            {"date": date, "time": time, "calendars": calendars},
+            lambda: _aquery_availability(calendar_service, client, date, time, calendars),
+        )
+    except Exception as e:
+        logging.error(f"Error checking availability: {e}")
+        return f"Sorry, I couldn't check your availability due to an error: {e}"
+
+
+async def _aquery_availability(service, client, date, time, calendars):
+    calendar_ids, labels = await _aresolve_calendars(service, client, calendars)
+    if labels:
+        settings = await aget_user_settings(service, client)
+        start_time, end_time = _availability_range(date, time, settings.tz)
+        busy = await afreebusy_by_calendar(client, start_time, end_time, calendar_ids)
+        return _calendars_availability_message(busy, labels, settings.tz)
+
+    store = get_event_store(service)
+    settings, _ = await asyncio.gather(
+        aget_user_settings(service, client), store.arefresh(client)
+    )
+    start_time, end_time = _availability_range(date, time, settings.tz)
+    return _availability_message(store.events_between(start_time, end_time))
+
+
+async def _aget_current_date():
+    try:
+        calendar_service = google_Calendar_client()
+        settings = await aget_user_settings(calendar_service, get_async_client(calendar_service))
+        now = settings.now()
+    except Exception as e:
+        logging.error(f"Error fetching calendar timezone: {e}")
+        now = datetime.datetime.now(datetime.timezone.utc)
+    return now.strftime("%B %d, %Y")
+
+
+async def _adelete_event_by_datetime(start_datetime: str, end_datetime: str):
+    try:
+        calendar_service = google_Calendar_client()
+        client = get_async_client(calendar_service)
+        store = get_event_store(calendar_service)
+
+        # Pull any pending changes first so we never act on a stale copy
+        settings, _ = await asyncio.gather(
+            aget_user_settings(calendar_service, client), store.arefresh(client, force=True)
+        )
+        tz = settings.tz
+        events = store.events_between(parse_iso(start_datetime, tz), parse_iso(end_datetime, tz))
+
+        if not events:
+            return "No events found for the specified time and date."
+
+        results = await asyncio.gather(
+            *(client.delete_event(event.id) for event in events),
+            return_exceptions=True,
+        )
+        errors = []
+        for event, result in zip(events, results):
+            if isinstance(result, Exception) and not is_gone(result):
+                errors.append(result)
+            else:
+                store.record_delete(event.id)
+
+        return _deleted_message(events, errors)
+    except Exception as e:
+        logging.error(f"Error deleting event(s): {e}")
+        return f"Sorry, I couldn't delete the event(s) due to an error: {e}"
+
+
+async def _acreate_event(summary: str, start: str, end: str):
+    try:
+        calendar_service = google_Calendar_client()
+        client = get_async_client(calendar_service)
+        timezone = (await aget_user_settings(calendar_service, client)).timezone
+        logging.info(f"Using timezone: {timezone}")
+
+        ev = _event_body(summary, start, end, timezone)
+        logging.info(f"Creating event: {ev}")
+        store = get_event_store(calendar_service)
+        try:
+            created = await client.insert_event(ev)
+        except Exception as e:
+            if not is_conflict(e):
+                raise
+            store.invalidate()
+            return "✅ Event created"
+        store.record_insert(created)
         return created.get("htmlLink", "✅ Event created")
 
     except Exception as e:
         logging.error(f"Error creating event: {e}")
         return f"Sorry, I couldn't create the event due to an error: {e}"
+
+
+async def _afind_free_slots(
+    start_date: str,
+    end_date: str,
+    duration_minutes: int = 60,
+    work_start: Optional[str] = None,
+    work_end: Optional[str] = None,
+    include_weekends: bool = False,
+    max_results: int = 10,
+    calendars: Optional[List[str]] = None,
+):
+    args = {
+        "start_date": start_date, "end_date": end_date, "duration_minutes": duration_minutes,
+        "work_start": work_start, "work_end": work_end, "include_weekends": include_weekends,
+        "max_results": max_results, "calendars": calendars,
+    }
+    try:
+        calendar_service = google_Calendar_client()
+        client = get_async_client(calendar_service)
+        return await amemoize_tool(
+            calendar_service,
+            client,
+            "find_free_slots",
+            args,
+            lambda: _aquery_free_slots(calendar_service, client, **args),
+        )
+    except Exception as e:
+        logging.error(f"Error finding free slots: {e}")
+        return f"Sorry, I couldn't find free slots due to an error: {e}"
+
+
+async def _aquery_free_slots(service, client, start_date, end_date, duration_minutes, work_start,
+                             work_end, include_weekends, max_results, calendars):
+    settings, (calendar_ids, labels) = await asyncio.gather(
+        aget_user_settings(service, client),
+        _aresolve_calendars(service, client, calendars),
+    )
+    windows = _slot_windows(
+        start_date, end_date, settings, work_start, work_end, include_weekends
+    )
+    if not windows:
+        return "There are no working hours in the requested date range."
+
+    if labels:
+        busy_by_calendar = await afreebusy_by_calendar(
+            client, windows[0][0], windows[-1][1], calendar_ids
+        )
+        busy = [period for periods in busy_by_calendar.values() for period in periods]
+    else:
+        store = get_event_store(service)
+        await store.arefresh(client)
+        busy = busy_from_events(store.events_between(windows[0][0], windows[-1][1]))
+    return _slots_message(busy, windows, settings.tz, duration_minutes, max_results)
+
+
+async def _asettle(fn, items):
+    """Await ``fn(item)`` for every item; one (result, exception) pair each, like ``execute_batched``."""
+    async def settle(item):
+        try:
+            return await fn(item), None
+        except Exception as e:
+            return None, e
+
+    return await afan_out(settle, items)
+
+
+async def _acreate_events(events: List[NewEvent]):
+    try:
+        calendar_service = google_Calendar_client()
+        client = get_async_client(calendar_service)
+        timezone = (await aget_user_settings(calendar_service, client)).timezone
+        store = get_event_store(calendar_service)
+
+        # No batch endpoint here: the inserts run concurrently, each retried and rate limited
+        results = await _asettle(
+            lambda ev: client.insert_event(_event_body(ev.summary, ev.start, ev.end, timezone)),
+            events,
+        )
+
+        failures = []
+        for ev, (created, error) in zip(events, results):
+            if error is None:
+                store.record_insert(created)
+            elif is_conflict(error):
+                store.invalidate()
+            else:
+                failures.append(f"- {ev.summary} ({ev.start}): {error}")
+
+        message = f"Created {len(events) - len(failures)} of {len(events)} event(s)."
+        if failures:
+            message += " These could not be created:\n" + "\n".join(failures)
+        return message
+    except Exception as e:
+        logging.error(f"Error creating events: {e}")
+        return f"Sorry, I couldn't create the events due to an error: {e}"
+
+
+async def _adelete_events_in_range(start_datetime: str, end_datetime: str):
+    try:
+        calendar_service = google_Calendar_client()
+        client = get_async_client(calendar_service)
+        store = get_event_store(calendar_service)
+
+        settings, _ = await asyncio.gather(
+            aget_user_settings(calendar_service, client), store.arefresh(client, force=True)
+        )
+        tz = settings.tz
+        events = store.events_between(parse_iso(start_datetime, tz), parse_iso(end_datetime, tz))
+        if not events:
+            return "No events found for the specified time and date."
+
+        results = await _asettle(lambda event: client.delete_event(event.id), events)
+
+        failures = []
+        for event, (_, error) in zip(events, results):
+            if error is None or is_gone(error):
+                store.record_delete(event.id)
+            else:
+                failures.append(f"- {event.summary or 'No Title'}: {error}")
+
+        message = f"Deleted {len(events) - len(failures)} of {len(events)} event(s)."
+        if failures:
+            message += " These could not be deleted:\n" + "\n".join(failures)
+        return message
+    except Exception as e:
+        logging.error(f"Error deleting events: {e}")
+        return f"Sorry, I couldn't delete the events due to an error: {e}"
+
+
+# Each calendar tool pairs its sync implementation with the async one, so the
+# graph runs it natively under both invoke/stream and ainvoke/astream
+list_events = StructuredTool.from_function(func=list_events, coroutine=_alist_events)
+search_events = StructuredTool.from_function(func=search_events, coroutine=_asearch_events)
+check_availability = StructuredTool.from_function(func=check_availability, coroutine=_acheck_availability)
+get_current_date = StructuredTool.from_function(func=get_current_date, coroutine=_aget_current_date)
+delete_event_by_datetime = StructuredTool.from_function(
+    func=delete_event_by_datetime, coroutine=_adelete_event_by_datetime
+)
+create_event = StructuredTool.from_function(func=create_event, coroutine=_acreate_event)
+create_events = StructuredTool.from_function(func=create_events, coroutine=_acreate_events)
+delete_events_in_range = StructuredTool.from_function(
+    func=delete_events_in_range, coroutine=_adelete_events_in_range
+)
+find_free_slots = StructuredTool.from_function(func=find_free_slots, coroutine=_afind_free_slots)
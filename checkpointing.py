@@ -0,0 +1,67 @@
+"""Durable conversation state for the agent graph.
+
+The graph is compiled with a checkpointer, so each chat session (a LangGraph
+``thread_id``) keeps its history on disk. A turn only sends the new user
+message; earlier messages are loaded from the checkpoint, and a restarted app
+resumes where the session left off.
+
+Checkpoint threads are namespaced by user (``user_thread_id``). A
+conversation id taken from a URL therefore only ever selects one of the
+signed-in user's own conversations.
+
+Checkpoints go to the SQLite file named by ``CHECKPOINT_DB`` (default
+``checkpoints.sqlite``). Without ``langgraph-checkpoint-sqlite`` installed, they
+are kept in memory for the life of the process.
+"""
+import logging
+import os
+import re
+import uuid
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "checkpoints.sqlite")
+
+_CONVERSATION_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def open_checkpointer(path=CHECKPOINT_DB):
+    """Return a checkpointer usable from both sync and async graph calls."""
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        logging.warning(
+            "langgraph-checkpoint-sqlite is not installed; conversations are kept in memory only"
+        )
+        return InMemorySaver()
+
+    from async_calendar import run_in_background
+
+    async def connect():
+        # The saver is bound to the loop it is created on; sync calls from
+        # other threads are forwarded to it
+        saver = AsyncSqliteSaver(await aiosqlite.connect(path))
+        await saver.setup()
+        return saver
+
+    return run_in_background(connect())
+
+
+def new_conversation_id():
+    return uuid.uuid4().hex
+
+
+def is_conversation_id(value):
+    """True if `value` has the form of an id made by ``new_conversation_id``."""
+    return bool(value) and _CONVERSATION_ID.fullmatch(value) is not None
+
+
+def user_thread_id(user_id, conversation_id):
+    """The checkpoint thread of one of `user_id`'s conversations."""
+    return f"{user_id}:{conversation_id}"
+
+
+def thread_config(thread_id, **config):
+    """Graph config selecting the checkpoint thread of one chat session."""
+    return {**config, "configurable": {"thread_id": thread_id}}
@@ -0,0 +1,150 @@
+"""Keeps the prompt sent to the model within a token budget.
+
+The conversation grows every turn and the tools loop re-sends it on every LLM
+call, so input tokens (and latency) would otherwise grow without bound. Before
+each call the history is compacted:
+
+* tool results from earlier turns are replaced by a short reference, since the
+  model already turned them into an answer;
+* whole turns are dropped from the front until the rest fits the budget, and
+  the dropped turns are folded into a brief extractive summary.
+
+The current turn is never touched, so the model always sees the tool results
+it is working with. Token counts are approximations (about 4 characters per
+token); they only need to be good enough to bound growth.
+"""
+import logging
+import os
+
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "600"))
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "200"))
+SUMMARY_LINE_CHARS = 160
+SUMMARY_MAX_LINES = 20
+
+
+def _text(message):
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(
+        part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+    )
+
+
+def _split_turns(messages):
+    """Group messages into turns, each starting at a HumanMessage."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def compact_tool_result(message, max_chars=TOOL_RESULT_MAX_CHARS):
+    """Replace a large tool result with a compact reference to it."""
+    text = _text(message)
+    if len(text) <= max_chars:
+        return message
+    reference = (
+        f"[{message.name} result from an earlier turn, {len(text)} chars, compacted. "
+        f"Call the tool again if the details are needed. Preview: {text[:max_chars]}...]"
+    )
+    return ToolMessage(
+        content=reference,
+        tool_call_id=message.tool_call_id,
+        name=message.name,
+        id=message.id,
+    )
+
+
+def summarize_turns(turns):
+    """Extractive one-line-per-message summary of the most recent dropped turns."""
+    lines = []
+    for turn in turns:
+        for message in turn:
+            text = " ".join(_text(message).split())
+            if isinstance(message, HumanMessage):
+                lines.append(f"- User: {text[:SUMMARY_LINE_CHARS]}")
+            elif isinstance(message, AIMessage) and text:
+                lines.append(f"- Assistant: {text[:SUMMARY_LINE_CHARS]}")
+    return SystemMessage(
+        "### EARLIER CONVERSATION (SUMMARIZED) ###\n"
+        + "\n".join(lines[-SUMMARY_MAX_LINES:])
+    )
+
+
+def compact_history(messages, budget=CONTEXT_TOKEN_BUDGET):
+    """Return a version of `messages` that fits within roughly `budget` tokens.
+
+    Args:
+        messages (list): The full conversation, oldest first.
+        budget (int): Approximate token budget for the conversation part of the prompt.
+
+    Returns:
+        list: The compacted messages. The latest turn is always kept verbatim.
+    """
+    turns = _split_turns(messages)
+    if not turns:
+        return []
+    *earlier, current = turns
+    earlier = [
+        [compact_tool_result(m) if isinstance(m, ToolMessage) else m for m in turn]
+        for turn in earlier
+    ]
+
+    remaining = budget - count_tokens_approximately(current)
+    kept = []
+    for turn in reversed(earlier):
+        cost = count_tokens_approximately(turn)
+        if cost > remaining:
+            break
+        kept.insert(0, turn)
+        remaining -= cost
+
+    dropped = earlier[: len(earlier) - len(kept)]
+    compacted = [m for turn in kept + [current] for m in turn]
+    if dropped:
+        logging.info(f"Compacted {len(dropped)} earlier turn(s) into a summary")
+        compacted.insert(0, summarize_turns(dropped))
+    return compacted
+
+
+def prune_stored_history(messages, max_messages=HISTORY_MAX_MESSAGES):
+    """Removals that keep the checkpointed history to about `max_messages`.
+
+    Whole turns are dropped from the front, so no tool result is left without
+    the call that produced it. The result is meant for the `messages` channel.
+    """
+    excess = len(messages) - max_messages
+    if excess <= 0:
+        return []
+    removals = []
+    # The last turn is the one in progress and is always kept
+    for turn in _split_turns(messages)[:-1]:
+        if excess <= 0:
+            break
+        removals.extend(RemoveMessage(id=m.id) for m in turn)
+        excess -= len(turn)
+    return removals
+
+
+def log_token_usage(prompt, response):
+    """Log the estimated prompt size and the provider-reported token counts."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    cache_read = usage.get("input_token_details", {}).get("cache_read", 0)
+    logging.info(
+        f"LLM call: ~{count_tokens_approximately(prompt)} prompt tokens estimated, "
+        f"{usage.get('input_tokens', '?')} input / {usage.get('output_tokens', '?')} output "
+        f"reported, {cache_read} served from cache"
+    )
@@ -0,0 +1,138 @@
+"""Per-user OAuth credential store.
+
+Credentials live in memory, keyed by user id, and are backed by one
+Fernet-encrypted file per user under ``token_files/``. Each Streamlit session
+has its own user id, so concurrent users never share an identity or contend
+on a single token file. Access tokens are refreshed proactively shortly before
+they expire, instead of letting a request fail first.
+
+The user a tool call acts for is carried in the ``current_user`` context
+variable, which LangChain/LangGraph propagate into tool threads and tasks.
+"""
+import contextvars
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from cryptography.fernet import Fernet, InvalidToken
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+DEFAULT_USER = "default"
+TOKEN_DIR = "token_files"
+LEGACY_TOKEN_FILE = os.path.join(TOKEN_DIR, "token_google_calendar.json")
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+current_user = contextvars.ContextVar("current_user", default=DEFAULT_USER)
+
+
+def _load_key(token_dir):
+    key = os.getenv("TOKEN_ENCRYPTION_KEY")
+    if key:
+        return key.encode()
+    # Development fallback: a generated key kept next to the token files
+    key_file = os.path.join(token_dir, ".token_key")
+    if os.path.exists(key_file):
+        with open(key_file, "rb") as f:
+            return f.read()
+    logging.warning("TOKEN_ENCRYPTION_KEY is not set, generating a local key file")
+    key = Fernet.generate_key()
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+class CredentialStore:
+    """In-memory credentials per user with an encrypted on-disk backing."""
+
+    def __init__(self, token_dir=TOKEN_DIR):
+        self._token_dir = token_dir
+        self._lock = threading.Lock()
+        self._user_locks = {}
+        self._credentials = {}
+        self._fernet = None
+        self.refreshes = 0
+
+    def get(self, user_id, scopes=None):
+        """Return valid credentials for `user_id`, or None if they never authorized."""
+        with self._user_lock(user_id):
+            creds = self._credentials.get(user_id)
+            if creds is None:
+                creds = self._load(user_id, scopes)
+                if creds is None:
+                    return None
+                self._credentials[user_id] = creds
+            if self._needs_refresh(creds):
+                # Refresh in place so services built on this object pick it up
+                creds.refresh(Request())
+                self.refreshes += 1
+                self._save(user_id, creds)
+            return creds
+
+    def put(self, user_id, creds):
+        """Store freshly authorized credentials for `user_id`."""
+        with self._user_lock(user_id):
+            self._credentials[user_id] = creds
+            self._save(user_id, creds)
+
+    def delete(self, user_id):
+        with self._user_lock(user_id):
+            self._credentials.pop(user_id, None)
+            path = self._path(user_id)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _needs_refresh(self, creds):
+        if not creds.refresh_token:
+            return False
+        if creds.expiry is None:
+            return not creds.valid
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now < REFRESH_MARGIN
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def _path(self, user_id):
+        digest = hashlib.sha256(user_id.encode()).hexdigest()[:32]
+        return os.path.join(self._token_dir, f"{digest}.enc")
+
+    def _cipher(self):
+        if self._fernet is None:
+            os.makedirs(self._token_dir, exist_ok=True)
+            self._fernet = Fernet(_load_key(self._token_dir))
+        return self._fernet
+
+    def _load(self, user_id, scopes):
+        path = self._path(user_id)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                try:
+                    info = json.loads(self._cipher().decrypt(f.read()))
+                except InvalidToken:
+                    logging.error(f"Could not decrypt stored credentials for {user_id}")
+                    return None
+            return Credentials.from_authorized_user_info(info, scopes)
+        if user_id == DEFAULT_USER and os.path.exists(LEGACY_TOKEN_FILE):
+            # Single-user installs still have the old plain-text token file
+            return Credentials.from_authorized_user_file(LEGACY_TOKEN_FILE, scopes)
+        return None
+
+    def _save(self, user_id, creds):
+        os.makedirs(self._token_dir, exist_ok=True)
+        data = self._cipher().encrypt(creds.to_json().encode())
+        path = self._path(user_id)
+        tmp_path = f"{path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+credential_store = CredentialStore()
@@ -0,0 +1,137 @@
+"""Deterministic resolution of relative date expressions.
+
+Phrases such as "tomorrow at 3 PM", "next Friday" or "in 2 weeks" are resolved
+locally against the current time in the user's calendar timezone. The result is
+handed to the model as context, so it can call calendar tools on its first
+turn instead of asking `get_current_date` and waiting for another LLM cycle.
+"""
+import datetime
+import re
+
+from dateutil.relativedelta import relativedelta
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12,
+}
+
+_TIME = r"(?:noon|midnight|\d{1,2}(?::\d{2})?\s*(?:a\.?m\.?|p\.?m\.?)|\d{1,2}:\d{2})"
+
+_DATE_PATTERN = re.compile(
+    r"\b(?P<phrase>"
+    r"day after tomorrow|today|tonight|tomorrow|yesterday"
+    r"|(?P<mod>this|next|last|coming)?\s*(?P<weekday>" + "|".join(WEEKDAYS) + r")"
+    r"|(?P<rel>this|next|last) (?P<rel_unit>week|month|year)"
+    r"|in (?P<count>\d+|" + "|".join(NUMBER_WORDS) + r") (?P<unit>day|week|month|year)s?"
+    r")\b"
+    r"(?:\s*(?:,\s*)?(?:at|from|@)?\s*(?P<time>" + _TIME + r"))?"
+    r"(?:\s*(?:-|to|until|till)\s*(?P<end_time>" + _TIME + r"))?",
+    re.IGNORECASE,
+)
+
+
+def _parse_time(value):
+    value = value.lower().replace(".", "").replace(" ", "")
+    if value == "noon":
+        return datetime.time(12, 0)
+    if value == "midnight":
+        return datetime.time(0, 0)
+    meridiem = None
+    if value.endswith(("am", "pm")):
+        meridiem, value = value[-2:], value[:-2]
+    hour, _, minute = value.partition(":")
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem == "pm" and hour != 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return None
+    return datetime.time(hour, minute)
+
+
+def _resolve_date(match, today):
+    phrase = match.group("phrase").lower()
+    if phrase in ("today", "tonight"):
+        return today
+    if phrase == "tomorrow":
+        return today + datetime.timedelta(days=1)
+    if phrase == "day after tomorrow":
+        return today + datetime.timedelta(days=2)
+    if phrase == "yesterday":
+        return today - datetime.timedelta(days=1)
+    if match.group("weekday"):
+        target = WEEKDAYS.index(match.group("weekday").lower())
+        mod = (match.group("mod") or "").lower()
+        if mod == "last":
+            return today - datetime.timedelta(days=(today.weekday() - target) % 7 or 7)
+        ahead = (target - today.weekday()) % 7
+        # "this Friday" on a Friday is today; "next Friday" is a week away
+        if ahead == 0 and mod in ("next", "coming"):
+            ahead = 7
+        return today + datetime.timedelta(days=ahead)
+    if match.group("rel"):
+        step = {"this": 0, "next": 1, "last": -1}[match.group("rel").lower()]
+        return today + relativedelta(**{match.group("rel_unit").lower() + "s": step})
+    count = match.group("count").lower()
+    count = NUMBER_WORDS.get(count) or int(count)
+    return today + relativedelta(**{match.group("unit").lower() + "s": count})
+
+
+def _resolve_match(match, now):
+    day = _resolve_date(match, now.date())
+    start = day
+    end = None
+    start_time = _parse_time(match.group("time")) if match.group("time") else None
+    if start_time is not None:
+        start = datetime.datetime.combine(day, start_time, tzinfo=now.tzinfo)
+        end_time = _parse_time(match.group("end_time")) if match.group("end_time") else None
+        if end_time is not None:
+            end = datetime.datetime.combine(day, end_time, tzinfo=now.tzinfo)
+            if end <= start:
+                end += datetime.timedelta(days=1)
+    return start, end
+
+
+def resolve_relative_dates(text, now):
+    """Find relative date expressions in `text` and resolve them against `now`.
+
+    Args:
+        text (str): The user's message.
+        now (datetime): The current time as an aware datetime in the user's timezone.
+
+    Returns:
+        List[tuple]: (phrase, start, end) where start is a date or an aware
+            datetime when a time was given, and end is an aware datetime or None.
+            Phrases resolving to a date out of range are left out.
+    """
+    resolved = []
+    for match in _DATE_PATTERN.finditer(text):
+        try:
+            start, end = _resolve_match(match, now)
+        except (ValueError, OverflowError):
+            # E.g. "in 9000 years" lands outside the calendar; no hint for it
+            continue
+        resolved.append((match.group(0).strip(), start, end))
+    return resolved
+
+
+def build_date_context(text, tz, now=None):
+    """Render today's date and any resolved expressions as a context note for the model."""
+    now = now or datetime.datetime.now(tz)
+    lines = [
+        "### DATE CONTEXT ###",
+        f"Current date and time: {now.strftime('%A, %B %d, %Y %I:%M %p')} ({tz}).",
+        f"Current UTC offset: {now.strftime('%z')}.",
+    ]
+    resolved = resolve_relative_dates(text, now)
+    if resolved:
+        lines.append("Relative dates in the latest user message resolve to:")
+        for phrase, start, end in resolved:
+            line = f'- "{phrase}" -> {start.isoformat()} ({start.strftime("%A, %B %d, %Y")})'
+            if end is not None:
+                line += f" until {end.isoformat()}"
+            lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,477 @@
+"""Local, incrementally synced copy of a Google Calendar.
+
+The store is seeded with one full ``events().list`` and afterwards only asks the
+API for changes using the ``nextSyncToken`` returned by the previous sync. Reads
+are answered from an in-memory index sorted by start time, so the tools can ask
+the same question several times in one turn without another round trip.
+
+List calls ask for a partial response (``fields=``) with only the fields the
+tools use, pages are consumed one at a time as they arrive, and each event is
+kept as a compact ``EventRecord`` rather than the full API payload.
+
+Recurring events are fetched unexpanded (``singleEvents=False``): one master
+per series plus its changed or cancelled occurrences. Occurrences are expanded
+locally when a read asks for them; see ``recurrence``.
+
+All-day events start and end at midnight in the calendar's timezone, which
+every list response reports alongside the events.
+
+``version`` counts the changes applied to a store, whether made through the
+tools or picked up by a sync, so results derived from it can be cached until
+the calendar changes.
+"""
+import bisect
+import datetime
+import heapq
+import itertools
+import logging
+import threading
+import time
+import weakref
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError
+
+from recurrence import Series, parse_instance_id
+from search_index import SearchIndex
+from user_settings import invalidate_settings
+
+_UTC = datetime.timezone.utc
+
+# Partial response for events().list: everything the tools read, nothing else
+EVENT_FIELDS = (
+    "nextPageToken,nextSyncToken,timeZone,"
+    "items(id,iCalUID,status,summary,start,end,location,description,transparency,"
+    "attendees(email,displayName),recurrence,recurringEventId,originalStartTime)"
+)
+DESCRIPTION_MAX_CHARS = 300
+
+
+def parse_event_time(value, tz=_UTC):
+    """Convert an event ``start``/``end`` object into an aware UTC datetime.
+
+    An all-day ``date`` means midnight in `tz`, the calendar's timezone.
+    """
+    if "dateTime" in value:
+        return parse_iso(value["dateTime"])
+    day = datetime.date.fromisoformat(value["date"])
+    return datetime.datetime(day.year, day.month, day.day, tzinfo=tz).astimezone(_UTC)
+
+
+def parse_iso(value, tz=_UTC):
+    """Parse an ISO 8601 string into an aware UTC datetime.
+
+    Naive values are read as wall-clock time in `tz`; the tools pass the user's
+    calendar timezone, as the create path does for the same strings.
+    """
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz)
+    return parsed.astimezone(_UTC)
+
+
+class EventRecord:
+    """Compact view of one event, holding only what the tools use.
+
+    Args:
+        item (dict): The event as returned by the API.
+        tz (tzinfo): The calendar's timezone, for all-day events.
+    """
+
+    __slots__ = (
+        "id", "uid", "summary", "start", "end", "start_at", "end_at",
+        "location", "description", "transparent", "attendees",
+    )
+
+    def __init__(self, item, tz=_UTC):
+        self.id = item["id"]
+        self.uid = item.get("iCalUID", "")
+        self.summary = item.get("summary", "")
+        # Original dateTime (or all-day date) strings, for display
+        self.start = item["start"].get("dateTime") or item["start"].get("date")
+        self.end = item["end"].get("dateTime") or item["end"].get("date")
+        self.start_at = parse_event_time(item["start"], tz)
+        self.end_at = parse_event_time(item["end"], tz)
+        self.location = item.get("location", "")
+        self.description = item.get("description", "")
+        self.transparent = item.get("transparency") == "transparent"
+        self.attendees = tuple(
+            a.get("displayName") or a.get("email", "") for a in item.get("attendees", ())
+        )
+
+    @property
+    def all_day(self):
+        return "T" not in self.start
+
+    def to_dict(self):
+        """The fields shown to the model, leaving out empty ones."""
+        data = {"summary": self.summary, "start": self.start, "end": self.end}
+        if self.location:
+            data["location"] = self.location
+        if self.description:
+            data["description"] = self.description[:DESCRIPTION_MAX_CHARS]
+        return data
+
+    def __repr__(self):
+        return f"EventRecord({self.id!r}, {self.summary!r}, {self.start!r})"
+
+
+def iter_pages(service, calendar_id="primary", fields=EVENT_FIELDS, **params):
+    """Yield ``events().list`` pages one at a time, following ``nextPageToken``."""
+    page_token = None
+    while True:
+        response = (
+            service.events()
+            .list(calendarId=calendar_id, pageToken=page_token, fields=fields, **params)
+            .execute()
+        )
+        yield response
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+async def aiter_pages(client, calendar_id="primary", **params):
+    """Async ``iter_pages`` over an ``AsyncCalendarClient``."""
+    page_token = None
+    while True:
+        response = await client.list_events(
+            calendar_id, pageToken=page_token, fields=EVENT_FIELDS, **params
+        )
+        yield response
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+
+class EventStore:
+    """In-memory event index for one calendar, kept current with sync tokens.
+
+    Args:
+        service: A Calendar API service object.
+        calendar_id (str): Calendar to mirror.
+        max_staleness (float): Seconds a sync stays fresh before the next read
+            triggers a delta fetch.
+    """
+
+    def __init__(self, service, calendar_id="primary", max_staleness=30.0):
+        self._service = service
+        self.calendar_id = calendar_id
+        self.max_staleness = max_staleness
+        # The calendar's timezone, as reported by the last list response
+        self.timezone = "UTC"
+        self._tz = _UTC
+        self._lock = threading.RLock()
+        self._events = {}
+        self._index = []
+        self._max_span = datetime.timedelta(0)
+        # Recurring events by master id, and per master the original start
+        # (UTC) of each changed occurrence -> its event id, or None if cancelled
+        self._series = {}
+        self._exceptions = {}
+        self._sync_token = None
+        self._synced_at = None
+        self.version = 0
+        self._search_index = None  # built on the first search
+        self.full_syncs = 0
+        self.delta_syncs = 0
+
+    def upcoming(self, num, now=None):
+        """Return up to `num` ``EventRecord``s that have not ended yet, by start time."""
+        now = now or datetime.datetime.now(_UTC)
+        self.refresh()
+        with self._lock:
+            start = bisect.bisect_left(self._index, (now - self._max_span,))
+            single = (
+                self._events[event_id]
+                for ev_start, ev_end, event_id in self._index[start:]
+                if ev_end > now
+            )
+            return list(itertools.islice(self._merge(single, now), num))
+
+    def events_between(self, time_min, time_max):
+        """Return events overlapping ``[time_min, time_max)``, by start time."""
+        self.refresh()
+        with self._lock:
+            start = bisect.bisect_left(self._index, (time_min - self._max_span,))
+            stop = bisect.bisect_left(self._index, (time_max,))
+            single = [
+                self._events[event_id]
+                for ev_start, ev_end, event_id in self._index[start:stop]
+                if ev_end > time_min
+            ]
+            if not self._series:
+                return single
+            return list(self._merge(single, time_min, time_max))
+
+    def refresh(self, force=False):
+        """Bring the store up to date if it is stale (or always, if `force`)."""
+        with self._lock:
+            if not self._is_stale(force):
+                return
+            sync_token = self._sync_token
+            try:
+                # Pages are applied as they arrive rather than collected first
+                self._apply(sync_token is None, self._pages(sync_token))
+            except HttpError as e:
+                if sync_token is None or e.resp.status != 410:
+                    raise
+                logging.info("Sync token expired, running a full sync")
+                self._apply(True, self._pages(None))
+
+    async def arefresh(self, client, force=False):
+        """Async `refresh` that fetches through an ``AsyncCalendarClient``.
+
+        The lock is only held while applying changes, never across the fetch.
+        """
+        with self._lock:
+            if not self._is_stale(force):
+                return
+            sync_token = self._sync_token
+        try:
+            pages = await self._afetch_pages(client, sync_token)
+        except HttpError as e:
+            if sync_token is None or e.resp.status != 410:
+                raise
+            logging.info("Sync token expired, running a full sync")
+            sync_token = None
+            pages = await self._afetch_pages(client, None)
+        with self._lock:
+            self._apply(sync_token is None, pages)
+
+    def search(self, query, time_min=None, time_max=None):
+        """Return events matching `query`, most relevant first.
+
+        A recurring event matches as its first occurrence in the range.
+
+        Args:
+            query (str): Free-text query over summary, attendees, location and description.
+            time_min (datetime): Optional; only events ending after this.
+            time_max (datetime): Optional; only events starting before this.
+        """
+        self.refresh()
+        with self._lock:
+            if self._search_index is None:
+                self._search_index = SearchIndex()
+                for record in itertools.chain(
+                    self._events.values(), (series.master for series in self._series.values())
+                ):
+                    self._search_index.add(record)
+            candidates = None
+            if time_min is not None or time_max is not None:
+                candidates = {
+                    record.id
+                    for record in self._events.values()
+                    if (time_min is None or record.end_at > time_min)
+                    and (time_max is None or record.start_at < time_max)
+                }
+                candidates.update(self._series)
+            matches = []
+            for event_id in self._search_index.search(query, candidates):
+                series = self._series.get(event_id)
+                if series is None:
+                    matches.append(self._events[event_id])
+                    continue
+                instance = series.first_instance(time_min, time_max, self._exceptions.get(event_id, {}))
+                if instance is not None:
+                    matches.append(instance)
+            return matches
+
+    def ical_uids(self):
+        """The set of iCalendar UIDs in the store (shared by a recurring event's instances)."""
+        self.refresh()
+        with self._lock:
+            return {
+                record.uid
+                for record in itertools.chain(
+                    self._events.values(), (series.master for series in self._series.values())
+                )
+                if record.uid
+            }
+
+    def invalidate(self):
+        """Force the next read to fetch changes from the API."""
+        with self._lock:
+            self._synced_at = None
+
+    def record_insert(self, event):
+        """Apply an event we just created so it is visible before the next sync."""
+        with self._lock:
+            self._put(event)
+            self._synced_at = None
+            self.version += 1
+
+    def record_delete(self, event_id):
+        """Forget an event (or one occurrence of a recurring event) we just deleted."""
+        with self._lock:
+            instance = parse_instance_id(event_id)
+            if instance is not None and instance[0] in self._series:
+                series_id, original = instance
+                if not isinstance(original, datetime.datetime):
+                    original = parse_event_time({"date": original.isoformat()}, self._tz)
+                self._discard(event_id)
+                self._cancel_occurrence(series_id, original)
+            else:
+                self._remove(event_id)
+            self._synced_at = None
+            self.version += 1
+
+    def _is_stale(self, force):
+        return (
+            force
+            or self._synced_at is None
+            or time.monotonic() - self._synced_at >= self.max_staleness
+        )
+
+    def _list_params(self, sync_token):
+        if sync_token is None:
+            return {"singleEvents": False, "maxResults": 2500}
+        return {"singleEvents": False, "syncToken": sync_token}
+
+    def _pages(self, sync_token):
+        return iter_pages(self._service, self.calendar_id, **self._list_params(sync_token))
+
+    async def _afetch_pages(self, client, sync_token):
+        # Collected first: the lock must not be held across awaits
+        return [
+            page
+            async for page in aiter_pages(client, self.calendar_id, **self._list_params(sync_token))
+        ]
+
+    _STATE = (
+        "_events", "_index", "_max_span", "_series", "_exceptions", "_search_index",
+        "_sync_token", "timezone", "_tz",
+    )
+
+    def _apply(self, full, pages):
+        # A full sync fills fresh containers; if a page fails, the previous complete
+        # copy is put back. Either way the next read fetches again instead of
+        # answering from a store the failed sync left behind.
+        saved = {name: getattr(self, name) for name in self._STATE} if full else None
+        try:
+            self._apply_pages(full, pages)
+        except BaseException:
+            if saved is not None:
+                for name, value in saved.items():
+                    setattr(self, name, value)
+            else:
+                # Some changes of the failed delta may be applied already
+                self.version += 1
+            self._synced_at = None
+            raise
+
+    def _apply_pages(self, full, pages):
+        if full:
+            self._events = {}
+            self._index = []
+            self._max_span = datetime.timedelta(0)
+            self._series = {}
+            self._exceptions = {}
+            self._search_index = None
+            self._sync_token = None
+        last = {}
+        changed = full
+        resync = False
+        for last in pages:
+            if self._use_timezone(last.get("timeZone")) and not full:
+                # All-day events already stored were resolved in the old timezone
+                resync = True
+            for item in last.get("items", []):
+                changed = True
+                if item.get("status") != "cancelled":
+                    self._put(item)
+                elif item.get("recurringEventId") and item.get("originalStartTime"):
+                    self._discard(item["id"])
+                    self._cancel_occurrence(
+                        item["recurringEventId"], parse_event_time(item["originalStartTime"], self._tz)
+                    )
+                else:
+                    self._remove(item["id"])
+        if changed:
+            self.version += 1
+        self._sync_token = last.get("nextSyncToken")
+        self._synced_at = time.monotonic()
+        if resync:
+            self._sync_token = self._synced_at = None
+            if self.calendar_id == "primary":
+                # The cached settings still carry the old timezone
+                invalidate_settings(self._service)
+        if full:
+            self.full_syncs += 1
+            logging.info(f"Event store seeded with {len(self._events)} events")
+        else:
+            self.delta_syncs += 1
+
+    def _use_timezone(self, name):
+        # True if `name` is a valid timezone other than the current one
+        if not name or name == self.timezone:
+            return False
+        try:
+            tz = ZoneInfo(name)
+        except Exception:
+            logging.error(f"Unknown calendar timezone {name!r}, keeping {self.timezone}")
+            return False
+        self.timezone, self._tz = name, tz
+        return True
+
+    def _merge(self, single, time_min, time_max=None):
+        # Single events and every series' occurrences, lazily merged by start time
+        occurrences = [
+            series.instances(time_min, time_max, self._exceptions.get(series_id, {}))
+            for series_id, series in self._series.items()
+        ]
+        return heapq.merge(
+            single, *occurrences, key=lambda record: (record.start_at, record.end_at, record.id)
+        )
+
+    def _put(self, item):
+        record = EventRecord(item, self._tz)
+        self._discard(record.id)
+        if item.get("recurrence"):
+            self._series[record.id] = Series(record, item["recurrence"], item["start"], self._tz)
+        else:
+            self._events[record.id] = record
+            bisect.insort(self._index, (record.start_at, record.end_at, record.id))
+            self._max_span = max(self._max_span, record.end_at - record.start_at)
+            if item.get("recurringEventId") and item.get("originalStartTime"):
+                # A changed occurrence replaces the one its series would generate
+                original = parse_event_time(item["originalStartTime"], self._tz)
+                self._exceptions.setdefault(item["recurringEventId"], {})[original] = record.id
+        if self._search_index is not None:
+            self._search_index.add(record)
+
+    def _cancel_occurrence(self, series_id, original_start):
+        self._exceptions.setdefault(series_id, {})[original_start] = None
+
+    def _remove(self, event_id):
+        # A deleted series takes its changed occurrences with it
+        self._discard(event_id)
+        for override_id in self._exceptions.pop(event_id, {}).values():
+            if override_id is not None:
+                self._discard(override_id)
+
+    def _discard(self, event_id):
+        if self._series.pop(event_id, None) is None:
+            record = self._events.pop(event_id, None)
+            if record is None:
+                return
+            key = (record.start_at, record.end_at, event_id)
+            pos = bisect.bisect_left(self._index, key)
+            if pos < len(self._index) and self._index[pos] == key:
+                del self._index[pos]
+        if self._search_index is not None:
+            self._search_index.remove(event_id)
+
+
+_stores = weakref.WeakKeyDictionary()
+_stores_lock = threading.Lock()
+
+
+def get_event_store(service, calendar_id="primary"):
+    """Return the shared store for `calendar_id` as seen through `service`."""
+    with _stores_lock:
+        per_service = _stores.setdefault(service, {})
+        store = per_service.get(calendar_id)
+        if store is None:
+            store = per_service[calendar_id] = EventStore(service, calendar_id)
+        return store
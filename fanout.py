@@ -0,0 +1,45 @@
+"""Run one query against several calendars concurrently and merge the results.
+
+Sync tools fan out on a shared thread pool (the pooled service gives every
+thread its own transport); async tools use ``asyncio.gather`` behind a
+semaphore. Both are bounded by ``FANOUT_CONCURRENCY`` (default 8). Workers run
+in a copy of the caller's context, so the current user and trace follow them.
+Per-calendar results that are already sorted by start time are combined with
+a k-way heap merge rather than concatenated and re-sorted.
+"""
+import asyncio
+import contextvars
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=FANOUT_CONCURRENCY, thread_name_prefix="calendar-fanout")
+
+
+def fan_out(fn, items):
+    """Return ``[fn(item) for item in items]``, computed concurrently."""
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    futures = [
+        _executor.submit(contextvars.copy_context().run, fn, item) for item in items
+    ]
+    return [future.result() for future in futures]
+
+
+async def afan_out(fn, items, limit=FANOUT_CONCURRENCY):
+    """Async ``fan_out``: awaits ``fn(item)`` for every item, at most `limit` at a time."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item):
+        async with semaphore:
+            return await fn(item)
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+def merge_by_start(sorted_lists):
+    """Merge lists of (calendar_id, EventRecord) pairs, each sorted by start time."""
+    return heapq.merge(*sorted_lists, key=lambda pair: pair[1].start_at)
@@ -0,0 +1,154 @@
+"""Rule-based fast path for the simplest requests.
+
+"What's today's date?", "list my next 5 events" and "am I free tomorrow at
+3 PM?" each cost at least two model calls through the agent loop, although the
+tool to call and its arguments follow directly from the wording. A small
+grammar recognises these intents, calls the tool itself and answers from a
+template. Everything else still goes to the model.
+
+Each match gets a confidence: the share of the (normalised) message the grammar
+covered. Only matches at or above ``FAST_PATH_THRESHOLD`` (default 0.9) are
+answered here, so a request with anything extra ("... and move the 4 PM one")
+falls through to the model. Availability is only answered for one day and one
+start time; ranges ("3 to 5 PM") and vague dates ("next week") go to the model. Set the threshold above 1 to turn the fast path off.
+"""
+import datetime
+import logging
+import os
+import re
+from typing import NamedTuple, Optional
+
+from date_resolver import NUMBER_WORDS, WEEKDAYS, resolve_relative_dates
+
+FAST_PATH_THRESHOLD = float(os.getenv("FAST_PATH_THRESHOLD", "0.9"))
+MAX_LIST_EVENTS = 50
+
+_NUMBER = r"\d{1,3}|" + "|".join(w for w in NUMBER_WORDS if w not in ("a", "an"))
+
+_DATE_INTENT = re.compile(
+    r"what(?:'s| is) (?:the )?(?:date|day)(?: (?:today|it is))?"
+    r"|what(?:'s| is) today(?:'s date)?"
+    r"|what day is (?:it|today)(?: today)?"
+    r"|(?:today's|the current) date"
+)
+_LIST_INTENT = re.compile(
+    r"(?:list|show|get|what are|what's on|what is on)(?: me)?(?: all)?"
+    r" my (?:next |upcoming )?(?:(?P<num>" + _NUMBER + r") )?(?:upcoming )?"
+    r"(?:events|meetings|appointments|calendar)"
+)
+_FREE_INTENT = re.compile(r"(?:am i|will i be) (?P<state>free|available|busy) (?P<when>.+)")
+# Date phrases naming exactly one day, and words that make a phrase a time range
+_SINGLE_DAY = re.compile(
+    r"(?:day after tomorrow|today|tonight|tomorrow|yesterday"
+    r"|(?:(?:this|next|last|coming)\s+)?(?:" + "|".join(WEEKDAYS) + r")"
+    r"|in \S+ days?)\b"
+)
+_TIME_RANGE = re.compile(r"-|\b(?:to|until|till)\b")
+
+_LEADING_FILLER = re.compile(r"^(?:(?:hey|hi|hello|ok|okay|please|so)[,!]?\s+)+")
+_TRAILING_FILLER = re.compile(r"(?:,?\s+(?:please|thanks|thank you))+$")
+
+
+class Intent(NamedTuple):
+    tool: str
+    args: dict
+    confidence: float
+
+
+def _normalize(text):
+    text = " ".join(text.lower().replace("’", "'").split())
+    text = text.rstrip("?.! ")
+    text = _LEADING_FILLER.sub("", text)
+    return _TRAILING_FILLER.sub("", text)
+
+
+def _coverage(match, text):
+    return (match.end() - match.start()) / len(text) if text else 0.0
+
+
+def classify(text, now) -> Optional[Intent]:
+    """Return the best matching simple intent for `text`, or None.
+
+    Args:
+        text (str): The user's message.
+        now (datetime): The current time, aware, in the user's timezone.
+    """
+    text = _normalize(text)
+    if not text:
+        return None
+    candidates = []
+
+    match = _DATE_INTENT.search(text)
+    if match:
+        candidates.append(Intent("get_current_date", {}, _coverage(match, text)))
+
+    match = _LIST_INTENT.search(text)
+    if match:
+        num = match.group("num")
+        num = 5 if num is None else NUMBER_WORDS.get(num) or int(num)
+        candidates.append(
+            Intent("list_events", {"num": max(1, min(num, MAX_LIST_EVENTS))}, _coverage(match, text))
+        )
+
+    match = _FREE_INTENT.search(text)
+    if match:
+        # The rest must be exactly one single-day date expression with one start time
+        resolved = resolve_relative_dates(match.group("when"), now)
+        if (
+            len(resolved) == 1
+            and isinstance(resolved[0][1], datetime.datetime)
+            and resolved[0][2] is None
+            and _SINGLE_DAY.match(resolved[0][0].lower())
+            and not _TIME_RANGE.search(resolved[0][0].lower())
+        ):
+            phrase, start, _ = resolved[0]
+            covered = len(text) - len(match.group("when")) + len(phrase)
+            candidates.append(
+                Intent(
+                    "check_availability",
+                    {"date": start.strftime("%B %d, %Y"), "time": start.strftime("%I:%M %p")},
+                    covered / len(text),
+                )
+            )
+
+    return max(candidates, key=lambda intent: intent.confidence, default=None)
+
+
+def render_reply(intent, result, tz):
+    """Turn a tool result into the reply the agent would have written."""
+    if intent.tool == "get_current_date":
+        return f"Today is {result}."
+
+    if intent.tool == "list_events":
+        if not result:
+            return "You have no upcoming events."
+        lines = []
+        for i, event in enumerate(result, 1):
+            start = event["start"]
+            if "T" in start:
+                when = datetime.datetime.fromisoformat(start).astimezone(tz).strftime("%A, %B %d at %I:%M %p")
+            else:
+                when = datetime.date.fromisoformat(start).strftime("%A, %B %d (all day)")
+            lines.append(f"{i}. **{event.get('summary') or 'No Title'}** — {when}")
+        return f"Here are your next {len(result)} event(s):\n" + "\n".join(lines)
+
+    if intent.tool == "check_availability":
+        when = f"{intent.args['date']} at {intent.args['time']}"
+        if result == "You are free during this time.":
+            return f"✅ You're free on {when}."
+        return result
+
+    return str(result)
+
+
+def answer(intent, tools_by_name, tz, config=None):
+    """Run the intent's tool and render its reply."""
+    logging.info(f"Fast path: {intent.tool}({intent.args}) at confidence {intent.confidence:.2f}")
+    result = tools_by_name[intent.tool].invoke(intent.args, config)
+    return render_reply(intent, result, tz)
+
+
+async def aanswer(intent, tools_by_name, tz, config=None):
+    logging.info(f"Fast path: {intent.tool}({intent.args}) at confidence {intent.confidence:.2f}")
+    result = await tools_by_name[intent.tool].ainvoke(intent.args, config)
+    return render_reply(intent, result, tz)
@@ -0,0 +1,119 @@
+"""Free/busy computations over sorted busy intervals.
+
+Busy time comes either from the local event store or from the FreeBusy API.
+Intervals are sorted once and merged in a single sweep, after which free
+windows inside working hours fall out of one more linear pass, so a whole
+week of slots costs O(n log n) instead of one API call per probed slot.
+"""
+import datetime
+import logging
+
+from event_store import parse_iso
+from fanout import afan_out, fan_out
+
+# Calendars the FreeBusy API accepts in one query
+FREEBUSY_MAX_ITEMS = 50
+
+
+def busy_from_events(events):
+    """Busy intervals for ``EventRecord``s that block time (skips 'transparent' ones)."""
+    return [(e.start_at, e.end_at) for e in events if not e.transparent]
+
+
+def _freebusy_bodies(time_min, time_max, calendar_ids):
+    calendar_ids = list(calendar_ids)
+    return [
+        {
+            "timeMin": time_min.isoformat(),
+            "timeMax": time_max.isoformat(),
+            "items": [{"id": calendar_id} for calendar_id in calendar_ids[i:i + FREEBUSY_MAX_ITEMS]],
+        }
+        for i in range(0, len(calendar_ids), FREEBUSY_MAX_ITEMS)
+    ]
+
+
+def _parse_freebusy(responses):
+    busy = {}
+    for response in responses:
+        for calendar_id, calendar in response.get("calendars", {}).items():
+            for error in calendar.get("errors", []):
+                logging.warning(f"FreeBusy could not read {calendar_id}: {error.get('reason')}")
+            busy[calendar_id] = [
+                (parse_iso(period["start"]), parse_iso(period["end"]))
+                for period in calendar.get("busy", [])
+            ]
+    return busy
+
+
+def freebusy_by_calendar(service, time_min, time_max, calendar_ids=("primary",)):
+    """Busy intervals per calendar id, from as few FreeBusy queries as possible.
+
+    Up to 50 calendars go into one query; more than that are split into
+    queries that run concurrently.
+    """
+    bodies = _freebusy_bodies(time_min, time_max, calendar_ids)
+    return _parse_freebusy(
+        fan_out(lambda body: service.freebusy().query(body=body).execute(), bodies)
+    )
+
+
+async def afreebusy_by_calendar(client, time_min, time_max, calendar_ids=("primary",)):
+    """Async ``freebusy_by_calendar`` over an ``AsyncCalendarClient``."""
+    bodies = _freebusy_bodies(time_min, time_max, calendar_ids)
+    return _parse_freebusy(await afan_out(client.query_freebusy, bodies))
+
+
+def merge_intervals(intervals):
+    """Sort intervals and merge overlapping or touching ones."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def working_windows(start_date, end_date, tz, work_start, work_end, include_weekends=False):
+    """Yield (start, end) working-hour windows for each day in the date range."""
+    day = start_date
+    while day <= end_date:
+        if include_weekends or day.weekday() < 5:
+            yield (
+                datetime.datetime.combine(day, work_start, tzinfo=tz),
+                datetime.datetime.combine(day, work_end, tzinfo=tz),
+            )
+        day += datetime.timedelta(days=1)
+
+
+def free_slots(busy, windows, duration, limit=None):
+    """Free gaps of at least `duration` inside `windows`, given busy intervals.
+
+    Args:
+        busy: Iterable of (start, end) aware datetimes, in any order.
+        windows: Iterable of (start, end) windows sorted by start.
+        duration (timedelta): Minimum length of a free gap.
+        limit (int): Stop after this many gaps.
+
+    Returns:
+        List[tuple]: (start, end) free gaps in chronological order.
+    """
+    merged = merge_intervals(busy)
+    slots = []
+    i = 0
+    for win_start, win_end in windows:
+        while i < len(merged) and merged[i][1] <= win_start:
+            i += 1
+        cursor = win_start
+        j = i
+        while j < len(merged) and merged[j][0] < win_end:
+            if merged[j][0] - cursor >= duration:
+                slots.append((cursor, merged[j][0]))
+            cursor = max(cursor, merged[j][1])
+            j += 1
+        if win_end - cursor >= duration:
+            slots.append((cursor, win_end))
+        if limit is not None and len(slots) >= limit:
+            return slots[:limit]
+    return slots
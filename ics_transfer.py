@@ -0,0 +1,596 @@
+"""Streaming iCalendar (.ics) import and export.
+
+Import reads a file line by line. Folded lines are joined and one VEVENT at a
+time is turned into an event body; events whose UID is already in the calendar
+(or appeared earlier in the file) are skipped. The rest are sent with
+``events().import`` in chunks of ``ICS_CHUNK_SIZE`` (default 200) through
+``batch_ops``, so they are batched, rate limited and retried like any other
+bulk write, and memory use depends on the chunk size rather than the file size.
+Changed occurrences of recurring events (VEVENTs with a RECURRENCE-ID) are not
+imported and are counted as skipped.
+
+Export pages through ``events().list`` for a date range and writes each page as
+it arrives. Recurring events are written once with their RRULE, and changed
+occurrences as separate VEVENTs with a RECURRENCE-ID. Times keep their IANA
+timezone (``TZID``) so recurrences stay on the same wall-clock time across DST
+changes; since the zones are only known once every event is written, their
+VTIMEZONE definitions follow the events, built from the system's tz database.
+
+The agent tools read and write files in the user's own folder under
+``ICS_DIR`` (default ``ics_files``). From the command line, with credentials
+saved by the app; ``--user`` is the Google account id the app's sidebar shows
+after signing in:
+
+    python -m ics_transfer import calendar.ics [--user ID] [--calendar primary]
+    python -m ics_transfer export out.ics --start 2025-01-01 --end 2025-12-31
+"""
+import argparse
+import datetime
+import hashlib
+import itertools
+import logging
+import os
+import re
+import sys
+from zoneinfo import ZoneInfo
+
+from batch_ops import execute_batched
+from credential_store import DEFAULT_USER, current_user
+from event_store import get_event_store, iter_pages
+from user_settings import get_user_settings
+
+ICS_DIR = os.getenv("ICS_DIR", "ics_files")
+ICS_CHUNK_SIZE = int(os.getenv("ICS_CHUNK_SIZE", "200"))
+MAX_REPORTED_ERRORS = 20
+LINE_LIMIT = 75  # octets per content line before folding
+
+# Partial response with everything an exported VEVENT needs
+EXPORT_FIELDS = (
+    "nextPageToken,"
+    "items(id,iCalUID,status,summary,description,location,start,end,"
+    "recurrence,recurringEventId,originalStartTime,transparency,updated)"
+)
+
+_TEXT_ESCAPES = {"n": "\n", "N": "\n", ",": ",", ";": ";", "\\": "\\"}
+_DURATION = re.compile(
+    r"^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+
+
+# --- Parsing ---------------------------------------------------------------
+
+
+def unfold(lines):
+    """Yield logical content lines, joining folded continuations."""
+    current = ""
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_line(line):
+    """Split a content line into (NAME, {PARAM: value}, value).
+
+    Raises:
+        ValueError: If the line has no value separator.
+    """
+    in_quotes = False
+    for pos, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            break
+    else:
+        raise ValueError(f"Malformed content line: {line[:60]!r}")
+    name, *raw_params = line[:pos].split(";")
+    params = {}
+    for param in raw_params:
+        key, _, value = param.partition("=")
+        params[key.upper()] = value.strip('"')
+    return name.upper(), params, line[pos + 1:]
+
+
+def iter_events(lines):
+    """Yield each VEVENT as a dict mapping property names to lists of (params, value)."""
+    event = None
+    nested = 0  # components inside the current VEVENT, e.g. VALARM
+    for line in unfold(lines):
+        try:
+            name, params, value = parse_line(line)
+        except ValueError as e:
+            logging.warning(f"Skipping line: {e}")
+            continue
+        if name == "BEGIN":
+            if event is not None:
+                nested += 1
+            elif value.upper() == "VEVENT":
+                event = {}
+        elif name == "END":
+            if event is None:
+                continue
+            if nested:
+                nested -= 1
+            elif value.upper() == "VEVENT":
+                yield event
+                event = None
+        elif event is not None and not nested:
+            event.setdefault(name, []).append((params, value))
+
+
+def unescape_text(value):
+    return re.sub(r"\\(.)", lambda m: _TEXT_ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def parse_duration(value):
+    match = _DURATION.match(value.strip())
+    if not match:
+        raise ValueError(f"Unsupported duration {value!r}")
+    parts = {k: int(v or 0) for k, v in match.groupdict().items() if k != "sign"}
+    delta = datetime.timedelta(**parts)
+    return -delta if match.group("sign") == "-" else delta
+
+
+def _valid_zone(name):
+    try:
+        ZoneInfo(name)
+        return True
+    except Exception:
+        return False
+
+
+def _event_time(params, value, default_tz):
+    """An ICS DATE or DATE-TIME as a Calendar API ``start``/``end`` object."""
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return {"date": datetime.datetime.strptime(value, "%Y%m%d").date().isoformat()}
+    moment = datetime.datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return {"dateTime": moment.isoformat() + "Z"}
+    tzid = params.get("TZID")
+    # Floating times and non-IANA zone names are read in the user's timezone
+    return {"dateTime": moment.isoformat(), "timeZone": tzid if tzid and _valid_zone(tzid) else default_tz}
+
+
+def _shift(event_time, delta):
+    if "date" in event_time:
+        day = datetime.date.fromisoformat(event_time["date"]) + datetime.timedelta(days=delta.days)
+        return {"date": day.isoformat()}
+    raw = event_time["dateTime"]
+    moment = datetime.datetime.fromisoformat(raw.rstrip("Z")) + delta
+    return dict(event_time, dateTime=moment.isoformat() + ("Z" if raw.endswith("Z") else ""))
+
+
+def _format_line(name, params, value):
+    head = ";".join([name] + [f"{k}={v}" for k, v in params.items()])
+    return f"{head}:{value}"
+
+
+def to_event_body(vevent, default_tz):
+    """Turn a parsed VEVENT into an ``events().import`` body.
+
+    Returns:
+        dict: The body, or None for events that are not imported (cancelled, or
+            a changed occurrence of a recurring event).
+
+    Raises:
+        ValueError: If the event has no usable DTSTART.
+    """
+    def first(name):
+        values = vevent.get(name)
+        return values[0] if values else ({}, None)
+
+    if (first("STATUS")[1] or "").upper() == "CANCELLED":
+        return None
+    if "RECURRENCE-ID" in vevent:
+        return None
+    start_params, start_value = first("DTSTART")
+    if not start_value:
+        raise ValueError("Event has no DTSTART")
+    start = _event_time(start_params, start_value, default_tz)
+
+    end_params, end_value = first("DTEND")
+    duration = first("DURATION")[1]
+    if end_value:
+        end = _event_time(end_params, end_value, default_tz)
+    elif duration:
+        end = _shift(start, parse_duration(duration))
+    else:
+        end = _shift(start, datetime.timedelta(days=1) if "date" in start else datetime.timedelta(0))
+
+    uid = first("UID")[1]
+    if not uid:
+        # Stable across runs, so importing the same file twice still de-duplicates
+        seed = f"{start_value}|{first('SUMMARY')[1]}".encode()
+        uid = hashlib.sha256(seed).hexdigest()[:32] + "@ics-import"
+
+    body = {"iCalUID": uid.strip(), "start": start, "end": end}
+    for prop, field in (("SUMMARY", "summary"), ("DESCRIPTION", "description"), ("LOCATION", "location")):
+        value = first(prop)[1]
+        if value:
+            body[field] = unescape_text(value)
+    recurrence = [
+        _format_line(name, params, value)
+        for name in ("RRULE", "RDATE", "EXDATE")
+        for params, value in vevent.get(name, [])
+    ]
+    if recurrence:
+        body["recurrence"] = recurrence
+    if (first("TRANSP")[1] or "").upper() == "TRANSPARENT":
+        body["transparency"] = "transparent"
+    if recurrence:
+        # The API needs a timeZone to expand a series; a UTC start repeats in UTC
+        for event_time in (start, end):
+            if "dateTime" in event_time:
+                event_time.setdefault("timeZone", "UTC")
+    return body
+
+
+# --- Import ----------------------------------------------------------------
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _first_value(vevent, name):
+    values = vevent.get(name)
+    return unescape_text(values[0][1]) if values else None
+
+
+def _note_error(report, label, error):
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append(f"{label}: {error}")
+
+
+def import_ics(service, lines, calendar_id="primary", chunk_size=ICS_CHUNK_SIZE):
+    """Import the VEVENTs read from `lines` into a calendar.
+
+    Args:
+        service: A Calendar API service object.
+        lines: Iterable of text lines, e.g. an open file.
+        calendar_id (str): Calendar to import into.
+        chunk_size (int): Events parsed ahead and sent per round of batches.
+
+    Returns:
+        dict: Counts of 'imported', 'duplicates', 'skipped' and 'failed' events,
+            and 'errors', the first few failures.
+    """
+    store = get_event_store(service, calendar_id)
+    store.refresh(force=True)
+    seen = store.ical_uids()
+    default_tz = get_user_settings(service).timezone
+    report = {"imported": 0, "duplicates": 0, "skipped": 0, "failed": 0, "errors": []}
+
+    def bodies():
+        for vevent in iter_events(lines):
+            try:
+                body = to_event_body(vevent, default_tz)
+            except ValueError as e:
+                _note_error(report, _first_value(vevent, "SUMMARY") or "event", e)
+                continue
+            if body is None:
+                report["skipped"] += 1
+            elif body["iCalUID"] in seen:
+                report["duplicates"] += 1
+            else:
+                seen.add(body["iCalUID"])
+                yield body
+
+    try:
+        for chunk in _chunks(bodies(), chunk_size):
+            requests = [
+                service.events().import_(calendarId=calendar_id, body=body) for body in chunk
+            ]
+            for body, (_, error) in zip(chunk, execute_batched(service, requests)):
+                if error is None:
+                    report["imported"] += 1
+                else:
+                    _note_error(report, body.get("summary") or body["iCalUID"], error)
+            logging.info(f"ICS import progress: {report['imported']} imported, {report['failed']} failed")
+    finally:
+        # Recurring events expand into instances, so let the next sync fetch them
+        store.invalidate()
+    return report
+
+
+def format_report(report):
+    message = (
+        f"Imported {report['imported']} event(s); skipped {report['duplicates']} already in the "
+        f"calendar and {report['skipped']} cancelled or changed occurrence(s); {report['failed']} failed."
+    )
+    if report["errors"]:
+        message += "\n" + "\n".join(f"- {line}" for line in report["errors"])
+    return message
+
+
+# --- Export ----------------------------------------------------------------
+
+
+def escape_text(value):
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def fold(line, limit=LINE_LIMIT):
+    """Fold a content line into chunks of at most `limit` UTF-8 octets."""
+    if len(line.encode()) <= limit:
+        return line
+    parts, current, size = [], "", 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > limit:
+            parts.append(current)
+            current, size = " ", 1
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n".join(parts)
+
+
+def _note_zone(zones, zone, year):
+    # Years each TZID is used in, to know how far its VTIMEZONE has to reach
+    if zones is not None:
+        first, last = zones.get(zone, (year, year))
+        zones[zone] = (min(first, year), max(last, year))
+
+
+def _time_property(name, event_time, zones=None):
+    if "date" in event_time:
+        return f"{name};VALUE=DATE:{event_time['date'].replace('-', '')}"
+    moment = datetime.datetime.fromisoformat(event_time["dateTime"])
+    zone = event_time.get("timeZone")
+    if zone and _valid_zone(zone):
+        # Wall-clock time keeps recurrences on the same local time across DST changes
+        local = moment.astimezone(ZoneInfo(zone)) if moment.tzinfo else moment
+        _note_zone(zones, zone, local.year)
+        return f"{name};TZID={zone}:{local.strftime('%Y%m%dT%H%M%S')}"
+    utc = moment.astimezone(datetime.timezone.utc) if moment.tzinfo else moment
+    return f"{name}:{utc.strftime('%Y%m%dT%H%M%SZ')}"
+
+
+def event_lines(item, zones=None):
+    """The content lines of one VEVENT for a Calendar API event.
+
+    Args:
+        item (dict): The event.
+        zones (dict): Optional; the TZIDs the lines use are added to it, mapped to
+            the first and last year they are used in.
+    """
+    stamp = item.get("updated") or datetime.datetime.now(datetime.timezone.utc).isoformat()
+    stamp = datetime.datetime.fromisoformat(stamp).astimezone(datetime.timezone.utc)
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{item.get('iCalUID') or item['id']}",
+        f"DTSTAMP:{stamp.strftime('%Y%m%dT%H%M%SZ')}",
+        _time_property("DTSTART", item["start"], zones),
+        _time_property("DTEND", item["end"], zones),
+    ]
+    if item.get("originalStartTime"):
+        lines.append(_time_property("RECURRENCE-ID", item["originalStartTime"], zones))
+    for field, prop in (("summary", "SUMMARY"), ("description", "DESCRIPTION"), ("location", "LOCATION")):
+        if item.get(field):
+            lines.append(f"{prop}:{escape_text(item[field])}")
+    if item.get("transparency") == "transparent":
+        lines.append("TRANSP:TRANSPARENT")
+    for line in item.get("recurrence", []):
+        # RDATE/EXDATE lines may name a zone of their own
+        _, params, value = parse_line(line)
+        zone = params.get("TZID")
+        if zone and _valid_zone(zone) and value[:4].isdigit():
+            _note_zone(zones, zone, int(value[:4]))
+        lines.append(line)
+    lines.append("END:VEVENT")
+    return lines
+
+
+_WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+
+def _utc_offset(delta):
+    seconds = int(delta.total_seconds())
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{'-' if delta < datetime.timedelta(0) else '+'}{hours:02d}{minutes:02d}" + (
+        f"{seconds:02d}" if seconds else ""
+    )
+
+
+def _offset_changes(tz, year):
+    """(UTC moment, offset before, offset after) for each UTC offset change of `tz` in `year`."""
+    changes = []
+    day = datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc)
+    while day.year == year:
+        following = day + datetime.timedelta(days=1)
+        before, after = day.astimezone(tz).utcoffset(), following.astimezone(tz).utcoffset()
+        if before != after:
+            # Changes happen on whole minutes; bisect the day for the first one at the new offset
+            low, high = 0, 24 * 60
+            while high - low > 1:
+                middle = (low + high) // 2
+                if (day + datetime.timedelta(minutes=middle)).astimezone(tz).utcoffset() == before:
+                    low = middle
+                else:
+                    high = middle
+            changes.append((day + datetime.timedelta(minutes=high), before, after))
+        day = following
+    return changes
+
+
+def _observance(tz, moment, before, after, yearly=False):
+    local = moment.astimezone(tz)
+    kind = "DAYLIGHT" if local.dst() else "STANDARD"
+    # DTSTART is the wall-clock time the change happens at, read in the old offset
+    onset = (moment + before).replace(tzinfo=None)
+    lines = [
+        f"BEGIN:{kind}",
+        f"DTSTART:{onset.strftime('%Y%m%dT%H%M%S')}",
+        f"TZOFFSETFROM:{_utc_offset(before)}",
+        f"TZOFFSETTO:{_utc_offset(after)}",
+    ]
+    if local.tzname():
+        lines.append(f"TZNAME:{local.tzname()}")
+    if yearly:
+        in_last_week = (onset + datetime.timedelta(days=7)).month != onset.month
+        week = -1 if in_last_week else (onset.day - 1) // 7 + 1
+        lines.append(f"RRULE:FREQ=YEARLY;BYMONTH={onset.month};BYDAY={week}{_WEEKDAYS[onset.weekday()]}")
+    lines.append(f"END:{kind}")
+    return lines
+
+
+def vtimezone_lines(zone, first_year, last_year):
+    """The content lines of a VTIMEZONE for IANA zone `zone`.
+
+    Offset changes from `first_year` up to `last_year` are listed one by one; those
+    of `last_year` repeat yearly from then on, so recurring events past the
+    exported range still get the zone's current rules.
+    """
+    tz = ZoneInfo(zone)
+    start = datetime.datetime(first_year, 1, 1, tzinfo=tz)
+    lines = ["BEGIN:VTIMEZONE", f"TZID:{zone}"]
+    lines += _observance(tz, start.astimezone(datetime.timezone.utc), start.utcoffset(), start.utcoffset())
+    for year in range(first_year, last_year):
+        for change in _offset_changes(tz, year):
+            lines += _observance(tz, *change)
+    for change in _offset_changes(tz, last_year):
+        lines += _observance(tz, *change, yearly=True)
+    lines.append("END:VTIMEZONE")
+    return lines
+
+
+def export_ics(service, out, time_min, time_max, calendar_id="primary"):
+    """Write the events overlapping ``[time_min, time_max)`` to `out` as iCalendar.
+
+    Args:
+        service: A Calendar API service object.
+        out: Writable text stream.
+        time_min (datetime): Start of the range, aware.
+        time_max (datetime): End of the range, aware.
+        calendar_id (str): Calendar to export.
+
+    Returns:
+        int: The number of VEVENTs written.
+    """
+    out.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Calendar Assistant//ICS Export//EN\r\n"
+              "CALSCALE:GREGORIAN\r\n")
+    count = 0
+    pages = iter_pages(
+        service,
+        calendar_id,
+        fields=EXPORT_FIELDS,
+        timeMin=time_min.isoformat(),
+        timeMax=time_max.isoformat(),
+        singleEvents=False,
+        maxResults=2500,
+    )
+    zones = {}
+    for page in pages:
+        for item in page.get("items", []):
+            if item.get("status") == "cancelled":
+                continue
+            for line in event_lines(item, zones):
+                out.write(fold(line) + "\r\n")
+            count += 1
+    for zone, (first_year, last_year) in sorted(zones.items()):
+        for line in vtimezone_lines(zone, first_year, max(last_year, time_max.year)):
+            out.write(fold(line) + "\r\n")
+    out.write("END:VCALENDAR\r\n")
+    return count
+
+
+def day_range(start_date, end_date, tz):
+    """Aware datetimes from the start of `start_date` to the end of `end_date` (inclusive)."""
+    first = datetime.date.fromisoformat(start_date)
+    last = datetime.date.fromisoformat(end_date)
+    start = datetime.datetime.combine(first, datetime.time(), tz)
+    return start, datetime.datetime.combine(last + datetime.timedelta(days=1), datetime.time(), tz)
+
+
+# --- Files -----------------------------------------------------------------
+
+
+def user_ics_dir(user_id=None):
+    """The folder holding `user_id`'s uploaded and exported .ics files."""
+    digest = hashlib.sha256((user_id or current_user.get()).encode()).hexdigest()[:32]
+    path = os.path.join(ICS_DIR, digest)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def ics_path(file_name, user_id=None):
+    """Path of a file in the user's folder.
+
+    Raises:
+        ValueError: If `file_name` is not a plain ``.ics`` file name.
+    """
+    name = file_name.strip()
+    if not name or os.path.basename(name) != name or not name.lower().endswith(".ics"):
+        raise ValueError(f"Expected a plain .ics file name, got {file_name!r}")
+    return os.path.join(user_ics_dir(user_id), name)
+
+
+def list_ics_files(user_id=None):
+    folder = user_ics_dir(user_id)
+    return sorted(name for name in os.listdir(folder) if name.lower().endswith(".ics"))
+
+
+# --- Command line ----------------------------------------------------------
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export Google Calendar events as .ics")
+    parser.add_argument("--user", default=DEFAULT_USER,
+                        help="Google account id whose saved credentials to use (shown in the app's sidebar)")
+    parser.add_argument("--calendar", default="primary", help="calendar id")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="import events from an .ics file ('-' for stdin)")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--chunk-size", type=int, default=ICS_CHUNK_SIZE)
+    export_cmd = commands.add_parser("export", help="export a date range to an .ics file ('-' for stdout)")
+    export_cmd.add_argument("path")
+    export_cmd.add_argument("--start", required=True, help="first day, YYYY-MM-DD")
+    export_cmd.add_argument("--end", required=True, help="last day (inclusive), YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    current_user.set(args.user)
+    from calendar_tools import google_Calendar_client
+
+    service = google_Calendar_client()
+    if service is None:
+        print(
+            f"No saved credentials for account id {args.user!r}; sign in through the app first "
+            "and copy the account id from its sidebar.",
+            file=sys.stderr,
+        )
+        return 1
+
+    if args.command == "import":
+        lines = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8", errors="replace")
+        with lines:
+            report = import_ics(service, lines, args.calendar, args.chunk_size)
+        print(format_report(report))
+        return 1 if report["failed"] else 0
+
+    tz = get_user_settings(service).tz
+    time_min, time_max = day_range(args.start, args.end, tz)
+    out = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8", newline="")
+    with out:
+        count = export_ics(service, out, time_min, time_max, args.calendar)
+    print(f"Exported {count} event(s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
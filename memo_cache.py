@@ -0,0 +1,179 @@
+"""Memoized read-tool results and agent replies.
+
+Users often repeat or rephrase a read question ("what's on tomorrow?"). Read
+tool results are cached under the tool name, its normalised arguments and the
+calendar version; agent replies, optionally, under the normalised message, the
+user's current date and the calendar version.
+
+The calendar version is the primary event store's change counter. Every create
+or delete made through the tools, and every change a sync picks up, bumps it,
+so an entry computed from an older calendar is never served again. Calendars
+other than the primary one are only covered by the TTL.
+
+Caches are kept per Calendar service (one per user) and are LRU with a TTL:
+``TOOL_CACHE_SIZE`` / ``TOOL_CACHE_TTL`` (default 256 entries, 60 s) and
+``RESPONSE_CACHE_SIZE`` / ``RESPONSE_CACHE_TTL`` (default 0 entries, i.e. off,
+and 300 s). Replies are off by default because a message can mean something
+different depending on the earlier turns of a conversation.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+
+from event_store import get_event_store
+
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "256"))
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "60"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "0"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU mapping whose entries also expire `ttl` seconds after being stored."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            stored_at, value = entry
+            if time.monotonic() - stored_at >= self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_metrics = Counter()
+_tool_caches = weakref.WeakKeyDictionary()
+_reply_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def _cache(caches, service, maxsize, ttl):
+    with _caches_lock:
+        cache = caches.get(service)
+        if cache is None:
+            cache = caches[service] = LRUCache(maxsize, ttl)
+        return cache
+
+
+def stats():
+    """Hit and miss counters per cache."""
+    return dict(_metrics)
+
+
+def normalize(value):
+    """Canonical, hashable form of tool arguments or a message.
+
+    Strings are lower-cased with whitespace collapsed; lists are order-insensitive.
+    """
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted((normalize(v) for v in value), key=repr))
+    return value
+
+
+def calendar_version(service):
+    """The primary calendar's change counter, after bringing the store up to date."""
+    store = get_event_store(service)
+    store.refresh()
+    return store.version
+
+
+async def acalendar_version(service, client):
+    store = get_event_store(service)
+    await store.arefresh(client)
+    return store.version
+
+
+def _lookup(cache, name, key):
+    value = cache.get(key, _MISSING)
+    _metrics[f"{name}.{'misses' if value is _MISSING else 'hits'}"] += 1
+    return value
+
+
+def memoize_tool(service, name, args, compute):
+    """Return ``compute()``, cached for `service`'s user until the calendar changes.
+
+    Args:
+        service: The user's Calendar API service.
+        name (str): Tool name.
+        args (dict): The tool's arguments.
+        compute: Zero-argument callable producing the result. Exceptions propagate
+            and nothing is cached.
+    """
+    if TOOL_CACHE_SIZE <= 0:
+        return compute()
+    cache = _cache(_tool_caches, service, TOOL_CACHE_SIZE, TOOL_CACHE_TTL)
+    key = (name, normalize(args), calendar_version(service))
+    value = _lookup(cache, "tool", key)
+    if value is _MISSING:
+        value = compute()
+        cache.put(key, value)
+    else:
+        logging.info(f"Tool cache hit: {name}({args})")
+    return value
+
+
+async def amemoize_tool(service, client, name, args, compute):
+    """Async ``memoize_tool``; `compute()` returns an awaitable."""
+    if TOOL_CACHE_SIZE <= 0:
+        return await compute()
+    cache = _cache(_tool_caches, service, TOOL_CACHE_SIZE, TOOL_CACHE_TTL)
+    key = (name, normalize(args), await acalendar_version(service, client))
+    value = _lookup(cache, "tool", key)
+    if value is _MISSING:
+        value = await compute()
+        cache.put(key, value)
+    else:
+        logging.info(f"Tool cache hit: {name}({args})")
+    return value
+
+
+def _reply_key(text, today, version):
+    return (normalize(text), today.isoformat(), version)
+
+
+def cached_reply(service, text, today, version):
+    """The remembered reply to `text` on `today` at calendar `version`, or None."""
+    cache = _cache(_reply_caches, service, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+    value = _lookup(cache, "reply", _reply_key(text, today, version))
+    return None if value is _MISSING else value
+
+
+def remember_reply(service, text, today, version, reply):
+    """Remember `reply` to `text` on `today` at calendar `version`."""
+    cache = _cache(_reply_caches, service, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+    cache.put(_reply_key(text, today, version), reply)
+
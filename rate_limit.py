@@ -0,0 +1,194 @@
+"""Client-side rate limiting and retries for Calendar API and LLM calls.
+
+Every call first takes a token from a global bucket and from the current
+user's bucket, so one busy session cannot use up the project quota for
+everyone. Calls that fail with a transient error (Calendar 403
+rateLimitExceeded / 429 / 5xx, Gemini ResourceExhausted / ServiceUnavailable,
+connection errors) are retried with full-jitter exponential backoff, honouring
+``Retry-After`` when the server sends one.
+
+Rates are configured with environment variables (calls per second; 0 disables
+a bucket): ``CALENDAR_QPS`` / ``CALENDAR_USER_QPS`` and ``LLM_QPS`` /
+``LLM_USER_QPS``, with ``CALENDAR_BURST`` / ``LLM_BURST`` calls allowed at once
+after a quiet period. ``RETRY_MAX_ATTEMPTS`` bounds the attempts per call.
+Throttling and retry counts are available from ``stats()``.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+from credential_store import current_user
+
+CALENDAR_QPS = float(os.getenv("CALENDAR_QPS", "20"))
+CALENDAR_USER_QPS = float(os.getenv("CALENDAR_USER_QPS", "5"))
+CALENDAR_BURST = float(os.getenv("CALENDAR_BURST", "50"))
+LLM_QPS = float(os.getenv("LLM_QPS", "5"))
+LLM_USER_QPS = float(os.getenv("LLM_USER_QPS", "1"))
+LLM_BURST = float(os.getenv("LLM_BURST", "10"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 8.0
+
+_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded")
+_RETRYABLE_TYPES = (
+    "ResourceExhausted", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "TooManyRequests",
+)
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `capacity`.
+
+    Callers reserve tokens up front and may go into debt; the returned wait
+    time pays the debt back, so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """Take `tokens` and return how many seconds to wait before using them."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class RateLimiter:
+    """A global bucket plus one bucket per user, for one kind of call."""
+
+    def __init__(self, name, rate, per_user_rate, burst=None):
+        self.name = name
+        self.per_user_rate = per_user_rate
+        self.burst = burst
+        self._global = TokenBucket(rate, burst)
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def _user_bucket(self, user):
+        with self._lock:
+            bucket = self._users.get(user)
+            if bucket is None:
+                bucket = self._users[user] = TokenBucket(self.per_user_rate, self.burst)
+            return bucket
+
+    def _reserve(self, tokens):
+        user = current_user.get()
+        wait = max(self._global.reserve(tokens), self._user_bucket(user).reserve(tokens))
+        _metrics[f"{self.name}.calls"] += 1
+        if wait > 0:
+            _metrics[f"{self.name}.throttled"] += 1
+            _metrics[f"{self.name}.throttle_seconds"] += wait
+            logging.info(f"Throttling {self.name} call for {user} by {wait:.2f}s")
+        return wait
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` calls are allowed; returns the seconds waited."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens=1):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+_metrics = Counter()
+
+calendar_limiter = RateLimiter("calendar", CALENDAR_QPS, CALENDAR_USER_QPS, CALENDAR_BURST)
+llm_limiter = RateLimiter("llm", LLM_QPS, LLM_USER_QPS, LLM_BURST)
+
+
+def stats():
+    """Call, throttle and retry counters per limiter."""
+    return dict(_metrics)
+
+
+def is_retryable(exc):
+    """True for errors a later attempt may not hit (quota, overload, network)."""
+    resp = getattr(exc, "resp", None)
+    if resp is not None and hasattr(resp, "status"):
+        # googleapiclient HttpError
+        status = int(resp.status)
+        if status == 403:
+            reason = getattr(exc, "reason", "") or ""
+            content = getattr(exc, "content", b"") or b""
+            return any(
+                r in reason or r.encode() in content for r in _RATE_LIMIT_REASONS
+            )
+        return status == 429 or status >= 500
+    if type(exc).__name__ in _RETRYABLE_TYPES:
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def retry_delay(exc, attempt):
+    """Full-jitter exponential backoff, or the server's Retry-After if given."""
+    resp = getattr(exc, "resp", None)
+    retry_after = resp.get("retry-after") if isinstance(resp, dict) else None
+    if retry_after and str(retry_after).isdigit():
+        return min(float(retry_after), RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _should_retry(limiter, exc, attempt, max_attempts, span_attrs):
+    if not is_retryable(exc):
+        return False
+    if attempt + 1 >= max_attempts:
+        _metrics[f"{limiter.name}.gave_up"] += 1
+        return False
+    _metrics[f"{limiter.name}.retries"] += 1
+    if span_attrs is not None:
+        span_attrs["retries"] = span_attrs.get("retries", 0) + 1
+    logging.warning(f"Retrying {limiter.name} call after error: {exc}")
+    return True
+
+
+def call_with_retry(fn, limiter, tokens=1, max_attempts=RETRY_MAX_ATTEMPTS, span_attrs=None):
+    """Call `fn()` under `limiter`, retrying transient errors with backoff.
+
+    Args:
+        fn: Zero-argument callable making one attempt.
+        limiter (RateLimiter): Limiter the call is counted against.
+        tokens (int): Calls this attempt makes (e.g. the items in a batch).
+        max_attempts (int): Attempts before the last error is raised.
+        span_attrs (dict): Optional tracing span attributes to record retries in.
+    """
+    for attempt in range(max_attempts):
+        limiter.acquire(tokens)
+        try:
+            return fn()
+        except Exception as e:
+            if not _should_retry(limiter, e, attempt, max_attempts, span_attrs):
+                raise
+            time.sleep(retry_delay(e, attempt))
+
+
+async def acall_with_retry(fn, limiter, tokens=1, max_attempts=RETRY_MAX_ATTEMPTS, span_attrs=None):
+    """Async ``call_with_retry``; `fn()` returns an awaitable."""
+    for attempt in range(max_attempts):
+        await limiter.aacquire(tokens)
+        try:
+            return await fn()
+        except Exception as e:
+            if not _should_retry(limiter, e, attempt, max_attempts, span_attrs):
+                raise
+            await asyncio.sleep(retry_delay(e, attempt))
@@ -0,0 +1,203 @@
+"""Local expansion of recurring events.
+
+The event store syncs with ``singleEvents=False``. The API then sends a
+recurring event once, as its master event with RRULE/RDATE/EXDATE lines. Only
+changed or cancelled occurrences come as separate items. Expanding the series
+server-side would instead send every occurrence, so a weekly standup is a few
+hundred near-identical items on each full sync.
+
+A ``Series`` generates occurrences with dateutil's ``rrule`` lazily, only for
+the range a query asks about. It skips occurrences the store knows were
+changed or cancelled. Timed series repeat on the wall-clock time of their own
+timezone, so they stay at 09:00 across DST changes; all-day series fall on
+dates in the calendar's timezone. Generated occurrences use
+the API's instance ids (``<master id>_<original start>``), so deleting one
+removes just that occurrence.
+"""
+import copy
+import datetime
+import logging
+from zoneinfo import ZoneInfo
+
+from dateutil.rrule import rruleset, rrulestr
+
+_UTC = datetime.timezone.utc
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name) if name else None
+    except Exception:
+        logging.error(f"Unknown timezone {name!r} in recurring event, using its UTC offset")
+        return None
+
+
+def _fit_until(rule, dtstart):
+    # dateutil wants UNTIL in UTC for a timed series and floating for an all-day one
+    parts = rule.split(";")
+    for i, part in enumerate(parts):
+        key, _, value = part.partition("=")
+        if key.upper() != "UNTIL":
+            continue
+        if dtstart.tzinfo is None:
+            value = value.rstrip("Zz")
+        elif not value.upper().endswith("Z"):
+            value = (value if "T" in value else value + "T235959") + "Z"
+        parts[i] = f"UNTIL={value}"
+    return ";".join(parts)
+
+
+def _parse_moment(text, tzid, dtstart):
+    """An EXDATE/RDATE value in the same form (aware or floating) as `dtstart`."""
+    text = text.strip()
+    if "T" not in text:
+        day = datetime.datetime.strptime(text, "%Y%m%d")
+        return datetime.datetime.combine(day.date(), dtstart.timetz())
+    if text.upper().endswith("Z"):
+        moment = datetime.datetime.strptime(text[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=_UTC)
+    else:
+        moment = datetime.datetime.strptime(text, "%Y%m%dT%H%M%S")
+        moment = moment.replace(tzinfo=_zone(tzid) or dtstart.tzinfo)
+    if dtstart.tzinfo is None:
+        moment = moment.astimezone(_UTC).replace(tzinfo=None) if moment.tzinfo else moment
+    return moment
+
+
+def parse_recurrence(lines, dtstart):
+    """Build a ``rruleset`` from an event's ``recurrence`` lines.
+
+    Args:
+        lines (list): RRULE, RDATE and EXDATE lines, as in the API's ``recurrence`` field.
+        dtstart (datetime): First occurrence. Aware for timed events, naive (floating) for
+            all-day ones.
+    """
+    rules = rruleset(cache=True)
+    # DTSTART is always an occurrence, whether or not it matches the rule
+    rules.rdate(dtstart)
+    for line in lines:
+        name, _, value = line.partition(":")
+        name, *params = name.split(";")
+        name = name.upper()
+        if name == "RRULE":
+            rules.rrule(rrulestr(_fit_until(value, dtstart), dtstart=dtstart))
+        elif name in ("RDATE", "EXDATE"):
+            tzid = next((p[len("TZID="):] for p in params if p.upper().startswith("TZID=")), None)
+            add = rules.rdate if name == "RDATE" else rules.exdate
+            for text in value.split(","):
+                add(_parse_moment(text, tzid, dtstart))
+        else:
+            logging.warning(f"Ignoring unsupported recurrence line: {line}")
+    return rules
+
+
+def instance_id(master_id, original_start):
+    """The API's id for an occurrence of `master_id`.
+
+    Args:
+        original_start: The occurrence's original start, an aware datetime for
+            timed events or a date for all-day ones.
+    """
+    if isinstance(original_start, datetime.datetime):
+        return f"{master_id}_{original_start.astimezone(_UTC).strftime('%Y%m%dT%H%M%SZ')}"
+    return f"{master_id}_{original_start.strftime('%Y%m%d')}"
+
+
+def parse_instance_id(event_id):
+    """Split an instance id into (master id, original start), or None.
+
+    The original start is an aware UTC datetime, or a date for all-day events.
+    """
+    master_id, _, suffix = event_id.rpartition("_")
+    try:
+        return master_id, datetime.datetime.strptime(suffix, "%Y%m%dT%H%M%SZ").replace(tzinfo=_UTC)
+    except ValueError:
+        pass
+    try:
+        return master_id, datetime.datetime.strptime(suffix, "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+class Series:
+    """A recurring event: its master ``EventRecord`` and the rules generating its occurrences.
+
+    Args:
+        master: ``EventRecord`` of the master event (its first occurrence).
+        recurrence (list): The master's ``recurrence`` lines.
+        start (dict): The master's ``start`` object, for its timezone.
+        tz (tzinfo): The calendar's timezone, in which all-day dates are resolved.
+    """
+
+    def __init__(self, master, recurrence, start, tz=_UTC):
+        self.master = master
+        self.tz = tz
+        if master.all_day:
+            day = datetime.date.fromisoformat(start["date"])
+            self.dtstart = datetime.datetime(day.year, day.month, day.day)
+            # Whole days, even when a DST change makes one of them 23 or 25 hours long
+            self.duration = datetime.date.fromisoformat(master.end) - day
+        else:
+            self.duration = master.end_at - master.start_at
+            first = datetime.datetime.fromisoformat(start["dateTime"])
+            tz = _zone(start.get("timeZone"))
+            if first.tzinfo is None:
+                first = first.replace(tzinfo=tz or _UTC)
+            self.dtstart = first.astimezone(tz) if tz else first
+        self.rules = parse_recurrence(recurrence, self.dtstart)
+
+    @property
+    def id(self):
+        return self.master.id
+
+    def _utc(self, moment):
+        return moment.replace(tzinfo=self.tz).astimezone(_UTC) if moment.tzinfo is None else moment.astimezone(_UTC)
+
+    def _local(self, moment):
+        # All-day occurrences are floating dates in the calendar's timezone
+        return moment.astimezone(self.tz).replace(tzinfo=None) if self.dtstart.tzinfo is None else moment
+
+    def instances(self, time_min, time_max=None, excluded=()):
+        """Occurrences overlapping ``[time_min, time_max)`` as ``EventRecord``s, by start time.
+
+        Occurrences are generated one at a time, so an open-ended series can be
+        consumed up to any limit.
+
+        Args:
+            time_min (datetime): Aware lower bound; occurrences must end after it.
+            time_max (datetime): Optional aware upper bound; occurrences must start before it.
+            excluded: Original start times (UTC) of changed or cancelled occurrences.
+        """
+        for start in self.rules.xafter(self._local(time_min - self.duration)):
+            original = self._utc(start)
+            if time_max is not None and original >= time_max:
+                return
+            if original in excluded:
+                continue
+            yield occurrence_of(
+                self.master,
+                instance_id(self.id, start.date() if self.master.all_day else original),
+                start, start + self.duration, self.tz,
+            )
+
+    def first_instance(self, time_min=None, time_max=None, excluded=()):
+        """The earliest occurrence in the range, or None."""
+        time_min = time_min or self.master.start_at
+        return next(self.instances(time_min, time_max, excluded), None)
+
+
+def occurrence_of(record, event_id, start, end, tz=_UTC):
+    """Copy of `record` moved to `start`/`end`.
+
+    `start` and `end` are local datetimes; for all-day events they are naive
+    and mean wall-clock time in `tz`.
+    """
+    instance = copy.copy(record)
+    instance.id = event_id
+    if record.all_day:
+        instance.start, instance.end = start.date().isoformat(), end.date().isoformat()
+        instance.start_at = start.replace(tzinfo=tz).astimezone(_UTC)
+        instance.end_at = end.replace(tzinfo=tz).astimezone(_UTC)
+    else:
+        instance.start, instance.end = start.isoformat(), end.isoformat()
+        instance.start_at, instance.end_at = start.astimezone(_UTC), end.astimezone(_UTC)
+    return instance
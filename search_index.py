@@ -0,0 +1,215 @@
+"""Local full-text search over a calendar's events.
+
+Each ``EventStore`` keeps a ``SearchIndex`` of its events, built on the first
+search and then updated as events are added, changed or removed, so a question
+like "when is my dentist appointment?" is answered without listing the
+calendar. Summary, attendees, location and description are indexed with
+decreasing weight and ranked with BM25; a query word also matches longer words
+it is a prefix of ("kick" finds "kickoff").
+
+Set ``SEARCH_EMBEDDING_MODEL`` to a ``fastembed`` model name (for example
+``BAAI/bge-small-en-v1.5``) to also rank by semantic similarity on the CPU; the
+two rankings are combined with reciprocal rank fusion. Events are embedded in
+batches at search time rather than during a sync. Without ``fastembed``
+installed, search is keyword-only.
+"""
+import bisect
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+SEARCH_EMBEDDING_MODEL = os.getenv("SEARCH_EMBEDDING_MODEL", "")
+FIELD_WEIGHTS = {"summary": 3.0, "attendees": 2.0, "location": 1.5, "description": 1.0}
+MIN_PREFIX = 3
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"\w+")
+_STOP_WORDS = frozenset(
+    "a an and at for from in is my of on or the to with".split()
+)
+
+
+def tokenize(text):
+    """Lower-cased words of `text`, without stop words, plurals reduced to the singular."""
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        if word in _STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def _document(record):
+    return {
+        "summary": record.summary,
+        "attendees": " ".join(record.attendees),
+        "location": record.location,
+        "description": record.description,
+    }
+
+
+class SearchIndex:
+    """Weighted inverted index over ``EventRecord``s, keyed by event id.
+
+    Not thread-safe; the owning ``EventStore`` serialises access with its lock.
+    """
+
+    def __init__(self, embedding_model=SEARCH_EMBEDDING_MODEL):
+        self._postings = defaultdict(dict)  # term -> {event_id: weighted term frequency}
+        self._lengths = {}  # event_id -> weighted document length
+        self._terms = {}  # event_id -> terms, for removal
+        self._vocabulary = []  # sorted terms, for prefix matches
+        self._total_length = 0.0
+        self._vectors = _VectorIndex(embedding_model) if embedding_model else None
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, record):
+        """Index `record`, replacing any earlier version of the same event."""
+        self.remove(record.id)
+        frequencies = Counter()
+        for field, text in _document(record).items():
+            for term in tokenize(text):
+                frequencies[term] += FIELD_WEIGHTS[field]
+        for term, weight in frequencies.items():
+            postings = self._postings[term]
+            if not postings:
+                bisect.insort(self._vocabulary, term)
+            postings[record.id] = weight
+        length = sum(frequencies.values())
+        self._lengths[record.id] = length
+        self._terms[record.id] = list(frequencies)
+        self._total_length += length
+        if self._vectors is not None:
+            self._vectors.add(record.id, " ".join(t for t in _document(record).values() if t))
+
+    def remove(self, event_id):
+        terms = self._terms.pop(event_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(event_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+        self._total_length -= self._lengths.pop(event_id)
+        if self._vectors is not None:
+            self._vectors.remove(event_id)
+
+    def _expand(self, term):
+        # The term itself, or the indexed words it is a prefix of
+        if term in self._postings or len(term) < MIN_PREFIX:
+            return [term]
+        start = bisect.bisect_left(self._vocabulary, term)
+        matches = []
+        for candidate in self._vocabulary[start:]:
+            if not candidate.startswith(term):
+                break
+            matches.append(candidate)
+        return matches
+
+    def keyword_scores(self, query):
+        """BM25 score of every event matching at least one query term."""
+        count = len(self._lengths)
+        if not count:
+            return {}
+        average = self._total_length / count or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            for indexed in self._expand(term):
+                postings = self._postings.get(indexed, {})
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for event_id, frequency in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[event_id] / average)
+                    scores[event_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query, candidates=None):
+        """Event ids ranked by relevance to `query`, best first.
+
+        Args:
+            query (str): Free-text query.
+            candidates (set): Optional ids to restrict the results to.
+        """
+        keyword = self.keyword_scores(query)
+        ranked = sorted(keyword, key=keyword.get, reverse=True)
+        if candidates is not None:
+            ranked = [event_id for event_id in ranked if event_id in candidates]
+        if self._vectors is None:
+            return ranked
+        semantic = self._vectors.search(query, candidates)
+        if semantic is None:
+            return ranked
+        # Reciprocal rank fusion of the keyword and semantic rankings
+        fused = defaultdict(float)
+        for ranking in (ranked, semantic):
+            for rank, event_id in enumerate(ranking):
+                fused[event_id] += 1.0 / (RRF_K + rank)
+        return sorted(fused, key=fused.get, reverse=True)
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _embedding_model(name):
+    """The shared ``fastembed`` model called `name`, or None if fastembed is missing."""
+    with _models_lock:
+        if name not in _models:
+            try:
+                from fastembed import TextEmbedding
+            except ImportError:
+                logging.warning("fastembed is not installed; event search is keyword-only")
+                _models[name] = None
+            else:
+                _models[name] = TextEmbedding(name)
+        return _models[name]
+
+
+class _VectorIndex:
+    """Embeddings of event texts, computed in batches when a search needs them."""
+
+    MIN_SIMILARITY = 0.3
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._pending = {}  # event_id -> text not embedded yet
+        self._vectors = {}
+
+    def add(self, event_id, text):
+        self._vectors.pop(event_id, None)
+        self._pending[event_id] = text
+
+    def remove(self, event_id):
+        self._vectors.pop(event_id, None)
+        self._pending.pop(event_id, None)
+
+    def search(self, query, candidates=None):
+        """Event ids by cosine similarity to `query`, or None without a model."""
+        import numpy as np
+
+        model = _embedding_model(self.model_name)
+        if model is None:
+            return None
+        if self._pending:
+            ids = list(self._pending)
+            for event_id, vector in zip(ids, model.embed([self._pending[i] for i in ids])):
+                self._vectors[event_id] = vector / (np.linalg.norm(vector) or 1.0)
+            self._pending.clear()
+        ids = [i for i in self._vectors if candidates is None or i in candidates]
+        if not ids:
+            return []
+        query_vector = next(iter(model.query_embed(query)))
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        similarities = np.stack([self._vectors[i] for i in ids]) @ query_vector
+        order = np.argsort(-similarities)
+        return [ids[i] for i in order if similarities[i] >= self.MIN_SIMILARITY]
@@ -0,0 +1,173 @@
+"""Process-wide pool of Google API service objects.
+
+Building a discovery-based service is expensive: it parses the discovery
+document and creates a fresh HTTP client. The pool does that once per
+credential identity (one per user) and hands the same service object to every
+caller afterwards.
+
+googleapiclient services are not thread-safe because the underlying httplib2
+client is not, so each service is built with a request builder that routes
+every request through a per-thread ``AuthorizedHttp``. Each worker thread keeps
+its own persistent connection, and threads never share a transport. Requests
+are also rate limited and retried on transient errors (see ``rate_limit``).
+"""
+import logging
+import threading
+import time
+
+import google_auth_httplib2
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+
+import tracing
+from rate_limit import calendar_limiter, call_with_retry
+
+
+class PooledHttpRequest(HttpRequest):
+    """HttpRequest that is rate limited, retried with backoff and traced.
+
+    The span records the response size and the number of retries.
+    """
+
+    def execute(self, http=None, num_retries=0):
+        sizes = []
+        postproc = self.postproc
+
+        def measure(resp, content):
+            sizes.append(len(content or b""))
+            return postproc(resp, content)
+
+        self.postproc = measure
+        try:
+            with tracing.span(self.methodId or self.uri, "api", method=self.method) as attrs:
+                # Retries are ours (with jitter and metrics), not googleapiclient's
+                result = call_with_retry(
+                    lambda: HttpRequest.execute(self, http=http),
+                    calendar_limiter,
+                    span_attrs=attrs,
+                )
+                attrs["bytes"] = sizes[-1] if sizes else 0
+                return result
+        finally:
+            self.postproc = postproc
+
+
+class ServicePool:
+    """Caches built services keyed by API, version and credential identity.
+
+    Each entry remembers the credentials object it was built with, so storing
+    new credentials for a user (re-authorization) rebuilds the service on next
+    use, while in-place token refreshes keep the existing one.
+
+    Services are built outside the pool-wide lock, under a lock per key, so a
+    slow first build for one user never holds up lookups for the others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._services = {}
+        self._build_locks = {}
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+        self.last_build_seconds = 0.0
+
+    def get(self, api_name, api_version, identity, creds):
+        """Return the cached service for `identity`, building it on first use."""
+        key = (api_name, api_version, identity)
+        with self._lock:
+            service = self._lookup(key, creds)
+            if service is not None:
+                return service
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                # Built by another thread while this one waited
+                service = self._lookup(key, creds)
+                if service is not None:
+                    return service
+                self.misses += 1
+            service, elapsed = self._build(key, creds)
+            with self._lock:
+                self._services[key] = (service, creds)
+                self.builds += 1
+                self.build_seconds += elapsed
+                self.last_build_seconds = elapsed
+            return service
+
+    def _lookup(self, key, creds):
+        # Caller holds self._lock
+        entry = self._services.get(key)
+        if entry is not None and entry[1] is creds:
+            self.hits += 1
+            return entry[0]
+        return None
+
+    def credentials(self, service):
+        """Return the credentials a pooled service was built with."""
+        with self._lock:
+            for entry in self._services.values():
+                if entry[0] is service:
+                    return entry[1]
+        return None
+
+    def invalidate(self, identity=None):
+        """Drop pooled services, optionally only those for one identity."""
+        with self._lock:
+            if identity is None:
+                self._services.clear()
+                self._build_locks.clear()
+                return
+            for key in [k for k in self._services if k[2] == identity]:
+                del self._services[key]
+            for key in [k for k in self._build_locks if k[2] == identity]:
+                del self._build_locks[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "builds": self.builds,
+                "build_seconds_total": self.build_seconds,
+                "last_build_seconds": self.last_build_seconds,
+                "pooled_services": len(self._services),
+            }
+
+    def _build(self, key, creds):
+        started = time.perf_counter()
+        with tracing.span(f"build {key[0]} {key[1]} service", "setup"):
+            service = build(
+                key[0],
+                key[1],
+                credentials=creds,
+                static_discovery=True,
+                requestBuilder=self._request_builder(key, creds),
+            )
+        elapsed = time.perf_counter() - started
+        logging.info(f"Built {key[0]} {key[1]} service in {elapsed * 1000:.1f} ms")
+        return service, elapsed
+
+    def _request_builder(self, key, creds):
+        def build_request(http, *args, **kwargs):
+            return PooledHttpRequest(self._thread_http(key, creds), *args, **kwargs)
+
+        return build_request
+
+    def _thread_http(self, key, creds):
+        transports = getattr(self._local, "transports", None)
+        if transports is None:
+            transports = self._local.transports = {}
+        cached = transports.get(key)
+        if cached is None or cached[0] is not creds:
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+            cached = transports[key] = (creds, http)
+        return cached[1]
+
+
+service_pool = ServicePool()
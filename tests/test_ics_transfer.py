@@ -0,0 +1,168 @@
+"""iCalendar parsing and writing: unfolding, DURATION, nested components, UIDs and VTIMEZONE."""
+import datetime
+import io
+import unittest
+from zoneinfo import ZoneInfo
+
+from dateutil.tz import tzical
+
+from ics_transfer import (
+    event_lines,
+    fold,
+    iter_events,
+    parse_duration,
+    parse_line,
+    to_event_body,
+    unfold,
+    vtimezone_lines,
+)
+
+
+def _vevent(*lines):
+    return ["BEGIN:VCALENDAR", "BEGIN:VEVENT", *lines, "END:VEVENT", "END:VCALENDAR"]
+
+
+def _body(*lines, default_tz="Europe/Berlin"):
+    (vevent,) = iter_events(_vevent(*lines))
+    return to_event_body(vevent, default_tz)
+
+
+class UnfoldTest(unittest.TestCase):
+    def test_joins_space_and_tab_continuations(self):
+        lines = ["SUMMARY:Quarterly\r\n", " planning\r\n", "\t review\r\n", "LOCATION:Room 1\r\n"]
+        self.assertEqual(list(unfold(lines)), ["SUMMARY:Quarterlyplanning review", "LOCATION:Room 1"])
+
+    def test_fold_round_trip_on_octet_boundaries(self):
+        line = "DESCRIPTION:" + "Grüße aus München, " * 10
+        folded = fold(line)
+        for part in folded.split("\r\n"):
+            self.assertLessEqual(len(part.encode()), 75)
+        self.assertEqual(list(unfold(folded.split("\r\n"))), [line])
+
+    def test_parse_line_keeps_quoted_colons_in_params(self):
+        name, params, value = parse_line('attendee;cn="Doe: Jane";ROLE=CHAIR:mailto:jane@example.com')
+        self.assertEqual(name, "ATTENDEE")
+        self.assertEqual(params, {"CN": "Doe: Jane", "ROLE": "CHAIR"})
+        self.assertEqual(value, "mailto:jane@example.com")
+
+
+class DurationTest(unittest.TestCase):
+    def test_parses_weeks_days_and_times(self):
+        self.assertEqual(parse_duration("PT1H30M"), datetime.timedelta(hours=1, minutes=30))
+        self.assertEqual(parse_duration("P2W"), datetime.timedelta(weeks=2))
+        self.assertEqual(parse_duration("P1DT12H"), datetime.timedelta(days=1, hours=12))
+        self.assertEqual(parse_duration("-PT15M"), -datetime.timedelta(minutes=15))
+
+    def test_rejects_unsupported_values(self):
+        with self.assertRaises(ValueError):
+            parse_duration("1 hour")
+
+    def test_duration_sets_the_end(self):
+        body = _body("UID:a", "DTSTART;TZID=Europe/Paris:20250630T140000", "DURATION:PT45M")
+        self.assertEqual(body["end"], {"dateTime": "2025-06-30T14:45:00", "timeZone": "Europe/Paris"})
+
+    def test_all_day_event_without_end_lasts_one_day(self):
+        body = _body("UID:a", "DTSTART;VALUE=DATE:20250630")
+        self.assertEqual((body["start"], body["end"]), ({"date": "2025-06-30"}, {"date": "2025-07-01"}))
+
+
+class NestingTest(unittest.TestCase):
+    def test_valarm_properties_stay_out_of_the_event(self):
+        (vevent,) = iter_events(_vevent(
+            "UID:a",
+            "SUMMARY:Dentist",
+            "BEGIN:VALARM",
+            "TRIGGER:-PT15M",
+            "DESCRIPTION:Reminder",
+            "END:VALARM",
+            "DTSTART:20250630T140000Z",
+        ))
+        self.assertNotIn("TRIGGER", vevent)
+        self.assertNotIn("DESCRIPTION", vevent)
+        self.assertEqual(vevent["DTSTART"], [({}, "20250630T140000Z")])
+
+    def test_components_outside_events_are_ignored(self):
+        lines = [
+            "BEGIN:VCALENDAR",
+            "BEGIN:VTIMEZONE", "TZID:Europe/Berlin", "BEGIN:STANDARD", "DTSTART:19701025T030000",
+            "END:STANDARD", "END:VTIMEZONE",
+            "BEGIN:VEVENT", "UID:a", "DTSTART:20250630T140000Z", "END:VEVENT",
+            "BEGIN:VTODO", "SUMMARY:Not an event", "END:VTODO",
+            "END:VCALENDAR",
+        ]
+        events = list(iter_events(lines))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["UID"], [({}, "a")])
+
+
+class EventBodyTest(unittest.TestCase):
+    def test_missing_uid_is_a_stable_hash(self):
+        first = _body("DTSTART:20250630T140000Z", "SUMMARY:Standup")
+        again = _body("DTSTART:20250630T140000Z", "SUMMARY:Standup")
+        other = _body("DTSTART:20250630T140000Z", "SUMMARY:Retro")
+        self.assertEqual(first["iCalUID"], again["iCalUID"])
+        self.assertNotEqual(first["iCalUID"], other["iCalUID"])
+        self.assertTrue(first["iCalUID"].endswith("@ics-import"))
+
+    def test_text_is_unescaped(self):
+        body = _body("UID:a", "DTSTART:20250630T140000Z", "SUMMARY:Lunch\\, then walk\\nOutside")
+        self.assertEqual(body["summary"], "Lunch, then walk\nOutside")
+
+    def test_floating_and_unknown_zones_use_the_default(self):
+        floating = _body("UID:a", "DTSTART:20250630T140000")
+        windows = _body("UID:b", "DTSTART;TZID=W. Europe Standard Time:20250630T140000")
+        self.assertEqual(floating["start"]["timeZone"], "Europe/Berlin")
+        self.assertEqual(windows["start"]["timeZone"], "Europe/Berlin")
+
+    def test_recurring_utc_event_gets_a_timezone(self):
+        body = _body("UID:a", "DTSTART:20250106T140000Z", "DTEND:20250106T150000Z", "RRULE:FREQ=WEEKLY")
+        self.assertEqual(body["start"], {"dateTime": "2025-01-06T14:00:00Z", "timeZone": "UTC"})
+        self.assertEqual(body["recurrence"], ["RRULE:FREQ=WEEKLY"])
+
+    def test_cancelled_and_changed_occurrences_are_skipped(self):
+        self.assertIsNone(_body("UID:a", "DTSTART:20250630T140000Z", "STATUS:CANCELLED"))
+        self.assertIsNone(_body("UID:a", "DTSTART:20250630T140000Z", "RECURRENCE-ID:20250630T140000Z"))
+
+    def test_missing_dtstart_is_an_error(self):
+        with self.assertRaises(ValueError):
+            _body("UID:a", "SUMMARY:No start")
+
+
+class ExportTest(unittest.TestCase):
+    def test_exported_event_reads_back(self):
+        item = {
+            "id": "ev1",
+            "iCalUID": "ev1@example.com",
+            "summary": "Planning; Q3, part 1",
+            "start": {"dateTime": "2025-06-30T14:00:00+02:00", "timeZone": "Europe/Berlin"},
+            "end": {"dateTime": "2025-06-30T15:00:00+02:00", "timeZone": "Europe/Berlin"},
+            "recurrence": ["RRULE:FREQ=WEEKLY", "EXDATE;TZID=America/New_York:20250707T080000"],
+            "updated": "2025-06-01T10:00:00Z",
+        }
+        zones = {}
+        text = "\r\n".join(fold(line) for line in event_lines(item, zones))
+        (vevent,) = iter_events(text.split("\r\n"))
+        body = to_event_body(vevent, "UTC")
+        self.assertEqual(body["summary"], item["summary"])
+        self.assertEqual(body["start"], {"dateTime": "2025-06-30T14:00:00", "timeZone": "Europe/Berlin"})
+        self.assertEqual(body["recurrence"], item["recurrence"])
+        self.assertEqual(zones, {"Europe/Berlin": (2025, 2025), "America/New_York": (2025, 2025)})
+
+    def test_vtimezone_matches_the_tz_database(self):
+        for zone in ("America/New_York", "Europe/Berlin", "Australia/Sydney", "Asia/Kolkata"):
+            text = "\r\n".join(vtimezone_lines(zone, 2020, 2025)) + "\r\n"
+            parsed, reference = tzical(io.StringIO(text)).get(), ZoneInfo(zone)
+            # Samples every seven hours at half past, skipping the hour before DST ends,
+            # and running past 2025 into years only the yearly rules cover
+            moment = datetime.datetime(2020, 1, 2, 0, 30, tzinfo=datetime.timezone.utc)
+            while moment.year < 2029:
+                local = moment.astimezone(reference)
+                if not local.dst() or (local + datetime.timedelta(hours=1)).dst() == local.dst():
+                    self.assertEqual(
+                        moment.astimezone(parsed).utcoffset(), local.utcoffset(), f"{zone} at {moment}"
+                    )
+                moment += datetime.timedelta(hours=7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Local expansion of recurring events: DST, EXDATE/RDATE, UNTIL and changed occurrences."""
+import datetime
+import unittest
+from zoneinfo import ZoneInfo
+
+from benchmarks.fake_calendar import FakeCalendarService
+from event_store import EventRecord, EventStore
+from recurrence import Series, instance_id, parse_instance_id
+
+UTC = datetime.timezone.utc
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+def _series(start, end, recurrence, tz=UTC, **fields):
+    master = {"id": "master", "summary": "Standup", "start": start, "end": end, "recurrence": recurrence}
+    master.update(fields)
+    return Series(EventRecord(master, tz), recurrence, start, tz)
+
+
+def _utc(*args):
+    return datetime.datetime(*args, tzinfo=UTC)
+
+
+class TimedSeriesTest(unittest.TestCase):
+    def setUp(self):
+        # Weekly on Mondays at 09:00 New York time, spanning the March 2025 DST change
+        self.series = _series(
+            {"dateTime": "2025-03-03T09:00:00-05:00", "timeZone": "America/New_York"},
+            {"dateTime": "2025-03-03T09:30:00-05:00", "timeZone": "America/New_York"},
+            ["RRULE:FREQ=WEEKLY;COUNT=4"],
+        )
+
+    def test_keeps_wall_clock_time_across_dst(self):
+        starts = [e.start_at for e in self.series.instances(_utc(2025, 3, 1))]
+        self.assertEqual(
+            starts,
+            [_utc(2025, 3, 3, 14), _utc(2025, 3, 10, 13), _utc(2025, 3, 17, 13), _utc(2025, 3, 24, 13)],
+        )
+        for event in self.series.instances(_utc(2025, 3, 1)):
+            self.assertEqual(event.start_at.astimezone(NEW_YORK).hour, 9)
+            self.assertEqual(event.end_at - event.start_at, datetime.timedelta(minutes=30))
+
+    def test_instance_ids_use_the_original_utc_start(self):
+        ids = [e.id for e in self.series.instances(_utc(2025, 3, 9), _utc(2025, 3, 11))]
+        self.assertEqual(ids, ["master_20250310T130000Z"])
+        self.assertEqual(parse_instance_id(ids[0]), ("master", _utc(2025, 3, 10, 13)))
+
+    def test_range_bounds(self):
+        # Occurrences must end after time_min and start before time_max
+        starts = [e.start_at for e in self.series.instances(_utc(2025, 3, 10, 13, 15), _utc(2025, 3, 17, 13))]
+        self.assertEqual(starts, [_utc(2025, 3, 10, 13)])
+
+    def test_excluded_occurrences_are_skipped(self):
+        excluded = {_utc(2025, 3, 10, 13)}
+        starts = [e.start_at for e in self.series.instances(_utc(2025, 3, 1), excluded=excluded)]
+        self.assertNotIn(_utc(2025, 3, 10, 13), starts)
+        self.assertEqual(len(starts), 3)
+
+    def test_exdate_and_rdate_in_their_own_zone(self):
+        series = _series(
+            {"dateTime": "2025-03-03T09:00:00-05:00", "timeZone": "America/New_York"},
+            {"dateTime": "2025-03-03T09:30:00-05:00", "timeZone": "America/New_York"},
+            [
+                "RRULE:FREQ=WEEKLY;COUNT=4",
+                "EXDATE;TZID=America/New_York:20250317T090000",
+                "RDATE:20250320T150000Z",
+            ],
+        )
+        starts = [e.start_at for e in series.instances(_utc(2025, 3, 1))]
+        self.assertEqual(
+            starts,
+            [_utc(2025, 3, 3, 14), _utc(2025, 3, 10, 13), _utc(2025, 3, 20, 15), _utc(2025, 3, 24, 13)],
+        )
+
+    def test_until_without_z_is_inclusive_of_the_day(self):
+        series = _series(
+            {"dateTime": "2025-03-03T09:00:00-05:00", "timeZone": "America/New_York"},
+            {"dateTime": "2025-03-03T09:30:00-05:00", "timeZone": "America/New_York"},
+            ["RRULE:FREQ=DAILY;UNTIL=20250305"],
+        )
+        self.assertEqual(len(list(series.instances(_utc(2025, 3, 1)))), 3)
+
+    def test_open_ended_series_is_lazy(self):
+        series = _series(
+            {"dateTime": "2025-01-01T12:00:00Z"},
+            {"dateTime": "2025-01-01T13:00:00Z"},
+            ["RRULE:FREQ=DAILY"],
+        )
+        first = series.first_instance(_utc(2030, 6, 1))
+        self.assertEqual(first.start_at, _utc(2030, 6, 1, 12))
+
+
+class AllDaySeriesTest(unittest.TestCase):
+    def test_days_start_at_local_midnight_and_last_a_whole_day(self):
+        series = _series(
+            {"date": "2025-03-08"}, {"date": "2025-03-09"}, ["RRULE:FREQ=DAILY;COUNT=3"], tz=NEW_YORK
+        )
+        events = list(series.instances(_utc(2025, 3, 1)))
+        self.assertEqual([e.start for e in events], ["2025-03-08", "2025-03-09", "2025-03-10"])
+        self.assertEqual([e.id for e in events], ["master_20250308", "master_20250309", "master_20250310"])
+        for event in events:
+            self.assertEqual(event.start_at.astimezone(NEW_YORK).time(), datetime.time(0))
+            self.assertEqual(event.end_at.astimezone(NEW_YORK).time(), datetime.time(0))
+        # The DST change makes March 9 only 23 hours long
+        self.assertEqual(events[1].end_at - events[1].start_at, datetime.timedelta(hours=23))
+
+    def test_instance_id_round_trip(self):
+        self.assertEqual(instance_id("m", datetime.date(2025, 3, 9)), "m_20250309")
+        self.assertEqual(parse_instance_id("m_20250309"), ("m", datetime.date(2025, 3, 9)))
+        self.assertIsNone(parse_instance_id("plain-event-id"))
+
+
+class StoreOverrideTest(unittest.TestCase):
+    """Changed and cancelled occurrences, as a sync delivers them."""
+
+    def setUp(self):
+        self.calendar = FakeCalendarService(num_events=0, latency=0, timezone="America/New_York")
+        self.calendar._add({
+            "id": "standup",
+            "summary": "Standup",
+            "start": {"dateTime": "2025-03-03T09:00:00-05:00", "timeZone": "America/New_York"},
+            "end": {"dateTime": "2025-03-03T09:30:00-05:00", "timeZone": "America/New_York"},
+            "recurrence": ["RRULE:FREQ=WEEKLY;COUNT=4"],
+        })
+        # Moved from 09:00 to 11:00 on March 10, after the DST change
+        self.calendar._add({
+            "id": "standup_20250310T130000Z",
+            "summary": "Standup (moved)",
+            "recurringEventId": "standup",
+            "originalStartTime": {"dateTime": "2025-03-10T09:00:00-04:00", "timeZone": "America/New_York"},
+            "start": {"dateTime": "2025-03-10T11:00:00-04:00", "timeZone": "America/New_York"},
+            "end": {"dateTime": "2025-03-10T11:30:00-04:00", "timeZone": "America/New_York"},
+        })
+        self.calendar.events().delete(calendarId="primary", eventId="standup_20250317T130000Z").execute()
+        self.store = EventStore(self.calendar)
+
+    def test_changed_occurrence_replaces_the_generated_one(self):
+        events = self.store.events_between(_utc(2025, 3, 1), _utc(2025, 4, 1))
+        self.assertEqual(
+            [(e.summary, e.start_at) for e in events],
+            [
+                ("Standup", _utc(2025, 3, 3, 14)),
+                ("Standup (moved)", _utc(2025, 3, 10, 15)),
+                ("Standup", _utc(2025, 3, 24, 13)),
+            ],
+        )
+
+    def test_deleting_an_occurrence_keeps_the_rest(self):
+        self.store.refresh()
+        self.store.record_delete("standup_20250324T130000Z")
+        starts = [e.start_at for e in self.store.events_between(_utc(2025, 3, 1), _utc(2025, 4, 1))]
+        self.assertEqual(starts, [_utc(2025, 3, 3, 14), _utc(2025, 3, 10, 15)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+"""Lightweight latency tracing for graph nodes, tools, LLM and API calls.
+
+Spans are plain dicts (name, kind, start, duration, attributes such as bytes,
+tokens and retries). Every finished span goes to:
+
+* the current turn's ``Trace`` (held in a context variable, so it follows tool
+  calls into worker threads and async tasks), which the UI renders as a
+  per-turn timing breakdown;
+* a JSONL file, if ``TRACE_JSONL_PATH`` is set;
+* OpenTelemetry, if ``TRACE_OTEL`` is set and ``opentelemetry-api`` is installed.
+
+Graph nodes, tools and LLM calls are captured by ``TracingCallbackHandler``;
+Calendar HTTP requests are wrapped where they are issued.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH")
+TRACE_OTEL = bool(os.getenv("TRACE_OTEL"))
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_jsonl_lock = threading.Lock()
+_otel_tracer = None
+
+
+class Trace:
+    """Collects the spans of one chat turn."""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """Total milliseconds per span kind."""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["kind"]] = totals.get(span["kind"], 0.0) + span["duration_ms"]
+        return totals
+
+
+def start_trace(trace_id=None):
+    """Begin collecting spans for a new turn in the current context."""
+    trace = Trace(trace_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def record_span(name, kind, start, end, trace=None, **attributes):
+    """Record a finished span. `start`/`end` are ``time.time()`` seconds."""
+    trace = trace or _current_trace.get()
+    span = {
+        "trace_id": trace.trace_id if trace else None,
+        "name": name,
+        "kind": kind,
+        "start": start,
+        "duration_ms": (end - start) * 1000,
+        **attributes,
+    }
+    if trace is not None:
+        trace.add(span)
+    if TRACE_JSONL_PATH:
+        with _jsonl_lock, open(TRACE_JSONL_PATH, "a") as f:
+            f.write(json.dumps(span, default=str) + "\n")
+    if TRACE_OTEL:
+        _export_otel(span, end)
+    return span
+
+
+@contextlib.contextmanager
+def span(name, kind, **attributes):
+    """Time a block; attributes added to the yielded dict are recorded too."""
+    start = time.time()
+    try:
+        yield attributes
+    except Exception as e:
+        attributes["error"] = repr(e)
+        raise
+    finally:
+        record_span(name, kind, start, time.time(), **attributes)
+
+
+def _export_otel(span, end):
+    global _otel_tracer
+    try:
+        if _otel_tracer is None:
+            from opentelemetry import trace as otel_trace
+
+            _otel_tracer = otel_trace.get_tracer("ai-calendar-agent")
+        attributes = {
+            k: v for k, v in span.items()
+            if k not in ("name", "start", "duration_ms") and isinstance(v, (str, int, float, bool))
+        }
+        otel_span = _otel_tracer.start_span(
+            span["name"], start_time=int(span["start"] * 1e9), attributes=attributes
+        )
+        otel_span.end(end_time=int(end * 1e9))
+    except ImportError:
+        logging.warning("TRACE_OTEL is set but opentelemetry-api is not installed")
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records graph-node, tool and LLM spans into a ``Trace``."""
+
+    run_inline = True
+
+    def __init__(self, trace):
+        self.trace = trace
+        self._open = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._open[run_id] = (node, "node", time.time())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error=repr(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name", "tool")
+        self._open[run_id] = (name, "tool", time.time())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._close(run_id, bytes=len(str(getattr(output, "content", output))))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error=repr(error))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._open[run_id] = ("chat_model", "llm", time.time())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        try:
+            usage = response.generations[0][0].message.usage_metadata or {}
+        except (AttributeError, IndexError):
+            pass
+        self._close(
+            run_id,
+            input_tokens=usage.get("input_tokens"),
+            output_tokens=usage.get("output_tokens"),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error=repr(error))
+
+    def _close(self, run_id, **attributes):
+        opened = self._open.pop(run_id, None)
+        if opened is None:
+            return
+        name, kind, start = opened
+        record_span(name, kind, start, time.time(), trace=self.trace, **attributes)
@@ -0,0 +1,164 @@
+"""Per-user calendar settings, cached with a TTL.
+
+Tools used to ask the API for the calendar timezone before every create and
+every turn's date resolution. The settings rarely change, so a single
+``settings().list`` call now loads them once and all tools share the result
+until the TTL runs out or ``invalidate_settings`` is called (the event store
+does so when it sees the primary calendar's timezone change). The list of the
+user's calendars comes from calendarList instead; it is fetched the first time
+it is asked for and cached alongside.
+
+The Calendar API has no working-hours setting, so those come from the
+``WORK_START`` / ``WORK_END`` environment variables (default 09:00-17:00).
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+import weakref
+from zoneinfo import ZoneInfo
+
+SETTINGS_TTL = float(os.getenv("SETTINGS_TTL", "900"))
+WORK_START = os.getenv("WORK_START", "09:00")
+WORK_END = os.getenv("WORK_END", "17:00")
+
+
+class UserSettings:
+    """Snapshot of the settings the tools need."""
+
+    def __init__(self, timezone="UTC", work_start=WORK_START, work_end=WORK_END):
+        self.timezone = timezone
+        self.work_start = work_start
+        self.work_end = work_end
+        # Filled in by get_calendars on first use
+        self.calendars = None
+
+    @property
+    def tz(self):
+        return ZoneInfo(self.timezone)
+
+    @classmethod
+    def from_api(cls, settings):
+        """Build from a ``settings().list`` response."""
+        values = {item["id"]: item.get("value") for item in settings.get("items", [])}
+        timezone = values.get("timezone") or "UTC"
+        try:
+            ZoneInfo(timezone)
+        except Exception:
+            logging.error(f"Unknown calendar timezone {timezone!r}, using UTC")
+            timezone = "UTC"
+        return cls(timezone=timezone)
+
+    def now(self):
+        return datetime.datetime.now(self.tz)
+
+
+class _Entry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.settings = None
+        self.loaded_at = 0.0
+
+
+_entries = weakref.WeakKeyDictionary()
+_entries_lock = threading.Lock()
+
+
+def _entry(service):
+    with _entries_lock:
+        entry = _entries.get(service)
+        if entry is None:
+            entry = _entries[service] = _Entry()
+        return entry
+
+
+def _fresh(entry, ttl):
+    return entry.settings is not None and time.monotonic() - entry.loaded_at < ttl
+
+
+def _store(entry, response):
+    entry.settings = UserSettings.from_api(response)
+    entry.loaded_at = time.monotonic()
+    logging.info(f"Loaded calendar settings: timezone {entry.settings.timezone}")
+    return entry.settings
+
+
+def get_user_settings(service, ttl=SETTINGS_TTL):
+    """Return the cached settings for `service`'s user, loading them if stale."""
+    entry = _entry(service)
+    with entry.lock:
+        if not _fresh(entry, ttl):
+            _store(entry, service.settings().list().execute())
+        return entry.settings
+
+
+async def aget_user_settings(service, client, ttl=SETTINGS_TTL):
+    """Async variant of ``get_user_settings`` using an ``AsyncCalendarClient``."""
+    entry = _entry(service)
+    if not _fresh(entry, ttl):
+        _store(entry, await client.list_settings())
+    return entry.settings
+
+
+def _calendar_entries(response):
+    # The primary calendar is always addressed as "primary", so it shares the
+    # event store and cache entries of the single-calendar tools
+    return [
+        {
+            "id": "primary" if item.get("primary") else item["id"],
+            "email": item["id"],
+            "summary": item.get("summaryOverride") or item.get("summary") or item["id"],
+        }
+        for item in response.get("items", [])
+    ]
+
+
+def get_calendars(service, ttl=SETTINGS_TTL):
+    """The user's calendars as dicts with 'id', 'email' and 'summary', cached with the settings."""
+    settings = get_user_settings(service, ttl)
+    if settings.calendars is None:
+        settings.calendars = _calendar_entries(service.calendarList().list().execute())
+    return settings.calendars
+
+
+async def aget_calendars(service, client, ttl=SETTINGS_TTL):
+    settings = await aget_user_settings(service, client, ttl)
+    if settings.calendars is None:
+        settings.calendars = _calendar_entries(await client.list_calendars())
+    return settings.calendars
+
+
+def resolve_calendars(names, calendars):
+    """Map calendar names or ids to calendar ids; "all" selects every calendar.
+
+    Raises:
+        ValueError: If a name matches none of `calendars`.
+    """
+    ids = []
+    for name in names:
+        key = name.strip().lower()
+        if key == "all":
+            ids.extend(c["id"] for c in calendars)
+            continue
+        if key == "primary":
+            ids.append("primary")
+            continue
+        match = next(
+            (c["id"] for c in calendars if key in (c["id"].lower(), c["email"].lower(), c["summary"].lower())),
+            None,
+        )
+        if match is None:
+            available = ", ".join(c["summary"] for c in calendars)
+            raise ValueError(f"No calendar named {name!r}. Available calendars: {available}")
+        ids.append(match)
+    return list(dict.fromkeys(ids))
+
+
+def invalidate_settings(service=None):
+    """Forget cached settings for `service`, or for everyone."""
+    with _entries_lock:
+        if service is None:
+            _entries.clear()
+        else:
+            _entries.pop(service, None)